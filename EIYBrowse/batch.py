@@ -0,0 +1,111 @@
+"""The batch module renders a list of regions or genes to image files in
+one go, with the ``eiybrowse-render`` command::
+
+    eiybrowse-render browser_config.yaml Sox2 Nanog chr7:1000000-2000000 \\
+        --flank 50kb --output figures/
+
+Regions can also be read from a file with one region or gene per line.
+All of the gene names are resolved before anything is rendered (see
+:meth:`~EIYBrowse.core.Browser.resolve_regions`), so a misspelt gene is
+reported straight away rather than part way through a long batch.
+
+Each image is named after the region or gene it shows, e.g.
+``figures/Sox2.png`` or ``figures/chr7_1000000-2000000.png``.
+"""
+
+import argparse
+import logging
+import os
+import re
+
+from .exceptions import UnknownGeneError
+from .utils import parse_genomic_distance
+
+
+def image_file_name(region_spec, fmt):
+
+    """Return a file name for the image of a region, with any characters
+    that are awkward in file names replaced.
+
+    :param str region_spec: Region or gene name as given by the user.
+    :param str fmt: Image format.
+    """
+
+    return '{0}.{1}'.format(re.sub(r'[^\w.+-]', '_', region_spec), fmt)
+
+
+def read_regions_file(path):
+
+    """Read a file with one region or gene name per line. Blank lines and
+    lines starting with # are ignored."""
+
+    with open(path) as regions_file:
+        return [line.strip() for line in regions_file
+                if line.strip() and not line.startswith('#')]
+
+
+def main(argv=None):
+
+    """Entry point for the ``eiybrowse-render`` command."""
+
+    parser = argparse.ArgumentParser(
+        description='Render regions or genes to image files')
+    parser.add_argument('config', metavar='CONFIG_YAML',
+                        help='Browser configuration file')
+    parser.add_argument('regions', metavar='REGION', nargs='*',
+                        help='Regions to render, as chrom:start-stop or as '
+                             'a gene name, optionally with a flank such '
+                             'as Sox2+50kb')
+    parser.add_argument('-r', '--regions-file', metavar='REGIONS_FILE',
+                        help='File with one region or gene name per line')
+    parser.add_argument('--flank', type=parse_genomic_distance, default=0,
+                        help='Distance to add on either side of genes, '
+                             'e.g. 50kb')
+    parser.add_argument('-o', '--output', default='.',
+                        help='Directory to write the images to')
+    parser.add_argument('-f', '--format', default='png',
+                        choices=['png', 'svg', 'pdf'], help='Image format')
+    parser.add_argument('--dpi', type=float, help='Image resolution')
+    parser.add_argument('--verbose', action='store_const',
+                        dest='loglevel', const=logging.INFO,
+                        default=logging.WARNING, help='Report progress')
+
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.loglevel)
+
+    region_specs = list(args.regions)
+
+    if args.regions_file:
+        region_specs.extend(read_regions_file(args.regions_file))
+
+    if not region_specs:
+        parser.error('No regions given')
+
+    import matplotlib.pyplot as plt
+    from .configuration import browser_from_config_yaml
+
+    plt.switch_backend('agg')
+
+    with open(args.config) as config_file:
+        browser = browser_from_config_yaml(config_file.read())
+
+    try:
+        regions = browser.resolve_regions(region_specs, args.flank)
+    except (UnknownGeneError, ValueError) as err:
+        parser.error(str(err))
+
+    os.makedirs(args.output, exist_ok=True)
+
+    for i, (region_spec, region) in enumerate(zip(region_specs, regions)):
+
+        path = os.path.join(args.output,
+                            image_file_name(region_spec, args.format))
+
+        with open(path, 'wb') as image_file:
+            image_file.write(browser.render(region, fmt=args.format,
+                                            dpi=args.dpi))
+
+        logging.info('%d/%d %s (%s:%d-%d) written to %s',
+                     i + 1, len(regions), region_spec,
+                     region.chrom, region.start, region.stop, path)
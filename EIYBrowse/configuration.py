@@ -8,7 +8,7 @@ supported as a configuration file language, but other markup
 flavours may be added at a later date.
 """
 
-import yaml
+import copy
 from .exceptions import ImproperlyConfigured
 from .tracks import defined_tracks
 from .core import Browser
@@ -36,7 +36,7 @@ def track_from_track_config(track_config):
             ('Track definitions should be a dictionary '
              'with one key, got {0}').format(track_config))
 
-    track_type = track_config.keys()[0]
+    track_type, track_conf = list(track_config.items())[0]
 
     if not track_type in defined_tracks:
         raise ImproperlyConfigured(
@@ -44,14 +44,21 @@ def track_from_track_config(track_config):
              'track types are: {1}').format(
                  track_type, ', '.join(defined_tracks)))
 
-    track_conf = track_config.values()[0] or {}
+    track_conf = track_conf or {}
 
     track_class = defined_tracks[track_type]
 
+    # Keep an untouched copy of the configuration, as some tracks modify
+    # the dictionaries they are passed
+    config = {track_type: copy.deepcopy(track_conf)}
+
     # Star args are a necessary evil here, as all the configuration
     # options have to be in dictionary form
     # pylint: disable=star-args
-    return track_class.from_config_dict(**track_conf)
+    track = track_class.from_config_dict(**track_conf)
+    track.config = config
+
+    return track
 
 
 def tracks_from_config(config_dict):
@@ -69,6 +76,29 @@ def tracks_from_config(config_dict):
     return [track_from_track_config(p_conf) for p_conf in config_dict['tracks']]
 
 
+def datafiles_from_config(config_dict):
+
+    """Return the paths of all the datafiles used by the tracks defined
+    in a parsed configuration file.
+
+    :param dict config_dict: Dictionary representation of a configuration
+        file containing the key 'tracks'.
+    :returns: List of datafile paths, in the order the tracks are defined.
+    """
+
+    paths = []
+
+    for track_config in config_dict['tracks']:
+        for track_conf in track_config.values():
+            if not track_conf:
+                continue
+            if 'file_path' in track_conf:
+                paths.append(track_conf['file_path'])
+            paths.extend(track_conf.get('file_paths', []))
+
+    return paths
+
+
 def browser_from_config_dict(config_dict):
 
     """Convert a parsed configuration file in dictionary format into a
@@ -110,4 +140,6 @@ def browser_from_config_yaml(config_yaml):
         plotting.
     """
 
-    return browser_from_config_dict(yaml.load(config_yaml))
+    import yaml
+
+    return browser_from_config_dict(yaml.safe_load(config_yaml))
@@ -8,11 +8,18 @@ visualise a specific genomic region.
 different genomic regions.
 """
 
-import matplotlib.pyplot as plt
-import matplotlib.gridspec as gridspec
+from io import BytesIO
+from .exceptions import UnknownGeneError
+from .prefetch import Prefetcher
+from .rendercache import DiskRenderCache
+from .utils import parse_region, parse_genomic_distance
 
 
-def make_frame(track, gs, row_index):
+# Relative widths of the label and data columns of the plot
+WIDTH_RATIOS = [1, 9]
+
+
+def make_frame(track, gs, row_index, labels=True):
     """Make a new frame to add to the current plot.
 
     Uses matplotlib's gridspec to create two new subplots. label_ax
@@ -30,6 +37,8 @@ def make_frame(track, gs, row_index):
         this frame
     :param int row_index: The 0-based index of the first horizontal
         row occupied by this frame.
+    :param bool labels: Whether gs has a column for the label. If not,
+        label_ax is None and data_ax takes up the whole row.
 
     :returns: Dictionary containing the track and the
         newly created plotting axes.
@@ -37,11 +46,16 @@ def make_frame(track, gs, row_index):
 
     """
 
-    fig = plt.gcf()
+    import matplotlib.pyplot as plt
 
-    label_ax = fig.add_subplot(gs[row_index, 0])
+    fig = plt.gcf()
 
-    plot_ax = fig.add_subplot(gs[row_index, 1])
+    if labels:
+        label_ax = fig.add_subplot(gs[row_index, 0])
+        plot_ax = fig.add_subplot(gs[row_index, 1])
+    else:
+        label_ax = None
+        plot_ax = fig.add_subplot(gs[row_index, 0])
 
 
     frame_dict = {'track': track,
@@ -59,13 +73,15 @@ class Plot(object):
     method is called, a new Plot object is generated to hold
     references to all of the output."""
 
-    def __init__(self, base_gridspec, track_configs):
+    def __init__(self, base_gridspec, track_configs, labels=True):
         """Create a new plot object:
 
         :param int figwidth: Width of the plotting figure
         :param int total_rows: Total number of horizontal rows
             required by all the tracks.
         :param int rowheight: Height of each horizontal row
+        :param bool labels: Whether to leave a column for the track labels
+            to the left of the data.
 
         """
 
@@ -73,6 +89,7 @@ class Plot(object):
 
         self.frames = []
         self.frame_index = 0
+        self.labels = labels
 
         self.track_configs = track_configs
         self.gs = self._make_gridspec(base_gridspec, track_configs)
@@ -80,12 +97,19 @@ class Plot(object):
     def _make_gridspec(self, base_gridspec, track_configs):
         """Create a new Figure instance to plot to."""
 
+        import matplotlib.gridspec as gridspec
+
         height_ratios = [p['rows'] for p in track_configs]
         no_frames=len(height_ratios)
 
+        if not self.labels:
+            return gridspec.GridSpecFromSubplotSpec(
+                no_frames, 1, height_ratios=height_ratios,
+                wspace=0.0, hspace=0.1, subplot_spec=base_gridspec)
+
         return gridspec.GridSpecFromSubplotSpec(no_frames, 2,
                                                 height_ratios=height_ratios,
-                                                width_ratios=[1,9],
+                                                width_ratios=WIDTH_RATIOS,
                                                 wspace=0.0, hspace=0.1,
                                                 subplot_spec=base_gridspec)
 
@@ -102,7 +126,8 @@ class Plot(object):
 
         new_frame = make_frame(track,
                                self.gs,
-                               self.frame_index)
+                               self.frame_index,
+                               self.labels)
 
         self.frames.append(new_frame)
         self.frame_index += 1
@@ -126,13 +151,28 @@ class Browser(object):
     """Browser stores the plotting tracks and controls track position/style"""
 
     def __init__(self, tracks=None,
-                 width=16, rowheight=.5):
+                 width=16, rowheight=.5,
+                 prefetch=False, prefetch_workers=2,
+                 render_cache=None, margins=True):
         """Create a new EIYBrowse Browser.
 
         :param list tracks: A list of :class:`~EIYBrowse.tracks.base.Track`
             objects to handle the plotting.
         :param float width: Width of the browser window
         :param float rowheight: Height of each horizontal row in the browser.
+        :param bool prefetch: Whether to warm the track data caches for the
+            regions neighbouring each plotted region in the background
+            (see :mod:`EIYBrowse.prefetch`).
+        :param int prefetch_workers: Maximum number of background threads
+            used for prefetching.
+        :param render_cache: On-disk cache used by :meth:`render`, or a
+            dictionary of arguments for creating one.
+        :type render_cache: :class:`~EIYBrowse.rendercache.DiskRenderCache`,
+            dict or None
+        :param bool margins: Whether new figures have margins and a column
+            of track labels. Without them, the tracks' data axes fill the
+            whole figure, so that images of adjacent regions join up
+            exactly (e.g. the tiles of :mod:`EIYBrowse.pyramid`).
         """
 
         super(Browser, self).__init__()
@@ -141,17 +181,58 @@ class Browser(object):
         self.tracks = tracks or []
 
         self.width, self.rowheight = width, rowheight
+        self.margins = margins
+
+        if prefetch:
+            self.prefetcher = Prefetcher(prefetch_workers)
+        else:
+            self.prefetcher = None
+
+        if isinstance(render_cache, dict):
+            # pylint: disable=star-args
+            render_cache = DiskRenderCache(**render_cache)
+
+        self.render_cache = render_cache
+
+
+    def data_axis_width(self):
 
+        """Return the width in inches of the axes that tracks plot their data
+        to, when plotting to a new figure with :meth:`plot`.
 
-    def _make_base_gridspec(self, track_configs):
+        Tracks can use this in their :meth:`get_config` method, before any
+        axes have been created, to work out how much space their features
+        will take up.
+        """
+
+        import matplotlib
+
+        if not self.margins:
+            return self.width
+
+        left = matplotlib.rcParams['figure.subplot.left']
+        right = matplotlib.rcParams['figure.subplot.right']
+
+        return (self.width * (right - left) *
+                WIDTH_RATIOS[1] / float(sum(WIDTH_RATIOS)))
+
+    def _make_base_gridspec(self, track_configs, dpi=None):
 
         """Make a figure of the appropriate size and add one subplot"""
 
+        import matplotlib.pyplot as plt
+        import matplotlib.gridspec as gridspec
+
         total_rows = sum([p['rows'] for p in track_configs])
 
         figheight = total_rows * self.rowheight
 
-        plt.figure(figsize=(self.width, figheight))
+        plt.figure(figsize=(self.width, figheight), dpi=dpi)
+
+        if not self.margins:
+            return gridspec.GridSpec(1, 1, left=0.0, right=1.0,
+                                     bottom=0.0, top=1.0,
+                                     wspace=0.0, hspace=0.0)[0]
 
         return gridspec.GridSpec(1, 1, wspace=0.0, hspace=0.0)[0]
 
@@ -170,7 +251,7 @@ class Browser(object):
         :rtype: :class:`Plot`
         """
 
-        plot = Plot(base_gridspec, track_configs)
+        plot = Plot(base_gridspec, track_configs, labels=self.margins)
 
         for track, track_config in zip(self.tracks, track_configs):
 
@@ -178,30 +259,182 @@ class Browser(object):
 
         return plot
 
-    def plot(self, region):
+    def resolve_regions(self, regions, flank=0):
+        """Turn a list of region specifications into genomic intervals.
+
+        Each region can be given as
+
+        * a :class:`pybedtools.Interval`, which is returned unchanged,
+        * a string of the form ``chrom:start-stop``, or
+        * the name of a gene, optionally followed by the flanking distance
+          to add on either side, such as ``Sox2`` or ``Sox2+50kb``.
+
+        Gene names are looked up by every track with a ``locate_genes``
+        method (see :meth:`~EIYBrowse.tracks.genes.GeneTrack.locate_genes`)
+        in turn, with all the names looked up in one batch per track.
+
+        :param list regions: Regions to resolve.
+        :param int flank: Distance to add on either side of genes that are
+            given without a flanking distance of their own.
+        :returns: List of :class:`pybedtools.Interval` objects.
+        :raises ValueError: If a ``chrom:start-stop`` region is invalid.
+        :raises UnknownGeneError: If any gene name could not be found.
+        """
+
+        import pybedtools
+
+        resolved = [None] * len(regions)
+        genes = []
+
+        for i, region in enumerate(regions):
+
+            if not isinstance(region, str):
+                resolved[i] = region
+                continue
+
+            if ':' in region:
+                resolved[i] = parse_region(region)
+                continue
+
+            name, gene_flank = region.strip(), flank
+
+            if '+' in name:
+                head, tail = name.rsplit('+', 1)
+                try:
+                    name, gene_flank = head, parse_genomic_distance(tail)
+                except ValueError:
+                    pass
+
+            genes.append((i, name, gene_flank))
+
+        for track in self.tracks:
+
+            if not genes or not hasattr(track, 'locate_genes'):
+                continue
+
+            loci = track.locate_genes([name for _, name, _ in genes])
+            missing = []
+
+            for gene, locus in zip(genes, loci):
+
+                if locus is None:
+                    missing.append(gene)
+                    continue
+
+                i, _, gene_flank = gene
+                chrom, start, stop = locus
+                resolved[i] = pybedtools.Interval(
+                    chrom, max(0, start - gene_flank), stop + gene_flank)
+
+            genes = missing
+
+        if genes:
+            raise UnknownGeneError(
+                'Could not find gene(s): {0}'.format(
+                    ', '.join(name for _, name, _ in genes[:10])))
+
+        return resolved
+
+    def resolve_region(self, region, flank=0):
+        """Turn a single region specification into a genomic interval. See
+        :meth:`resolve_regions` for the accepted specifications.
+
+        :param region: Region to resolve.
+        :type region: :class:`pybedtools.Interval` or str
+        :param int flank: Distance to add on either side of a gene.
+        """
+
+        return self.resolve_regions([region], flank)[0]
+
+    def plot(self, region, dpi=None):
         """Plot all tracks given a interval object for window size
 
-        :param region: Genomic region to plot data for.
-        :type region: :class:`pybedtools.Interval`
+        :param region: Genomic region to plot data for, or a region or gene
+            name accepted by :meth:`resolve_region`.
+        :type region: :class:`pybedtools.Interval` or str
+        :param float dpi: Resolution of the new figure. If None, use
+            matplotlib's default. Tracks that adapt to the number of pixels
+            they are drawn over (e.g. signal tracks with ``bins: auto``)
+            use this resolution.
 
         """
 
+        region = self.resolve_region(region)
+
+        self._cancel_prefetch()
+
         track_configs = [p.get_config(region, self)
                          for p in self.tracks]
 
-        base_gridspec = self._make_base_gridspec(track_configs)
+        base_gridspec = self._make_base_gridspec(track_configs, dpi)
 
         plot = self.setup_plot(base_gridspec, track_configs)
 
         plot.do_plot(region)
 
+        self._schedule_prefetch(region)
+
         return plot
 
+    def render(self, region, fmt='png', dpi=None):
+        """Plot all tracks over region to a new figure, and return the
+        figure as an image file rather than a :class:`Plot` object.
+
+        The figure is closed once it has been saved, so this method can
+        be called repeatedly (e.g. by :mod:`EIYBrowse.server`) without
+        accumulating open figures.
+
+        If the browser has a render_cache, images are looked up in the
+        cache first and stored in it after rendering.
+
+        :param region: Genomic region to plot data for, or a region or gene
+            name accepted by :meth:`resolve_region`.
+        :type region: :class:`pybedtools.Interval` or str
+        :param str fmt: Image format, as understood by
+            :meth:`matplotlib.figure.Figure.savefig` (e.g. 'png' or 'svg').
+        :param float dpi: Resolution of the image. If None, use
+            matplotlib's default.
+        :returns: Contents of the image file.
+        :rtype: bytes
+        """
+
+        region = self.resolve_region(region)
+
+        cache_key = None
+
+        if self.render_cache is not None:
+            cache_key = self.render_cache.key(self, region, fmt, dpi)
+
+        if cache_key is not None:
+            image = self.render_cache.get(cache_key, fmt)
+            if image is not None:
+                return image
+
+        import matplotlib.pyplot as plt
+
+        self.plot(region, dpi)
+
+        figure = plt.gcf()
+        image_file = BytesIO()
+
+        try:
+            figure.savefig(image_file, format=fmt, dpi=dpi)
+        finally:
+            plt.close(figure)
+
+        image = image_file.getvalue()
+
+        if cache_key is not None:
+            self.render_cache.put(cache_key, fmt, image)
+
+        return image
+
     def plot_to_ax(self, region, axis):
         """Plot all tracks given a interval object for window size
 
-        :param region: Genomic region to plot data for.
-        :type region: :class:`pybedtools.Interval`
+        :param region: Genomic region to plot data for, or a region or gene
+            name accepted by :meth:`resolve_region`.
+        :type region: :class:`pybedtools.Interval` or str
 
         """
 
@@ -213,6 +446,10 @@ class Browser(object):
 
     def plot_to_gridspec(self, region, base_gridspec):
 
+        region = self.resolve_region(region)
+
+        self._cancel_prefetch()
+
         track_configs = [p.get_config(region, self)
                          for p in self.tracks]
 
@@ -220,5 +457,53 @@ class Browser(object):
 
         plot.do_plot(region)
 
+        self._schedule_prefetch(region)
+
         return plot
 
+    def prefetch(self, region, windows=1):
+        """Fetch the data for every track over region, without plotting
+        anything. Any later plot inside region can then be served from the
+        tracks' data caches.
+
+        :param region: Genomic region to fetch data for.
+        :type region: :class:`pybedtools.Interval`
+        :param int windows: Number of equal-width windows that region will
+            be plotted as.
+        """
+
+        for track in self.tracks:
+            track.prefetch(region, windows)
+
+    def warmup(self, workers=4):
+        """Open the datafiles of every track now, rather than when each track
+        first fetches data. Tracks created from a configuration file open
+        their datafiles lazily (see
+        :class:`~EIYBrowse.filetypes.LazyDatafile`), so this is only needed
+        to move the cost of opening them out of the first plot, e.g. before
+        a server starts taking requests.
+
+        :param int workers: Number of datafiles to open at the same time.
+        """
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max(1, workers)) as executor:
+            list(executor.map(lambda track: track.warmup(), self.tracks))
+
+    def _cancel_prefetch(self):
+
+        """A new region has been requested, so drop any prefetches that
+        have not yet started."""
+
+        if self.prefetcher is not None:
+            self.prefetcher.cancel()
+
+    def _schedule_prefetch(self, region):
+
+        """Start warming the track caches for the regions around the region
+        that was just plotted."""
+
+        if self.prefetcher is not None:
+            self.prefetcher.schedule(region, self.tracks)
+
@@ -0,0 +1,420 @@
+"""The datacache module provides small in-memory caches that sit between a
+track and its datafile.
+
+When the browser is used interactively, consecutive requests usually
+overlap a great deal: panning by 10% of the window leaves 90% of the
+previous window on screen. Rather than asking the datafile for the whole
+new region, the caches defined here keep the data from the last few
+regions and only request the parts of the new region that have not been
+seen before. The freshly fetched flanks are then stitched together with
+the retained data.
+
+:class:`SignalCache` wraps datafiles that provide a ``local_coverage``
+method (e.g. the metaseq genomic signal classes) and is used by
+:class:`~EIYBrowse.tracks.genomic_signal.GenomicSignalTrack`.
+
+:class:`IntervalCache` wraps datafiles that provide an ``adapter``
+attribute which can be indexed by region (e.g. the metaseq
+:class:`~metaseq.filetype_adapters.BedAdapter`) and is used by
+:class:`~EIYBrowse.tracks.interval.GenomicIntervalTrack`. Datafiles with
+an ``intervals`` method, such as
+:class:`~EIYBrowse.filetypes.bed_index.BedIndexFile`, already answer
+queries from memory and are passed through without caching.
+
+Caches can be filled from background threads (see
+:mod:`EIYBrowse.prefetch`) while the foreground plot is reading from the
+same datafile. Most datafile handles (pysam and tabix files, sqlite
+connections) cannot be read from two threads at once, so every read a
+cache makes from a datafile holds that datafile's :func:`datafile_lock`.
+"""
+
+import threading
+import weakref
+from collections import OrderedDict
+import numpy as np
+
+from .filetypes.binning import SUMMARIES
+from .filetypes.records import IntervalArrays
+
+
+# Number of regions remembered by each cache
+DEFAULT_CACHE_SIZE = 8
+
+# Two signals are considered to be binned at the same resolution if their
+# bin widths differ by less than this fraction.
+STEP_TOLERANCE = 0.01
+
+# Datafiles without a local_summaries method are sampled this many times
+# per bin to find the maximum and minimum of each bin
+SUMMARY_OVERSAMPLING = 8
+
+_DATAFILE_LOCKS = weakref.WeakKeyDictionary()
+_DATAFILE_LOCKS_BY_ID = {}
+_DATAFILE_LOCKS_LOCK = threading.Lock()
+
+
+def datafile_lock(datafile):
+
+    """Return the lock which serialises reads from datafile, shared by every
+    cache (and every thread) reading from it.
+
+    :param datafile: Datafile object (or
+        :class:`~EIYBrowse.filetypes.LazyDatafile` proxy) to get the lock
+        for.
+    :returns: :class:`threading.RLock`
+    """
+
+    with _DATAFILE_LOCKS_LOCK:
+        try:
+            return _DATAFILE_LOCKS.setdefault(datafile, threading.RLock())
+        except TypeError:
+            # Datafiles which cannot be weakly referenced or hashed
+            return _DATAFILE_LOCKS_BY_ID.setdefault(id(datafile),
+                                                    threading.RLock())
+
+
+class RegionCache(object):
+
+    """Base class for caches which remember the data fetched for the last
+    few genomic regions.
+
+    Entries are stored in an :class:`~collections.OrderedDict` which is
+    used as a least-recently-used store: whenever an entry is added it is
+    moved to the end, and the oldest entries are discarded once there are
+    more than max_entries of them. All access to the store is protected by a
+    lock, so that the cache can be filled from several threads at once.
+    """
+
+    def __init__(self, datafile, max_entries=DEFAULT_CACHE_SIZE):
+
+        """Create a new cache.
+
+        :param datafile: Datafile object which will be queried for any
+            data not already held by the cache.
+        :param int max_entries: Maximum number of regions to remember.
+        """
+
+        super(RegionCache, self).__init__()
+
+        self.datafile = datafile
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def clear(self):
+
+        """Forget all the cached regions."""
+
+        with self._lock:
+            self._entries.clear()
+
+    def _cached_entries(self):
+
+        """Return a snapshot of the cached entries, most recent first."""
+
+        with self._lock:
+            return list(reversed(self._entries.items()))
+
+    def _store(self, key, value):
+
+        """Add a new entry to the cache, discarding the oldest entries if
+        the cache is full.
+
+        If an existing entry already covers the new one, the existing entry
+        is marked as recently used instead, so that a large region fetched
+        up front is not pushed out of the cache by the smaller regions
+        sliced from it."""
+
+        with self._lock:
+            for cached_key in self._entries:
+                if cached_key != key and self._covers(cached_key, key):
+                    self._entries.move_to_end(cached_key)
+                    return
+
+            self._entries.pop(key, None)
+            self._entries[key] = value
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    @staticmethod
+    def _covers(cached_key, key):
+
+        """Whether the entry stored under cached_key holds all the data for
+        key. Keys start with the chromosome, start and stop of the region.
+        """
+
+        return (cached_key[0] == key[0] and
+                cached_key[1] <= key[1] and cached_key[2] >= key[2])
+
+
+class SignalCache(RegionCache):
+
+    """Cache for binned genomic signal.
+
+    Each entry remembers the x and y arrays returned by the datafile's
+    ``local_coverage`` method for one region, along with the width of the
+    bins used. A new request can re-use an entry if it is on the same
+    chromosome, overlaps the entry and has the same bin width. The
+    overlapping bins are taken from the entry, and only the uncovered
+    flanks are requested from the datafile, using the same bin width so
+    that the stitched signal has a constant resolution.
+
+    The mean, maximum and minimum of each bin, as returned by
+    :meth:`local_summaries`, are cached in the same way, as separate
+    entries.
+    """
+
+    def local_coverage(self, region, bins):
+
+        """Return the binned signal over a region.
+
+        This has the same signature and return values as the
+        ``local_coverage`` method of the underlying datafile, so the cache
+        can be used as a drop-in replacement for it.
+
+        :param region: Genomic region to get the signal for.
+        :type region: :class:`pybedtools.Interval`
+        :param int bins: Number of bins to divide the region into.
+        :returns: Arrays of bin positions and signal values.
+        """
+
+        return self._get(region, bins, 'coverage')
+
+    def local_summaries(self, region, bins):
+
+        """Return the mean, maximum and minimum of the signal in each bin
+        over a region.
+
+        Datafiles with a ``local_summaries`` method (such as
+        :class:`~EIYBrowse.filetypes.bigwig.BigWigFile`) calculate these
+        themselves. For other datafiles, the signal is fetched with
+        SUMMARY_OVERSAMPLING times as many bins, and every
+        SUMMARY_OVERSAMPLING consecutive bins are reduced to one.
+
+        The maximum and minimum of such datafiles are therefore only
+        approximate: they are taken over the means of the smaller bins, so
+        a peak narrower than one of those is still averaged with the signal
+        around it, although much less than by the mean of the whole bin.
+
+        :param region: Genomic region to get the signal for.
+        :type region: :class:`pybedtools.Interval`
+        :param int bins: Number of bins to divide the region into.
+        :returns: Array of bin positions, and dictionary with the binned
+            signal for each of 'mean', 'max' and 'min'.
+        """
+
+        sig_x, sig_ys = self._get(region, bins, 'summaries')
+
+        return sig_x, dict(zip(SUMMARIES, sig_ys))
+
+    def _get(self, region, bins, kind):
+
+        """Return the cached signal of the given kind, fetching and storing
+        it if needed."""
+
+        step = float(region.stop - region.start) / bins
+
+        signal, start, step = self._fetch(region.chrom, region.start, bins,
+                                          step, kind)
+
+        self._store((region.chrom, start, start + bins * step, step, kind),
+                    signal)
+
+        return signal
+
+    @staticmethod
+    def _covers(cached_key, key):
+
+        """Entries only cover each other if they have the same bin width
+        and hold the same kind of signal."""
+
+        return (RegionCache._covers(cached_key, key) and
+                abs(cached_key[3] - key[3]) <= STEP_TOLERANCE * key[3] and
+                cached_key[4] == key[4])
+
+    def _fetch(self, chrom, start, bins, step, kind):
+
+        """Get bins bins of signal from start, re-using any cached entry
+        with the same bin width and fetching the rest from the datafile.
+
+        When an entry is re-used, the requested bins are moved to the
+        nearest bins of the entry's grid, so that the retained bins and the
+        fetched flanks line up exactly. Each flank is extended out to the
+        grid, and fetched with exactly as many bins as it spans, so the
+        result always has bins bins of width step, and starts within half
+        a bin of start.
+
+        Summaries are stored with one row per summary, so the signal is
+        always sliced and joined along its last axis.
+
+        :returns: The signal, and the start and width of its bins.
+        """
+
+        stop = start + bins * step
+
+        for key, (cached_x, cached_y) in self._cached_entries():
+
+            e_chrom, e_start, e_stop, e_step, e_kind = key
+
+            if e_chrom != chrom or e_start >= stop or e_stop <= start:
+                continue
+
+            if abs(e_step - step) > STEP_TOLERANCE * step or e_kind != kind:
+                continue
+
+            # Requested bins, and those held by the entry, in bins from the
+            # start of the entry
+            first = int(np.floor((start - e_start) / e_step + 0.5))
+            last = first + bins
+            cached_bins = len(cached_x)
+
+            if last <= 0 or first >= cached_bins:
+                continue
+
+            if e_start + first * e_step < 0:
+                continue
+
+            parts = []
+
+            if first < 0:
+                parts.append(self._from_datafile(
+                    chrom, e_start + first * e_step, -first, e_step, kind))
+
+            retained = slice(max(first, 0), min(last, cached_bins))
+            parts.append((cached_x[retained], cached_y[..., retained]))
+
+            if last > cached_bins:
+                parts.append(self._from_datafile(
+                    chrom, e_start + cached_bins * e_step,
+                    last - cached_bins, e_step, kind))
+
+            signal = (np.concatenate([p[0] for p in parts]),
+                      np.concatenate([p[1] for p in parts], axis=-1))
+
+            return signal, e_start + first * e_step, e_step
+
+        return self._from_datafile(chrom, start, bins, step, kind), start, step
+
+    def _from_datafile(self, chrom, start, bins, step, kind):
+
+        """Request bins bins of width step from start from the datafile.
+
+        The datafile is given a region with whole-number coordinates, and
+        the bin positions it returns are shifted back by the rounding, so
+        that they lie on the grid of the cache.
+        """
+
+        import pybedtools
+
+        region = pybedtools.Interval(chrom, int(round(start)),
+                                     int(round(start + bins * step)))
+        offset = start - region.start
+
+        with datafile_lock(self.datafile):
+
+            if kind == 'coverage':
+                sig_x, sig_y = self.datafile.local_coverage(region,
+                                                            bins=bins)
+                return np.asarray(sig_x) + offset, np.asarray(sig_y)
+
+            if hasattr(self.datafile, 'local_summaries'):
+                sig_x, sig_ys = self.datafile.local_summaries(region, bins)
+                return (np.asarray(sig_x) + offset,
+                        np.array([sig_ys[summary] for summary in SUMMARIES]))
+
+            sig_x, sig_y = self.datafile.local_coverage(
+                region, bins=bins * SUMMARY_OVERSAMPLING)
+
+        samples = np.asarray(sig_y).reshape(bins, SUMMARY_OVERSAMPLING)
+
+        return (np.asarray(sig_x)[::SUMMARY_OVERSAMPLING] + offset,
+                np.array([samples.mean(axis=1), samples.max(axis=1),
+                          samples.min(axis=1)]))
+
+
+class IntervalCache(RegionCache):
+
+    """Cache for discrete genomic features.
+
+    Each entry remembers every feature overlapping one region. A new request
+    can re-use an entry if it is on the same chromosome and overlaps the
+    entry. Features from the entry which overlap the new region are kept,
+    and features overlapping the uncovered flanks are requested from the
+    datafile. Any feature in the flanks which also overlaps the cached
+    region is already held by the entry, so it is dropped to avoid
+    returning it twice.
+    """
+
+    def intervals(self, region):
+
+        """Return all the intervals overlapping a region as arrays.
+
+        Datafiles with their own ``intervals`` method are queried directly.
+        Otherwise the features are fetched through :meth:`features` and
+        converted.
+
+        :param region: Genomic region to get the intervals for.
+        :type region: :class:`pybedtools.Interval`
+        :returns: :class:`~EIYBrowse.filetypes.records.IntervalArrays`
+        """
+
+        if hasattr(self.datafile, 'intervals'):
+            with datafile_lock(self.datafile):
+                return self.datafile.intervals(region)
+
+        return IntervalArrays.from_features(region.chrom,
+                                            self.features(region))
+
+    def features(self, region):
+
+        """Return all the features overlapping a region.
+
+        :param region: Genomic region to get the features for.
+        :type region: :class:`pybedtools.Interval`
+        :returns: List of :class:`pybedtools.Interval` objects, as returned
+            by the datafile's adapter.
+        """
+
+        features = self._fetch(region.chrom, region.start, region.stop)
+
+        self._store((region.chrom, region.start, region.stop), features)
+
+        return features
+
+    def _fetch(self, chrom, start, stop):
+
+        """Get the features from start to stop, re-using any overlapping
+        cached entry and fetching the rest from the datafile.
+        """
+
+        import pybedtools
+
+        for key, cached_features in self._cached_entries():
+
+            e_chrom, e_start, e_stop = key
+
+            if e_chrom != chrom or e_start >= stop or e_stop <= start:
+                continue
+
+            features = []
+
+            if start < e_start:
+                features.extend(
+                    f for f in self._fetch(chrom, start, e_start)
+                    if f.stop <= e_start)
+
+            features.extend(f for f in cached_features
+                            if f.start < stop and f.stop > start)
+
+            if stop > e_stop:
+                features.extend(
+                    f for f in self._fetch(chrom, e_stop, stop)
+                    if f.start >= e_stop)
+
+            return features
+
+        with datafile_lock(self.datafile):
+            return list(self.datafile.adapter[
+                pybedtools.Interval(chrom, start, stop)])
@@ -21,6 +21,12 @@ class InvalidChromError(Exception):
     pass
 
 
+class UnknownGeneError(LookupError):
+    """Exception to be raised if a gene name could not be found by
+    any of the tracks in a browser."""
+    pass
+
+
 class ImproperlyConfigured(Exception):
 
     """Exception to be raised when encountering configuration errors"""
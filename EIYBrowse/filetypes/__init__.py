@@ -24,32 +24,118 @@ package's setup.py. For example::
                        },
     )
 
+Datafiles opened from a configuration file are wrapped in a
+:class:`LazyDatafile`, which only opens the file the first time the track
+needs data from it, so that loading a configuration with many tracks is
+quick however many files it refers to.
 """
 
 
-from pkg_resources import iter_entry_points
+import threading
+from ..plugins import PluginRegistry
+
+
+defined_filetypes = PluginRegistry('EIYBrowse.filetypes',
+                                   extra_modules=['metaseq._genomic_signal'])
 
 
 def get_file_opener(file_type):
 
-    import os
-    on_rtd = os.environ.get('READTHEDOCS', None) == 'True'
+    """Return the class which opens files of file_type. The plugin module
+    defining it is imported the first time it is requested, and metaseq
+    is only imported if file_type is not one of the EIYBrowse.filetypes
+    entry points."""
+
+    return defined_filetypes[file_type]
+
 
-    defined_filetypes = {}
+def open_file(file_path, file_type, **options):
+    file_opener = get_file_opener(file_type)
+    return file_opener(file_path, **options)
 
-    if not on_rtd:
-        for ep in iter_entry_points('EIYBrowse.filetypes'):
-            defined_filetypes[ep.name] = ep.load()
 
-        from metaseq._genomic_signal import _registry
-        defined_filetypes.update(_registry)
+_PROXY_ATTRIBUTES = ('_file_path', '_file_type', '_options', '_datafile',
+                     '_lock')
 
-    else:
-        defined_filetypes = {}
 
-    return defined_filetypes[file_type]
+class LazyDatafile(object):
 
+    """Proxy for a datafile which is not opened until one of its attributes
+    is first used, e.g. when a track first fetches data from it.
 
-def open_file(file_path, file_type):
-    file_opener = get_file_opener(file_type)
-    return file_opener(file_path)
+    Any attribute that is not defined by the proxy is looked up on the
+    opened datafile, so the proxy can be used in place of it.
+    """
+
+    def __init__(self, file_path, file_type, **options):
+
+        """Create a new proxy, without opening the file.
+
+        :param str file_path: Path to the datafile location
+        :param str file_type: String specifying the format of the datafile
+            (see :func:`open_file`).
+        :raises KeyError: If no filetype called file_type is installed.
+        """
+
+        super(LazyDatafile, self).__init__()
+
+        if file_type not in defined_filetypes:
+            raise KeyError(file_type)
+
+        self._file_path = file_path
+        self._file_type = file_type
+        self._options = options
+
+        self._datafile = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+
+        """Whether the datafile has been opened yet."""
+
+        return self._datafile is not None
+
+    def open(self):
+
+        """Open the datafile, if it has not been opened already, and return
+        it. Safe to call from several threads at once."""
+
+        if self._datafile is None:
+            with self._lock:
+                if self._datafile is None:
+                    self._datafile = open_file(self._file_path,
+                                               self._file_type,
+                                               **self._options)
+
+        return self._datafile
+
+    def __getattr__(self, name):
+
+        # Only called for attributes the proxy does not have. The proxy's
+        # own attributes and special methods are excluded, in case they have
+        # not been set yet (e.g. while the proxy is being copied).
+        if name in _PROXY_ATTRIBUTES or name.startswith('__'):
+            raise AttributeError(name)
+
+        return getattr(self.open(), name)
+
+    def __getstate__(self):
+
+        # Copies (e.g. sent to another process) open the file again
+        return {'_file_path': self._file_path,
+                '_file_type': self._file_type,
+                '_options': self._options}
+
+    def __setstate__(self, state):
+
+        self.__dict__.update(state)
+
+        self._datafile = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+
+        return '<{0} {1} ({2}){3}>'.format(
+            self.__class__.__name__, self._file_path, self._file_type,
+            '' if self.is_open else ', not opened')
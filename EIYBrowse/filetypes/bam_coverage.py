@@ -0,0 +1,329 @@
+"""The bam_coverage module provides a signal filetype for BAM files which
+counts the coverage of the whole file once, and then answers every
+``local_coverage`` request from a cache on disk, instead of reading all the
+alignments in the plotted region each time.
+
+Coverage is the mean read depth in fixed-width bins, counted from the
+aligned blocks of each read (so deletions and spliced introns are not
+covered). Chromosomes are counted in parallel, one per process, and
+stored in the folder format of
+:class:`~EIYBrowse.filetypes.bedgraph.BedGraphArrays`, with zoom levels
+for wide views. The cache is kept next to the BAM file::
+
+    reads.bam.coverage/bin10.q0.F1796/
+
+with one folder for each combination of bin width and read filters. It is
+rebuilt if the BAM file is modified. The cache is built in a temporary
+folder which then replaces the old one, with a lock file held around the
+build, so that processes opening the same BAM file at the same time (e.g.
+the workers of :mod:`EIYBrowse.server`) only count its coverage once.
+Daemonic processes, such as those workers, cannot start processes of their
+own, and count every chromosome in turn instead.
+
+The cache is opt-in: a signal track uses it by opening its BAM file with
+the ``bam_coverage`` file type, and can change the bin width and read
+filters with ``file_options``::
+
+    tracks:
+      - signal:
+          file_type: bam_coverage
+          file_path: reads.bam
+          file_options:
+            bin_size: 25
+            min_mapq: 10
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import numpy as np
+import pysam
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from .bedgraph import BedGraphArrays
+from .binning import SignalArrays
+
+
+# Unmapped, secondary, QC failed and duplicate reads, as for samtools depth
+DEFAULT_EXCLUDE_FLAGS = 0x4 | 0x100 | 0x200 | 0x400
+
+# Number of aligned blocks to collect before adding them to the coverage
+CHUNK_BLOCKS = 1000000
+
+SOURCE_FILE = 'source.json'
+
+
+def add_blocks(bases, starts, stops, bin_size):
+
+    """Add the number of bases covered by each aligned block to the bins of
+    bases.
+
+    The first and last bin of each block get the bases of the block within
+    them, and any bins in between are fully covered, which is added as a
+    difference array over the bins spanned by the blocks.
+
+    :param bases: Array of aligned bases in each bin, updated in place.
+    :type bases: :class:`numpy.ndarray`
+    :param starts: Start position of each block.
+    :param stops: End position of each block.
+    :param int bin_size: Width of each bin.
+    """
+
+    starts, stops = np.asarray(starts), np.asarray(stops)
+
+    first, last = starts // bin_size, (stops - 1) // bin_size
+
+    in_first = np.minimum(stops, (first + 1) * bin_size) - starts
+    in_last = np.where(last > first, stops - last * bin_size, 0)
+
+    # Only update the bins spanned by this set of blocks
+    lo = first.min()
+    spanned = bases[lo:last.max() + 1]
+    first, last = first - lo, last - lo
+
+    spanned += np.bincount(first, in_first,
+                           minlength=len(spanned)).astype(bases.dtype)
+    spanned += np.bincount(last, in_last,
+                           minlength=len(spanned)).astype(bases.dtype)
+
+    middle = last > first + 1
+    changes = np.zeros(len(spanned) + 1, dtype=bases.dtype)
+    np.add.at(changes, first[middle] + 1, bin_size)
+    np.add.at(changes, last[middle], -bin_size)
+    spanned += np.cumsum(changes[:-1])
+
+
+def chrom_coverage(bam_path, chrom, length, bin_size, min_mapq,
+                   exclude_flags):
+
+    """Count the mean read depth in each bin of a chromosome.
+
+    :returns: Coverage as :class:`~EIYBrowse.filetypes.binning.SignalArrays`,
+        with a run for each stretch of bins with the same coverage.
+    """
+
+    bases = np.zeros(-(-length // bin_size), dtype=np.int64)
+
+    starts, stops = [], []
+
+    with pysam.AlignmentFile(bam_path) as bam:
+
+        for read in bam.fetch(chrom):
+
+            if read.flag & exclude_flags or \
+                    read.mapping_quality < min_mapq:
+                continue
+
+            for block_start, block_stop in read.get_blocks():
+                starts.append(block_start)
+                stops.append(min(block_stop, length))
+
+            if len(starts) >= CHUNK_BLOCKS:
+                add_blocks(bases, starts, stops, bin_size)
+                starts, stops = [], []
+
+    if starts:
+        add_blocks(bases, starts, stops, bin_size)
+
+    # Run-length encode the bins, keeping runs of zero coverage so that they
+    # count towards the mean depth of wider bins
+    changes = np.flatnonzero(np.diff(bases)) + 1
+    run_starts = np.append(0, changes) * bin_size
+    run_stops = np.append(changes * bin_size, length)
+
+    bases_per_run = np.add.reduceat(bases, np.append(0, changes))
+
+    return SignalArrays(run_starts, run_stops,
+                        bases_per_run / (run_stops - run_starts).astype(float))
+
+
+def _write_chrom_coverage(folder_path, bam_path, chrom, length, bin_size,
+                          min_mapq, exclude_flags):
+
+    """Count the coverage of one chromosome and write it to folder_path. Run
+    in a worker process by :func:`build_coverage_cache`."""
+
+    from ..importers.BedGraph import write_signal_arrays
+
+    write_signal_arrays(folder_path, chrom,
+                        chrom_coverage(bam_path, chrom, length, bin_size,
+                                       min_mapq, exclude_flags))
+
+    return chrom
+
+
+def source_stamp(bam_path):
+
+    """Return the modification time and size of a BAM file, which the cache
+    is checked against."""
+
+    stat = os.stat(bam_path)
+
+    return {'mtime': stat.st_mtime, 'size': stat.st_size}
+
+
+def build_coverage_cache(bam_path, folder_path, bin_size, min_mapq,
+                         exclude_flags, processes=None):
+
+    """Count the coverage of every chromosome of a BAM file and write it to
+    folder_path, in parallel.
+
+    :param int processes: Number of worker processes. Defaults to the
+        number of CPUs. Chromosomes are counted in this process if it is 1,
+        or if this process is daemonic and so cannot start any workers.
+    """
+
+    with pysam.AlignmentFile(bam_path) as bam:
+        chroms = sorted(zip(bam.references, bam.lengths),
+                        key=lambda c: c[1], reverse=True)
+
+    stamp = source_stamp(bam_path)
+
+    if processes == 1 or multiprocessing.current_process().daemon:
+
+        for chrom, length in chroms:
+            _write_chrom_coverage(folder_path, bam_path, chrom, length,
+                                  bin_size, min_mapq, exclude_flags)
+            logging.info('Counted coverage of %s', chrom)
+
+    else:
+
+        with ProcessPoolExecutor(processes) as executor:
+
+            jobs = [executor.submit(_write_chrom_coverage, folder_path,
+                                    bam_path, chrom, length, bin_size,
+                                    min_mapq, exclude_flags)
+                    for chrom, length in chroms]
+
+            for job in jobs:
+                logging.info('Counted coverage of %s', job.result())
+
+    with open(os.path.join(folder_path, SOURCE_FILE), 'w') as source_file:
+        json.dump(stamp, source_file)
+
+
+@contextmanager
+def file_lock(lock_file):
+
+    """Hold an exclusive lock on an open file, waiting for any other
+    process holding it. Where fcntl is not available (i.e. on Windows) no
+    lock is taken."""
+
+    if fcntl is None:
+        yield
+        return
+
+    fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+    try:
+        yield
+    finally:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class BamCoverageFile(BedGraphArrays):
+
+    """The BamCoverageFile class handles the retrieval of binned coverage
+    from a BAM file, by way of a cache of its coverage."""
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, file_path, bin_size=10, min_mapq=0,
+                 exclude_flags=DEFAULT_EXCLUDE_FLAGS, processes=None):
+
+        """Open the coverage cache of a BAM file, building it if it is
+        missing or older than the BAM file.
+
+        :param str file_path: Path to the indexed BAM file.
+        :param int bin_size: Width of the bins coverage is counted in.
+        :param int min_mapq: Reads with a lower mapping quality are not
+            counted.
+        :param int exclude_flags: Reads with any of these SAM flags set are
+            not counted.
+        :param int processes: Number of processes to count the coverage
+            with. Defaults to the number of CPUs.
+        """
+
+        self.bam_path = file_path
+
+        folder_path = os.path.join(
+            file_path + '.coverage',
+            'bin{0}.q{1}.F{2}'.format(bin_size, min_mapq, exclude_flags))
+
+        if not self.cache_is_current(folder_path):
+            folder_path = self._build_cache(folder_path, bin_size, min_mapq,
+                                            exclude_flags, processes)
+
+        super(BamCoverageFile, self).__init__(folder_path)
+
+    # pylint: disable=too-many-arguments
+    def _build_cache(self, folder_path, bin_size, min_mapq, exclude_flags,
+                     processes):
+
+        """Build the coverage cache in folder_path, unless another process
+        builds it first, and return the folder holding the cache: a
+        temporary folder if folder_path cannot be written to.
+
+        The cache is counted into a temporary folder next to folder_path,
+        which then replaces it, while holding a lock on
+        ``<folder_path>.lock``.
+        """
+
+        try:
+            os.makedirs(os.path.dirname(folder_path), exist_ok=True)
+            lock_file = open(folder_path + '.lock', 'a')
+        except (IOError, OSError):
+            logging.warning('Could not save coverage cache next to %s',
+                            self.bam_path)
+            temp_path = tempfile.mkdtemp()
+            build_coverage_cache(self.bam_path, temp_path, bin_size,
+                                 min_mapq, exclude_flags, processes)
+            return temp_path
+
+        with lock_file, file_lock(lock_file):
+
+            # Another process may have built the cache while this one was
+            # waiting for the lock
+            if self.cache_is_current(folder_path):
+                return folder_path
+
+            logging.info('Counting coverage of %s', self.bam_path)
+
+            temp_path = tempfile.mkdtemp(
+                prefix=os.path.basename(folder_path) + '.',
+                dir=os.path.dirname(folder_path))
+
+            try:
+                build_coverage_cache(self.bam_path, temp_path, bin_size,
+                                     min_mapq, exclude_flags, processes)
+            except BaseException:
+                shutil.rmtree(temp_path, ignore_errors=True)
+                raise
+
+            # Without fcntl, another process may still have finished first
+            if self.cache_is_current(folder_path):
+                shutil.rmtree(temp_path, ignore_errors=True)
+            else:
+                shutil.rmtree(folder_path, ignore_errors=True)
+                os.rename(temp_path, folder_path)
+
+        return folder_path
+
+    def cache_is_current(self, folder_path):
+
+        """Whether folder_path holds a complete cache of the current BAM
+        file."""
+
+        try:
+            with open(os.path.join(folder_path, SOURCE_FILE)) as source_file:
+                return json.load(source_file) == source_stamp(self.bam_path)
+        except (IOError, OSError, ValueError):
+            return False
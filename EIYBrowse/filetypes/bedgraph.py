@@ -0,0 +1,199 @@
+"""The bedgraph module reads a genomic signal from a folder of
+memory-mapped NumPy arrays, converted from a bedGraph file by
+:func:`~EIYBrowse.importers.BedGraph.bedgraph_to_arrays` (or the
+``bedgraph_to_arrays.py`` script).
+
+The folder holds one file per chromosome, ``<chrom>.npy``, with the start,
+stop and value of every run of the bedGraph file, and one file per zoom
+level, ``<chrom>.zoom<width>.npy``, with the mean, maximum and minimum of
+the signal over bins of that width. Arrays are opened memory-mapped, so
+only the parts of the file covering the plotted region are read from disk.
+"""
+
+import os
+import re
+import numpy as np
+
+from .binning import (SignalArrays, SUMMARIES, bin_signal, summarise_signal,
+                      choose_zoom, matrix_means, by_chromosome)
+
+
+ZOOM_FILE_PATTERN = re.compile(r'^(?P<chrom>.+)\.zoom(?P<zoom>\d+)\.npy$')
+
+# Record layouts of the full resolution and zoom level arrays
+RUN_DTYPE = np.dtype([('start', np.int32), ('stop', np.int32),
+                      ('value', np.float32)])
+ZOOM_DTYPE = np.dtype([('start', np.int32), ('stop', np.int32),
+                       ('mean', np.float32), ('max', np.float32),
+                       ('min', np.float32)])
+
+
+def runs_file_name(chrom, zoom=None):
+
+    """Return the name of the file holding the runs of chrom, or its zoom
+    level of bin width zoom."""
+
+    if zoom is None:
+        return '{0}.npy'.format(chrom)
+
+    return '{0}.zoom{1}.npy'.format(chrom, zoom)
+
+
+def signal_from_records(records):
+
+    """Convert a record array with the RUN_DTYPE or ZOOM_DTYPE layout into a
+    :class:`~EIYBrowse.filetypes.binning.SignalArrays` object, without
+    copying it."""
+
+    if 'value' in records.dtype.names:
+        return SignalArrays(records['start'], records['stop'],
+                            records['value'])
+
+    return SignalArrays(records['start'], records['stop'], records['mean'],
+                        records['max'], records['min'])
+
+
+class BedGraphArrays(object):
+
+    """The BedGraphArrays class handles the retrieval of binned signal from
+    a folder of arrays converted from a bedGraph file."""
+
+    def __init__(self, folder_path):
+
+        """Open the arrays in a folder written by
+        :func:`~EIYBrowse.importers.BedGraph.bedgraph_to_arrays`.
+
+        :param str folder_path: Path to the folder.
+        """
+
+        super(BedGraphArrays, self).__init__()
+
+        self.path = folder_path
+
+        self.signal, self.zooms = {}, {}
+
+        for file_name in sorted(os.listdir(folder_path)):
+
+            if not file_name.endswith('.npy'):
+                continue
+
+            records = np.load(os.path.join(folder_path, file_name),
+                              mmap_mode='r')
+
+            match = ZOOM_FILE_PATTERN.match(file_name)
+
+            if match:
+                self.zooms.setdefault(match.group('chrom'), {})[
+                    int(match.group('zoom'))] = signal_from_records(records)
+            else:
+                self.signal[file_name[:-len('.npy')]] = signal_from_records(
+                    records)
+
+    def _chrom_signal(self, chrom, width, bins):
+
+        """Return the runs of chrom to bin regions width long into bins
+        with: those of the coarsest zoom level that still has several zoom
+        bins per bin (see
+        :func:`~EIYBrowse.filetypes.binning.choose_zoom`), or the full
+        resolution runs if there is no such zoom level."""
+
+        chrom_zooms = self.zooms.get(chrom, {})
+
+        zoom = choose_zoom(list(chrom_zooms), 0, width, bins)
+
+        if zoom is not None:
+            return chrom_zooms[zoom]
+
+        return self.signal.get(chrom, SignalArrays([], [], []))
+
+    def _signal(self, region, bins):
+
+        """Return the runs to bin region into bins with."""
+
+        return self._chrom_signal(
+            region.chrom, region.stop - region.start, bins).region(
+                region.start, region.stop)
+
+    def local_coverage(self, region, bins, summary='mean'):
+
+        """Return the signal over region, summarised into bins, in the same
+        format as the ``local_coverage`` method of the metaseq genomic
+        signal classes.
+
+        :param region: Genomic region to get the signal for.
+        :type region: :class:`pybedtools.Interval`
+        :param int bins: Number of bins to divide the region into.
+        :param str summary: Summary of the signal within each bin, one of
+            'mean', 'max' or 'min'.
+        :returns: Arrays of bin start positions and signal values.
+        """
+
+        return bin_signal(self._signal(region, bins),
+                          region.start, region.stop, bins, summary)
+
+    def local_summaries(self, region, bins, summaries=SUMMARIES):
+
+        """Return several summaries of the signal over region, calculated
+        in one pass by :func:`~EIYBrowse.filetypes.binning.summarise_signal`.
+
+        :param region: Genomic region to get the signal for.
+        :type region: :class:`pybedtools.Interval`
+        :param int bins: Number of bins to divide the region into.
+        :param summaries: Names of the summaries to return, from 'mean',
+            'max' and 'min'.
+        :returns: Array of bin start positions, and dictionary with the
+            binned signal for each summary.
+        """
+
+        binned = summarise_signal(self._signal(region, bins),
+                                  region.start, region.stop, bins)
+
+        return binned['x'], {summary: binned[summary]
+                             for summary in summaries}
+
+    # pylint: disable=too-many-arguments
+    def coverage_matrix(self, chroms, starts, stops, bins, summary='mean',
+                        strands=None, workers=None):
+
+        """Return the binned signal over many regions, as a regions x bins
+        matrix (see :func:`~EIYBrowse.filetypes.binning.coverage_matrix`).
+
+        The regions on each chromosome are binned together from the runs
+        they span, by :func:`~EIYBrowse.filetypes.binning.matrix_means` for
+        the mean, and the chromosomes are binned in parallel. All the
+        regions on a chromosome are binned at the zoom level chosen for the
+        narrowest of them.
+
+        :param chroms: Chromosome of each region.
+        :param starts: Start of each region.
+        :param stops: End of each region.
+        :param int bins: Number of bins to divide each region into.
+        :param str summary: Summary of the signal within each bin, one of
+            'mean', 'max' or 'min'.
+        :param strands: Optional strand of each region. Regions on the '-'
+            strand are reversed.
+        :param int workers: Number of chromosomes to bin at the same time.
+        """
+
+        if summary not in SUMMARIES:
+            raise ValueError('Unknown signal summary "{0}", expected one of '
+                             '{1}'.format(summary, ', '.join(SUMMARIES)))
+
+        def fetch_chrom(chrom, chrom_starts, chrom_stops):
+
+            """Bin the regions on one chromosome."""
+
+            signal = self._chrom_signal(
+                chrom, (chrom_stops - chrom_starts).min(), bins).region(
+                    chrom_starts.min(), chrom_stops.max())
+
+            if summary == 'mean':
+                return matrix_means(signal, chrom_starts, chrom_stops, bins)
+
+            return np.array([
+                summarise_signal(signal.region(start, stop),
+                                 start, stop, bins)[summary]
+                for start, stop in zip(chrom_starts, chrom_stops)])
+
+        return by_chromosome(fetch_chrom, chroms, starts, stops, bins,
+                             strands, workers)
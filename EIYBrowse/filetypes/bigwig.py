@@ -0,0 +1,214 @@
+"""The bigwig module reads a genomic signal from a bigWig file with
+`pyBigWig <https://github.com/deeptools/pyBigWig>`_, without going through
+metaseq.
+
+bigWig files already hold zoom levels, and pyBigWig picks the right one
+when it is asked for the summary of a region in a number of bins. When
+the plot is zoomed in so far that there are more bins than positions, the
+full resolution runs are read instead, and binned by
+:func:`~EIYBrowse.filetypes.binning.summarise_signal`.
+"""
+
+import threading
+import numpy as np
+import pyBigWig
+
+from .binning import SignalArrays, SUMMARIES, summarise_signal, by_chromosome
+
+
+# In coverage_matrix, regions up to this wide are binned from their full
+# resolution runs, which pyBigWig reads much faster than it summarises a
+# region from its zoom levels
+MAX_RUNS_WIDTH = 1000000
+
+
+class BigWigFile(object):
+
+    """The BigWigFile class handles the retrieval of binned signal from a
+    bigWig file."""
+
+    def __init__(self, file_path):
+
+        """Open a bigWig file.
+
+        :param str file_path: Path to the bigWig file.
+        """
+
+        super(BigWigFile, self).__init__()
+
+        self.path = file_path
+
+        self.bigwig = pyBigWig.open(file_path)
+        self.chrom_sizes = self.bigwig.chroms()
+
+        # pyBigWig file handles cannot be shared between threads
+        self._lock = threading.Lock()
+
+    def _stats(self, chrom, start, stop, bins, summary):
+
+        """Summarise start-stop into bins with pyBigWig, which requires the
+        region to lie within the chromosome."""
+
+        with self._lock:
+            values = self.bigwig.stats(chrom, int(start), int(stop),
+                                       type=summary, nBins=bins)
+
+        return np.nan_to_num(np.array(values, dtype=np.float64))
+
+    def _runs(self, chrom, start, stop):
+
+        """Read the full resolution runs between start and stop."""
+
+        with self._lock:
+            runs = self.bigwig.intervals(chrom, int(start), int(stop)) or []
+
+        runs = np.array(runs, dtype=np.float64).reshape(-1, 3)
+
+        return SignalArrays(runs[:, 0], runs[:, 1], runs[:, 2])
+
+    def local_coverage(self, region, bins, summary='mean'):
+
+        """Return the signal over region, summarised into bins, in the same
+        format as the ``local_coverage`` method of the metaseq genomic
+        signal classes. Bins with no data, including any beyond the end of
+        the chromosome, have a value of zero.
+
+        :param region: Genomic region to get the signal for.
+        :type region: :class:`pybedtools.Interval`
+        :param int bins: Number of bins to divide the region into.
+        :param str summary: Summary of the signal within each bin, one of
+            'mean', 'max' or 'min'.
+        :returns: Arrays of bin start positions and signal values.
+        """
+
+        sig_x, summaries = self.local_summaries(region, bins, (summary,))
+
+        return sig_x, summaries[summary]
+
+    def local_summaries(self, region, bins, summaries=SUMMARIES):
+
+        """Return several summaries of the signal over region at once, as
+        for :meth:`local_coverage`.
+
+        When the full resolution runs are read, all the summaries are
+        calculated from them in one pass. Otherwise pyBigWig is asked for
+        each summary in turn, from the zoom levels of the file.
+
+        :param region: Genomic region to get the signal for.
+        :type region: :class:`pybedtools.Interval`
+        :param int bins: Number of bins to divide the region into.
+        :param summaries: Names of the summaries to calculate, from
+            'mean', 'max' and 'min'.
+        :returns: Array of bin start positions, and dictionary with the
+            binned signal for each summary.
+        """
+
+        for summary in summaries:
+            if summary not in SUMMARIES:
+                raise ValueError(
+                    'Unknown signal summary "{0}", expected one of '
+                    '{1}'.format(summary, ', '.join(SUMMARIES)))
+
+        start, stop = region.start, region.stop
+        step = float(stop - start) / bins
+
+        sig_x = start + np.arange(bins) * step
+        sig_ys = {summary: np.zeros(bins) for summary in summaries}
+
+        chrom_size = self.chrom_sizes.get(region.chrom, 0)
+
+        if start >= chrom_size:
+            return sig_x, sig_ys
+
+        if bins > stop - start:
+            runs = self._runs(region.chrom, start, min(stop, chrom_size))
+            binned = summarise_signal(runs, start, stop, bins)
+            return sig_x, {summary: binned[summary] for summary in summaries}
+
+        # Bins that lie entirely within the chromosome, then the bin that
+        # overhangs its end (if any)
+        inside = min(bins, int((chrom_size - start) // step))
+        inside_stop = int(round(start + inside * step))
+
+        for summary, sig_y in sig_ys.items():
+
+            if inside:
+                sig_y[:inside] = self._stats(region.chrom, start, inside_stop,
+                                             inside, summary)
+
+            if inside < bins and inside_stop < chrom_size:
+                sig_y[inside] = self._stats(region.chrom, inside_stop,
+                                            chrom_size, 1, summary)[0]
+
+        return sig_x, sig_ys
+
+    # pylint: disable=too-many-arguments
+    def coverage_matrix(self, chroms, starts, stops, bins, summary='mean',
+                        strands=None, workers=None):
+
+        """Return the binned signal over many regions, as a regions x bins
+        matrix (see :func:`~EIYBrowse.filetypes.binning.coverage_matrix`).
+
+        Each chromosome is read through its own pyBigWig file handle, so
+        that the chromosomes can be read in parallel. Regions up to
+        MAX_RUNS_WIDTH wide are binned from their full resolution runs, and
+        wider regions from the zoom levels of the file.
+
+        :param chroms: Chromosome of each region.
+        :param starts: Start of each region.
+        :param stops: End of each region.
+        :param int bins: Number of bins to divide each region into.
+        :param str summary: Summary of the signal within each bin, one of
+            'mean', 'max' or 'min'.
+        :param strands: Optional strand of each region. Regions on the '-'
+            strand are reversed.
+        :param int workers: Number of chromosomes to read at the same time.
+        """
+
+        if summary not in SUMMARIES:
+            raise ValueError('Unknown signal summary "{0}", expected one of '
+                             '{1}'.format(summary, ', '.join(SUMMARIES)))
+
+        def fetch_chrom(chrom, chrom_starts, chrom_stops):
+
+            """Read the regions on one chromosome."""
+
+            from pybedtools import Interval
+
+            chrom_size = self.chrom_sizes.get(chrom, 0)
+            matrix = np.zeros((len(chrom_starts), bins))
+
+            bigwig = pyBigWig.open(self.path)
+
+            try:
+                for row, (start, stop) in enumerate(zip(chrom_starts,
+                                                        chrom_stops)):
+
+                    start, stop = int(start), int(stop)
+
+                    if start >= chrom_size:
+                        continue
+
+                    if stop - start <= MAX_RUNS_WIDTH:
+                        runs = np.array(
+                            bigwig.intervals(chrom, start,
+                                             min(stop, chrom_size)) or [],
+                            dtype=np.float64).reshape(-1, 3)
+                        matrix[row] = summarise_signal(
+                            SignalArrays(runs[:, 0], runs[:, 1], runs[:, 2]),
+                            start, stop, bins)[summary]
+                    elif stop <= chrom_size:
+                        matrix[row] = np.array(
+                            bigwig.stats(chrom, start, stop, type=summary,
+                                         nBins=bins), dtype=np.float64)
+                    else:
+                        matrix[row] = self.local_summaries(
+                            Interval(chrom, start, stop), bins,
+                            (summary,))[1][summary]
+            finally:
+                bigwig.close()
+
+            return np.nan_to_num(matrix)
+
+        return by_chromosome(fetch_chrom, chroms, starts, stops, bins,
+                             strands, workers)
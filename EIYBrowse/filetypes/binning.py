@@ -0,0 +1,359 @@
+"""The binning module summarises a genomic signal into equal-width bins,
+as needed by the ``local_coverage`` method of signal filetypes such as
+:class:`~EIYBrowse.filetypes.bigwig.BigWigFile` and
+:class:`~EIYBrowse.filetypes.bedgraph.BedGraphArrays`.
+
+A signal is held as a :class:`SignalArrays` object: runs of constant value
+given by sorted, non-overlapping start and stop positions, as in a
+bedGraph file. Summaries of the same signal at a coarser resolution (zoom
+levels) are held in the same way, with the mean, maximum and minimum of
+each zoom bin kept separately.
+
+Every run is split at the bin edges it crosses, so that each piece lies
+in exactly one bin, and the pieces are then reduced per bin with
+:func:`numpy.bincount` and :meth:`numpy.ufunc.reduceat`. A region is
+binned in time proportional to the number of runs plus the number of bins,
+without a Python loop over either.
+
+Many regions on the same chromosome (e.g. all the peaks or transcription
+start sites for a metaplot) can be binned together by
+:func:`matrix_means`, and :func:`coverage_matrix` fetches a batch of
+regions from any signal datafile, in parallel across chromosomes.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+
+SUMMARIES = ('mean', 'max', 'min')
+
+# Fewest zoom bins that must fit in each bin for a zoom level to be used
+MIN_ZOOM_BINS = 4
+
+
+class SignalArrays(object):
+
+    """Runs of signal on one chromosome, held as parallel arrays."""
+
+    def __init__(self, starts, stops, means, maxes=None, mins=None):
+
+        """Create a new SignalArrays object.
+
+        :param starts: Start position of each run, in increasing order.
+        :param stops: End position of each run. Runs must not overlap.
+        :param means: Value of each run, or the mean value for zoom levels.
+        :param maxes: Maximum value within each run, if different from the
+            mean (i.e. for zoom levels).
+        :param mins: Minimum value within each run, if different from the
+            mean (i.e. for zoom levels).
+        """
+
+        self.starts, self.stops = np.asarray(starts), np.asarray(stops)
+        self.means = np.asarray(means)
+        self.maxes = self.means if maxes is None else np.asarray(maxes)
+        self.mins = self.means if mins is None else np.asarray(mins)
+
+    def __len__(self):
+
+        return len(self.starts)
+
+    def region(self, start, stop):
+
+        """Return the runs overlapping start-stop.
+
+        As runs are sorted and do not overlap, both the starts and the
+        stops are in increasing order, so the runs are found by binary
+        search. Memory-mapped arrays are only read over the returned slice.
+        """
+
+        first = np.searchsorted(self.stops, start, 'right')
+        last = np.searchsorted(self.starts, stop, 'left')
+
+        return SignalArrays(self.starts[first:last], self.stops[first:last],
+                            self.means[first:last], self.maxes[first:last],
+                            self.mins[first:last])
+
+
+def summarise_signal(signal, start, stop, bins):
+
+    """Summarise a signal into equal-width bins between start and stop.
+
+    Positions not covered by any run are ignored, so the mean is taken over
+    covered positions only (as for bigWig summaries). Bins with no
+    coverage at all are given a value of zero.
+
+    :param signal: Runs of signal to summarise.
+    :type signal: :class:`SignalArrays`
+    :param int start: Start of the first bin.
+    :param int stop: End of the last bin.
+    :param int bins: Number of bins.
+    :returns: Dictionary with the start position of each bin under 'x', the
+        number of covered positions in each bin under 'covered', and the
+        binned signal under each of the names in :data:`SUMMARIES`.
+    """
+
+    step = float(stop - start) / bins
+
+    run_starts = np.clip(signal.starts, start, stop).astype(np.float64)
+    run_stops = np.clip(signal.stops, start, stop).astype(np.float64)
+
+    # Bins spanned by each run, and the number of pieces it is split into
+    first = np.clip(np.floor((run_starts - start) / step).astype(np.int64),
+                    0, bins - 1)
+    last = np.clip(np.ceil((run_stops - start) / step).astype(np.int64) - 1,
+                   first, bins - 1)
+    counts = np.where(run_stops > run_starts, last - first + 1, 0)
+
+    runs = np.repeat(np.arange(len(counts)), counts)
+    piece_bins = (first[runs] + np.arange(len(runs)) -
+                  np.repeat(np.cumsum(counts) - counts, counts))
+
+    lengths = (np.minimum(run_stops[runs], start + (piece_bins + 1) * step) -
+               np.maximum(run_starts[runs], start + piece_bins * step))
+
+    covered = np.bincount(piece_bins, lengths, minlength=bins)
+    totals = np.bincount(piece_bins, lengths * signal.means[runs],
+                         minlength=bins)
+
+    summary = {'x': start + np.arange(bins) * step,
+               'covered': covered,
+               'mean': np.divide(totals, covered, out=np.zeros(bins),
+                                 where=covered > 0),
+               'max': np.zeros(bins),
+               'min': np.zeros(bins)}
+
+    if len(runs):
+        # Pieces are in bin order, as the runs are sorted
+        groups = np.flatnonzero(np.diff(piece_bins, prepend=-1))
+        summary['max'][piece_bins[groups]] = np.maximum.reduceat(
+            signal.maxes[runs], groups)
+        summary['min'][piece_bins[groups]] = np.minimum.reduceat(
+            signal.mins[runs], groups)
+
+    return summary
+
+
+def bin_signal(signal, start, stop, bins, summary='mean'):
+
+    """Summarise a signal into equal-width bins, in the same format as the
+    ``local_coverage`` method of the metaseq genomic signal classes.
+
+    :param signal: Runs of signal to summarise.
+    :type signal: :class:`SignalArrays`
+    :param int start: Start of the first bin.
+    :param int stop: End of the last bin.
+    :param int bins: Number of bins.
+    :param str summary: One of :data:`SUMMARIES`.
+    :returns: Arrays of bin start positions and binned signal.
+    """
+
+    if summary not in SUMMARIES:
+        raise ValueError('Unknown signal summary "{0}", expected one of '
+                         '{1}'.format(summary, ', '.join(SUMMARIES)))
+
+    summaries = summarise_signal(signal, start, stop, bins)
+
+    return summaries['x'], summaries[summary]
+
+
+def zoom_level(signal, zoom):
+
+    """Summarise a signal into bins of zoom positions, starting from
+    position 0, and return the bins with any coverage as a new
+    :class:`SignalArrays`. Each zoom bin becomes a run starting at the
+    start of the bin.
+
+    :param signal: Runs of signal to summarise.
+    :type signal: :class:`SignalArrays`
+    :param int zoom: Width of each zoom bin.
+    """
+
+    if not len(signal):
+        return SignalArrays([], [], [], [], [])
+
+    bins = int(np.ceil(signal.stops[-1] / float(zoom)))
+
+    summaries = summarise_signal(signal, 0, bins * zoom, bins)
+
+    covered = np.flatnonzero(summaries['covered'])
+    starts = covered * zoom
+
+    # Each zoom bin is stored as a run as long as its covered positions, so
+    # that means taken over several zoom bins are weighted correctly
+    stops = starts + np.rint(summaries['covered'][covered]).astype(np.int64)
+
+    return SignalArrays(starts, stops,
+                        summaries['mean'][covered],
+                        summaries['max'][covered],
+                        summaries['min'][covered])
+
+
+def choose_zoom(zooms, start, stop, bins):
+
+    """Choose the coarsest zoom level that can be used to bin start-stop
+    into bins, or None if the full resolution signal is needed.
+
+    A zoom level is only used if each bin covers at least MIN_ZOOM_BINS of
+    its zoom bins, so that zoom bins straddling the bin edges do not
+    noticeably blur the signal.
+
+    :param list zooms: Widths of the available zoom bins.
+    """
+
+    step = float(stop - start) / bins
+
+    usable = [zoom for zoom in zooms if zoom * MIN_ZOOM_BINS <= step]
+
+    return max(usable) if usable else None
+
+
+def matrix_means(signal, starts, stops, bins):
+
+    """Summarise the mean of a signal into equal-width bins for many
+    regions on the same chromosome at once.
+
+    Rather than binning each region in turn, the covered positions and the
+    signal summed over them are accumulated along the chromosome, and read
+    off at every bin edge of every region by linear interpolation, as both
+    are piecewise linear between the run boundaries. As for
+    :func:`summarise_signal`, the mean is taken over covered positions
+    only.
+
+    :param signal: Runs of signal to summarise.
+    :type signal: :class:`SignalArrays`
+    :param starts: Start of each region.
+    :param stops: End of each region.
+    :param int bins: Number of bins to divide each region into.
+    :returns: Array of shape (regions, bins).
+    """
+
+    starts = np.asarray(starts, dtype=np.float64)
+    stops = np.asarray(stops, dtype=np.float64)
+
+    if not len(signal):
+        return np.zeros((len(starts), bins))
+
+    lengths = (signal.stops - signal.starts).astype(np.float64)
+
+    covered = np.concatenate([[0.], np.cumsum(lengths)])
+    totals = np.concatenate([[0.], np.cumsum(lengths * signal.means)])
+
+    # Boundaries of the runs, in order, and the running sums at each
+    positions = np.column_stack([signal.starts, signal.stops]).ravel()
+    covered = np.column_stack([covered[:-1], covered[1:]]).ravel()
+    totals = np.column_stack([totals[:-1], totals[1:]]).ravel()
+
+    edges = (starts[:, np.newaxis] + np.arange(bins + 1) *
+             ((stops - starts) / bins)[:, np.newaxis])
+
+    bin_covered = np.diff(np.interp(edges, positions, covered), axis=1)
+    bin_totals = np.diff(np.interp(edges, positions, totals), axis=1)
+
+    return np.divide(bin_totals, bin_covered,
+                     out=np.zeros_like(bin_totals), where=bin_covered > 0)
+
+
+def by_chromosome(fetch_chrom, chroms, starts, stops, bins,
+                  strands=None, workers=None):
+
+    """Build a regions x bins matrix of signal, by fetching the regions on
+    each chromosome together, with the chromosomes fetched in parallel on a
+    pool of threads.
+
+    :param fetch_chrom: Function taking a chromosome name and arrays of
+        the starts and stops of the regions on it, and returning their
+        binned signal as an array of shape (regions, bins).
+    :param chroms: Chromosome of each region.
+    :param starts: Start of each region.
+    :param stops: End of each region.
+    :param int bins: Number of bins to divide each region into.
+    :param strands: Optional strand of each region. The bins of regions on
+        the '-' strand are reversed, so that every row runs 5' to 3'.
+    :param int workers: Number of chromosomes to fetch at the same time.
+    :returns: Array of shape (regions, bins), in the order of the regions.
+    """
+
+    chroms = np.asarray(chroms)
+    starts, stops = np.asarray(starts), np.asarray(stops)
+
+    matrix = np.zeros((len(chroms), bins))
+
+    rows = {chrom: np.flatnonzero(chroms == chrom)
+            for chrom in np.unique(chroms)}
+
+    def fetch(chrom):
+
+        """Fetch the regions on one chromosome into their rows."""
+
+        chrom_rows = rows[chrom]
+        matrix[chrom_rows] = fetch_chrom(chrom, starts[chrom_rows],
+                                         stops[chrom_rows])
+
+    with ThreadPoolExecutor(workers) as executor:
+        list(executor.map(fetch, rows))
+
+    if strands is not None:
+        minus = np.asarray(strands) == '-'
+        matrix[minus] = matrix[minus, ::-1]
+
+    return matrix
+
+
+def coverage_matrix(datafile, chroms, starts, stops, bins, summary='mean',
+                    strands=None, workers=None):
+
+    """Return the binned signal of a datafile over many regions, as a
+    regions x bins matrix.
+
+    Datafiles with their own ``coverage_matrix`` method (e.g.
+    :class:`~EIYBrowse.filetypes.bedgraph.BedGraphArrays` or
+    :class:`~EIYBrowse.filetypes.bigwig.BigWigFile`) are asked for the
+    whole batch at once, with the chromosomes in parallel. For any other
+    datafile with a ``local_coverage`` method, such as the metaseq genomic
+    signal classes, each region is fetched in turn, holding the datafile's
+    :func:`~EIYBrowse.datacache.datafile_lock`. Their file handles cannot be
+    shared between threads, so workers is ignored for them. The maximum and
+    minimum of such datafiles are approximated from the means of smaller
+    bins, as by :meth:`~EIYBrowse.datacache.SignalCache.local_summaries`.
+
+    The parameters are as for :func:`by_chromosome`, with summary one of
+    :data:`SUMMARIES`.
+    """
+
+    if hasattr(datafile, 'coverage_matrix'):
+        return datafile.coverage_matrix(chroms, starts, stops, bins,
+                                        summary=summary, strands=strands,
+                                        workers=workers)
+
+    if summary not in SUMMARIES:
+        raise ValueError('Unknown signal summary "{0}", expected one of '
+                         '{1}'.format(summary, ', '.join(SUMMARIES)))
+
+    from pybedtools import Interval
+    from ..datacache import SUMMARY_OVERSAMPLING, datafile_lock
+
+    oversampling = 1 if summary == 'mean' else SUMMARY_OVERSAMPLING
+    reduce_samples = {'mean': np.mean, 'max': np.max, 'min': np.min}[summary]
+
+    def fetch_region(chrom, start, stop):
+
+        """Fetch the signal over one region."""
+
+        with datafile_lock(datafile):
+            return datafile.local_coverage(
+                Interval(chrom, int(start), int(stop)),
+                bins=bins * oversampling)[1]
+
+    def fetch_chrom(chrom, chrom_starts, chrom_stops):
+
+        """Fetch the regions on one chromosome one by one."""
+
+        samples = np.array([fetch_region(chrom, start, stop)
+                            for start, stop in zip(chrom_starts,
+                                                   chrom_stops)])
+
+        return reduce_samples(samples.reshape(-1, bins, oversampling),
+                              axis=2)
+
+    return by_chromosome(fetch_chrom, chroms, starts, stops, bins,
+                         strands, workers=1)
@@ -0,0 +1,128 @@
+"""The gene_index module provides a compact, array-backed alternative to
+:class:`~EIYBrowse.filetypes.gffutils_db.GffutilsDb` for looking up genes.
+
+A gene index is a single NumPy ``.npz`` file, built from a gffutils
+database or a GTF file by :mod:`EIYBrowse.importers.GeneIndex`. It holds
+one entry per gene, sorted by chromosome and start position:
+
+* ``chroms`` and ``chrom_offsets`` give the name of each chromosome and
+  the slice of the gene arrays that belongs to it, and ``max_lengths``
+  gives the length of the longest gene on each chromosome.
+* ``starts``, ``stops`` and ``strands`` give the span of each gene.
+* ``name_data`` holds the UTF-8 encoded gene names back to back, and
+  ``name_offsets`` gives the start of each name.
+* ``exon_offsets``, ``exon_starts`` and ``exon_stops`` hold the exons of
+  the longest isoform of each gene in compressed sparse row format, so the
+  exons of gene i are ``exon_starts[exon_offsets[i]:exon_offsets[i + 1]]``.
+
+Genes overlapping a region are found with two binary searches over the
+sorted start positions, and are returned as lightweight
+:class:`~EIYBrowse.filetypes.records.GeneRecord` objects.
+"""
+
+import numpy as np
+from .records import GeneRecord, ExonRecord
+
+
+GENE_INDEX_ARRAYS = ('chroms', 'chrom_offsets', 'max_lengths',
+                     'starts', 'stops', 'strands',
+                     'name_data', 'name_offsets',
+                     'exon_offsets', 'exon_starts', 'exon_stops')
+
+
+class GeneIndexFile(object):
+
+    """The GeneIndexFile class handles the retrieval of gene level
+    information from a gene index file."""
+
+    def __init__(self, index_path):
+
+        """Load a gene index.
+
+        :param str index_path: Path to the .npz gene index.
+        """
+
+        super(GeneIndexFile, self).__init__()
+
+        self.path = index_path
+
+        with np.load(index_path) as index:
+            for array_name in GENE_INDEX_ARRAYS:
+                setattr(self, array_name, index[array_name])
+
+        self.chrom_index = {str(chrom): i
+                            for i, chrom in enumerate(self.chroms)}
+
+    def gene_indices(self, region):
+
+        """Return the indices of all the genes overlapping region.
+
+        :param region: Genomic region to find genes in
+        :type region: :class:`pybedtools.Interval`
+        :returns: Array of indices into the gene arrays.
+        """
+
+        chrom_i = self.chrom_index.get(region.chrom)
+
+        if chrom_i is None:
+            return np.array([], dtype=int)
+
+        lo, hi = self.chrom_offsets[chrom_i], self.chrom_offsets[chrom_i + 1]
+        chrom_starts = self.starts[lo:hi]
+
+        # No gene starting more than max_length before the region can reach
+        # into it
+        first = lo + np.searchsorted(
+            chrom_starts, region.start - self.max_lengths[chrom_i], 'left')
+        last = lo + np.searchsorted(chrom_starts, region.stop, 'right')
+
+        overlapping = np.nonzero(self.stops[first:last] >= region.start)[0]
+
+        return first + overlapping
+
+    def name(self, i):
+
+        """Return the name of gene i."""
+
+        return self.name_data[
+            self.name_offsets[i]:self.name_offsets[i + 1]].tobytes().decode(
+                'utf-8')
+
+    def iter_gene_loci(self):
+
+        """Iterator returning the (name, chrom, start, stop) of every gene
+        in the index, used to build a
+        :class:`~EIYBrowse.nameindex.GeneNameIndex`. Start positions are
+        converted to 0-based co-ordinates.
+        """
+
+        for chrom_i, chrom in enumerate(self.chroms.tolist()):
+            for i in range(self.chrom_offsets[chrom_i],
+                           self.chrom_offsets[chrom_i + 1]):
+                yield (self.name(i), chrom,
+                       int(self.starts[i]) - 1, int(self.stops[i]))
+
+    def get_genes(self, region):
+
+        """Iterator returning information about genes in the genomic region
+        specified by region, in the same format as
+        :meth:`~EIYBrowse.filetypes.gffutils_db.GffutilsDb.get_genes`.
+
+        :param region: Genomic region to find genes in
+        :type region: :class:`pybedtools.Interval`
+        """
+
+        for i in self.gene_indices(region).tolist():
+
+            exon_lo, exon_hi = self.exon_offsets[i], self.exon_offsets[i + 1]
+
+            exons = [ExonRecord(region.chrom, start, stop) for start, stop in
+                     zip(self.exon_starts[exon_lo:exon_hi].tolist(),
+                         self.exon_stops[exon_lo:exon_hi].tolist())]
+
+            yield {'gene': GeneRecord(region.chrom,
+                                      int(self.starts[i]),
+                                      int(self.stops[i]),
+                                      self.strands[i].decode('ascii'),
+                                      self.name(i)),
+                   'exons': exons}
@@ -3,9 +3,60 @@
 of calling the class directly should make it easier to add
 support for other methods of storing gene information
 in the future.
+
+SQLite connections can only be used by the thread that opened them, and
+datafiles may be opened on one thread (e.g. by
+:meth:`~EIYBrowse.core.Browser.warmup`) and read on others (e.g. by the
+prefetcher), so each thread opens the database for itself.
+"""
+
+from collections import defaultdict
+import threading
+from .records import gene_name
+
+
+# Feature types that may represent a transcript of a gene, in order of
+# preference
+TRANSCRIPT_TYPES = ('mRNA', 'transcript')
+
+# SQLite limits the number of parameters in a single query
+MAX_QUERY_IDS = 900
+
+_CHILDREN_QUERY = """
+    SELECT DISTINCT relations.parent AS parent,
+           features.id, features.seqid, features.source,
+           features.featuretype, features.start, features.end,
+           features.score, features.strand, features.frame,
+           features.attributes, features.extra, features.bin,
+           features.rowid AS file_order
+    FROM relations JOIN features ON features.id = relations.child
+    WHERE relations.parent IN ({parents})
+    AND features.featuretype IN ({featuretypes})
+    ORDER BY features.start
 """
 
-import gffutils
+
+def longest_transcript(transcripts):
+
+    """Return the longest transcript, preferring mRNAs over other
+    transcript types. Returns None if there are no transcripts.
+
+    :param transcripts: Transcripts of a single gene, which need
+        featuretype, start and stop attributes.
+    """
+
+    for featuretype in TRANSCRIPT_TYPES:
+
+        candidates = [t for t in transcripts
+                      if t.featuretype == featuretype]
+
+        if candidates:
+            # Search backwards so that ties go to the last transcript
+            return max(reversed(candidates),
+                       key=lambda t: t.stop - t.start)
+
+    return None
+
 
 class GffutilsDb(object):
 
@@ -21,7 +72,37 @@ class GffutilsDb(object):
         :param str db_path: Path to gff_utils database
         """
 
-        self.gene_db = gffutils.FeatureDB(db_path)
+        self.path = db_path
+        self._local = threading.local()
+
+        # Open the database now, so that a missing or invalid database is
+        # reported straight away
+        self.gene_db  # pylint: disable=pointless-statement
+
+    @property
+    def gene_db(self):
+
+        """The :class:`gffutils.FeatureDB` of the calling thread, which is
+        opened the first time the thread uses it."""
+
+        gene_db = getattr(self._local, 'gene_db', None)
+
+        if gene_db is None:
+            import gffutils
+            gene_db = self._local.gene_db = gffutils.FeatureDB(self.path)
+
+        return gene_db
+
+    def iter_gene_loci(self):
+
+        """Iterator returning the (name, chrom, start, stop) of every gene
+        in the database, used to build a
+        :class:`~EIYBrowse.nameindex.GeneNameIndex`. Start positions are
+        converted to 0-based co-ordinates.
+        """
+
+        for gene in self.gene_db.features_of_type('gene'):
+            yield gene_name(gene), gene.seqid, gene.start - 1, gene.end
 
     def get_genes(self, region):
 
@@ -33,31 +114,66 @@ class GffutilsDb(object):
         a list of :class:`pybedtools.Interval` objects giving the genomic
         span of each exon in the longest isoform of the gene.
 
+        Rather than querying the children of each gene in turn, all of the
+        transcripts of all the genes are fetched together by
+        :meth:`_children`, followed by all of the exons of the chosen
+        transcripts, so the number of queries does not depend on the number
+        of genes in the region.
+
         :param region: Genomic region to convert to an index
         :type region: :class:`pybedtools.Interval`
         """
 
-        gene_information = self.gene_db.region(region,
-                                               completely_within=False,
-                                               featuretype='gene')
+        genes = list(self.gene_db.region(region,
+                                         completely_within=False,
+                                         featuretype='gene'))
+
+        transcripts = self._children([gene.id for gene in genes],
+                                     TRANSCRIPT_TYPES)
 
-        for gene in gene_information:
+        longest_transcripts = {}
 
-            #FIXME: specify the GFF mrna featuretype, this is a kludge
-            try:
-                mrnas = list(self.gene_db.children(gene.id, featuretype='mRNA'))
+        for gene in genes:
+            longest = longest_transcript(transcripts[gene.id])
+            if longest is not None:
+                longest_transcripts[gene.id] = longest.id
 
-                longest_mrna = sorted(mrnas, key=lambda m: m.stop - m.start).pop()
+        exons = self._children(list(longest_transcripts.values()), ('exon',))
 
-            except IndexError:
+        for gene in genes:
 
-                mrnas = list(self.gene_db.children(gene.id, featuretype='transcript'))
+            yield {'gene': gene,
+                   'exons': exons[longest_transcripts.get(gene.id)]}
+
+    def _children(self, parent_ids, featuretypes):
 
-                longest_mrna = sorted(mrnas, key=lambda m: m.stop - m.start).pop()
+        """Fetch the children of many features at once.
 
+        :param list parent_ids: IDs of the parent features.
+        :param tuple featuretypes: Feature types of the children to return.
+        :returns: Dictionary mapping each parent ID to a list of its
+            children, as :class:`gffutils.Feature` objects sorted by start
+            position.
+        """
 
-            exons = self.gene_db.children(longest_mrna.id, featuretype='exon')
+        children = defaultdict(list)
 
-            yield {'gene': gene,
-                   'exons': exons}
+        for i in range(0, len(parent_ids), MAX_QUERY_IDS):
+
+            chunk = parent_ids[i:i + MAX_QUERY_IDS]
+
+            query = _CHILDREN_QUERY.format(
+                parents=', '.join('?' * len(chunk)),
+                featuretypes=', '.join('?' * len(featuretypes)))
+
+            rows = self.gene_db.conn.execute(
+                query, tuple(chunk) + tuple(featuretypes))
+
+            for row in rows:
+                fields = dict(zip(row.keys(), row))
+                parent = fields.pop('parent')
+                # pylint: disable=protected-access, star-args
+                children[parent].append(
+                    self.gene_db._feature_returner(**fields))
 
+        return children
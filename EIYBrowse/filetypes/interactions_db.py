@@ -1,4 +1,5 @@
 import sqlite3
+import threading
 import pybedtools
 import numpy as np
 from pandas.io import sql
@@ -11,7 +12,8 @@ class InteractionsDbFile(object):
     def __init__(self, interactions_db):
         super(InteractionsDbFile, self).__init__()
 
-        self.db = sqlite3.connect(interactions_db)
+        self.path = interactions_db
+        self._local = threading.local()
 
         self.pos_query = """SELECT i FROM windows
                             WHERE chrom = '{chrom}' AND start <= {start}
@@ -21,6 +23,20 @@ class InteractionsDbFile(object):
                             WHERE i = '{i}' AND chrom = '{chrom}'
                             LIMIT 1;"""
 
+    @property
+    def db(self):
+
+        """SQLite connection of the calling thread. Connections can only be
+        used by the thread that opened them, so each thread opens its own
+        the first time it queries the database."""
+
+        db = getattr(self._local, 'db', None)
+
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path)
+
+        return db
+
     def get_data_from_bins(self, chrom, start, stop):
 
         query_string = """select x, y, value from {chrom}
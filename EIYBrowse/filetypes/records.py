@@ -0,0 +1,111 @@
+"""The records module defines lightweight gene and exon records, which can
+be returned by gene filetypes in place of :class:`gffutils.Feature`
+objects.
+
+Records only hold the attributes that
+:class:`~EIYBrowse.tracks.genes.GeneTrack` needs, and are much cheaper
+to create than full features with their attribute dictionaries.
+
+:class:`IntervalArrays` holds many intervals at once as NumPy arrays, for
+datafiles such as :class:`~EIYBrowse.filetypes.bed_index.BedIndexFile`
+that can return whole regions without creating an object per interval.
+"""
+
+from collections import namedtuple
+import numpy as np
+
+
+def gene_name(gene):
+
+    """Return the name label to display for a gene.
+
+    :param gene: Gene object
+    :type gene: :class:`gffutils.Feature` or :class:`GeneRecord`
+    """
+
+    # FIXME: need to be able to specify the gene name attribute to look for
+    try:
+        return gene.attributes['Name'][0]
+    except KeyError:
+        return gene.attributes['gene_id'][0]
+
+
+class GeneRecord(namedtuple('GeneRecord',
+                            ['chrom', 'start', 'stop', 'strand', 'name'])):
+
+    """Genomic span and name of a gene.
+
+    Co-ordinates follow the same convention as the source the record was
+    built from (1-based and inclusive for GFF/GTF derived records).
+    """
+
+    __slots__ = ()
+
+    @property
+    def end(self):
+        """Alias for stop, as used by :class:`pybedtools.Interval`"""
+        return self.stop
+
+    @property
+    def attributes(self):
+        """Minimal attribute dictionary, in the same format as
+        :attr:`gffutils.Feature.attributes`"""
+        return {'Name': [self.name], 'gene_id': [self.name]}
+
+
+class ExonRecord(namedtuple('ExonRecord', ['chrom', 'start', 'stop'])):
+
+    """Genomic span of a single exon."""
+
+    __slots__ = ()
+
+    @property
+    def end(self):
+        """Alias for stop, as used by :class:`pybedtools.Interval`"""
+        return self.stop
+
+
+class IntervalArrays(object):
+
+    """Intervals on a single chromosome, held as parallel arrays rather
+    than as one object per interval, so that they can be filtered and
+    drawn without a Python loop over the intervals.
+    """
+
+    def __init__(self, chrom, starts, stops, names):
+
+        """Create a new IntervalArrays object.
+
+        :param str chrom: Chromosome of the intervals.
+        :param starts: Array of interval start positions.
+        :param stops: Array of interval end positions.
+        :param names: Sequence of interval names, or a function returning
+            one. A function is only called the first time the names are
+            used, so names that are never drawn are never decoded.
+        """
+
+        self.chrom = chrom
+        self.starts, self.stops = np.asarray(starts), np.asarray(stops)
+        self._names = names
+
+    def __len__(self):
+
+        return len(self.starts)
+
+    @property
+    def names(self):
+        """List of interval names, with '.' for unnamed intervals"""
+        if callable(self._names):
+            self._names = self._names()
+        return self._names
+
+    @classmethod
+    def from_features(cls, chrom, features):
+
+        """Convert a list of :class:`pybedtools.Interval` objects (e.g. from
+        a metaseq adapter) into arrays."""
+
+        return cls(chrom,
+                   np.array([f.start for f in features], dtype=np.int64),
+                   np.array([f.stop for f in features], dtype=np.int64),
+                   [f.name for f in features])
@@ -0,0 +1,330 @@
+"""The tabix_gff module reads genes straight from a bgzip compressed,
+tabix indexed GTF or GFF3 file, without first building a
+:class:`gffutils.FeatureDB` database.
+
+The annotation only needs to be sorted, compressed and indexed once::
+
+    (grep '^#' genes.gff3; grep -v '^#' genes.gff3 | sort -k1,1 -k4,4n) \\
+        | bgzip > genes.gff3.gz
+    tabix -p gff genes.gff3.gz
+
+When genes are requested, only the records overlapping the region are
+read, and genes, transcripts and exons are assembled from them on the fly:
+
+* In GFF3 files, transcripts are linked to their gene and exons to their
+  transcript through the ID and Parent attributes.
+* In GTF files, records are linked through the gene_id and transcript_id
+  attributes. Genes and transcripts that have no record of their own are
+  inferred from the span of their exons, as gffutils does when building a
+  database.
+
+A gene overlapping the region can have transcripts and exons that lie
+outside it, so the window that is read is widened to the full extent of
+every gene found, and read again, until no gene extends beyond it. For
+genes inferred from their exons, the window is kept
+:data:`INFERRED_GENE_MARGIN` wider than the exons found so far, so only
+introns longer than the margin can hide part of such a gene.
+
+Assembled genes are cached in fixed-size blocks of each chromosome, so
+panning around a region only assembles the newly uncovered blocks.
+"""
+
+from collections import OrderedDict, namedtuple
+import threading
+import pysam
+
+from .gffutils_db import TRANSCRIPT_TYPES, longest_transcript
+from .records import GeneRecord, ExonRecord
+
+
+# Size of the chromosome blocks that assembled genes are cached in
+BLOCK_SIZE = 1000000
+
+# Distance to keep reading past the known exons of a gene that has no
+# record of its own, in case it has more exons further out
+INFERRED_GENE_MARGIN = 1000000
+
+_Transcript = namedtuple('_Transcript',
+                         ['id', 'featuretype', 'start', 'stop', 'gene'])
+
+
+def parse_attributes(field):
+
+    """Parse the attributes column of a GTF or GFF3 record into a dictionary
+    of lists, in the same format as :attr:`gffutils.Feature.attributes`.
+
+    :param str field: Ninth column of a GTF (``key "value";``) or GFF3
+        (``key=value;``) record.
+    """
+
+    attributes = {}
+
+    for item in field.strip().split(';'):
+
+        item = item.strip()
+
+        if not item:
+            continue
+
+        key, sep, value = item.partition('=')
+
+        if sep and ' ' not in key:
+            values = value.split(',')
+        else:
+            key, _, value = item.partition(' ')
+            values = [value.strip().strip('"')]
+
+        attributes.setdefault(key, []).extend(values)
+
+    return attributes
+
+
+def _first(attributes, *keys):
+
+    """Return the first value of the first of keys found in attributes."""
+
+    for key in keys:
+        if key in attributes:
+            return attributes[key][0]
+
+    return None
+
+
+def _extend(spans, key, start, stop, *extra):
+
+    """Widen the [start, stop, extra...] span stored under key to cover
+    start-stop. Any extra values are only stored for a new span."""
+
+    if key in spans:
+        span = spans[key]
+        span[0], span[1] = min(span[0], start), max(span[1], stop)
+    else:
+        spans[key] = [start, stop] + list(extra)
+
+
+class TabixGffFile(object):
+
+    """The TabixGffFile class handles the retrieval of gene level
+    information from a tabix indexed GTF or GFF3 file."""
+
+    def __init__(self, file_path, max_blocks=32):
+
+        """Open a tabix indexed annotation file.
+
+        :param str file_path: Path to the bgzip compressed GTF or GFF3 file.
+            The tabix index must be next to it.
+        :param int max_blocks: Number of chromosome blocks of assembled
+            genes to keep in memory.
+        """
+
+        super(TabixGffFile, self).__init__()
+
+        self.path = file_path
+        self.max_blocks = max_blocks
+
+        self.tabix = pysam.TabixFile(file_path)
+        self.contigs = set(self.tabix.contigs)
+
+        self._blocks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _read(self, chrom, start, stop):
+
+        """Read the records between start and stop (1-based, inclusive)
+        and link them together.
+
+        :returns: Tuple of (genes, transcripts, exons). genes maps each gene
+            ID to a dictionary with 'start', 'stop', 'strand' and 'name'
+            keys, transcripts maps each gene ID to a list of
+            :class:`_Transcript` objects, and exons maps each transcript ID
+            to a list of (start, stop) pairs.
+        """
+
+        genes = {}
+        gene_spans, transcript_spans = {}, {}
+        transcripts = {}
+        exons = {}
+
+        for line in self.tabix.fetch(chrom, max(start - 1, 0), stop):
+
+            fields = line.split('\t')
+
+            if len(fields) < 9:
+                continue
+
+            featuretype = fields[2]
+
+            if featuretype != 'gene' and featuretype != 'exon' and \
+                    featuretype not in TRANSCRIPT_TYPES:
+                continue
+
+            rec_start, rec_stop = int(fields[3]), int(fields[4])
+            attributes = parse_attributes(fields[8])
+
+            if featuretype == 'gene':
+                gene_id = _first(attributes, 'ID', 'gene_id')
+                genes[gene_id] = {
+                    'start': rec_start, 'stop': rec_stop,
+                    'strand': fields[6],
+                    'name': _first(attributes, 'Name', 'gene_id', 'ID')}
+
+            elif featuretype in TRANSCRIPT_TYPES:
+                transcript_id = _first(attributes, 'ID', 'transcript_id')
+                transcripts[transcript_id] = _Transcript(
+                    transcript_id, featuretype, rec_start, rec_stop,
+                    _first(attributes, 'Parent', 'gene_id'))
+
+            else:
+                parents = attributes.get('Parent',
+                                         attributes.get('transcript_id', []))
+                for parent in parents:
+                    exons.setdefault(parent, []).append((rec_start, rec_stop))
+
+                # GTF files may leave out gene and transcript records
+                gene_id = _first(attributes, 'gene_id')
+                if gene_id is not None and 'Parent' not in attributes:
+                    for parent in parents:
+                        _extend(transcript_spans, parent,
+                                rec_start, rec_stop, gene_id)
+                    _extend(gene_spans, gene_id,
+                            rec_start, rec_stop, fields[6])
+
+        for transcript_id, span in transcript_spans.items():
+            if transcript_id not in transcripts:
+                transcripts[transcript_id] = _Transcript(
+                    transcript_id, 'transcript', span[0], span[1], span[2])
+
+        for gene_id, span in gene_spans.items():
+            if gene_id not in genes:
+                genes[gene_id] = {'start': span[0], 'stop': span[1],
+                                  'strand': span[2], 'name': gene_id,
+                                  'inferred': True}
+
+        gene_transcripts = {}
+        for transcript in sorted(transcripts.values(),
+                                 key=lambda t: t.start):
+            gene_transcripts.setdefault(transcript.gene, []).append(
+                transcript)
+
+        return genes, gene_transcripts, exons
+
+    def _assemble(self, chrom, start, stop):
+
+        """Return every gene overlapping start-stop (1-based, inclusive) in
+        the same format as :meth:`get_genes`, widening the window that is
+        read until it covers all of their transcripts and exons."""
+
+        window_start, window_stop = start, stop
+
+        while True:
+
+            genes, transcripts, exons = self._read(
+                chrom, window_start, window_stop)
+
+            overlapping = [(gene_id, gene) for gene_id, gene in genes.items()
+                           if gene['start'] <= stop and gene['stop'] >= start]
+
+            if not overlapping:
+                return []
+
+            # The span of an inferred gene is only known once no more of its
+            # exons are found within a margin either side of it
+            margins = [INFERRED_GENE_MARGIN if gene.get('inferred') else 0
+                       for _, gene in overlapping]
+
+            needed_start = max(1, min(gene['start'] - margin for
+                                      (_, gene), margin in
+                                      zip(overlapping, margins)))
+            needed_stop = max(gene['stop'] + margin for
+                              (_, gene), margin in zip(overlapping, margins))
+
+            if needed_start >= window_start and needed_stop <= window_stop:
+                break
+
+            window_start = min(window_start, needed_start)
+            window_stop = max(window_stop, needed_stop)
+
+        gene_dicts = []
+
+        for gene_id, gene in sorted(overlapping,
+                                    key=lambda g: g[1]['start']):
+
+            longest = longest_transcript(transcripts.get(gene_id, []))
+            gene_exons = exons.get(longest.id, []) if longest else []
+
+            gene_dicts.append(
+                {'gene': GeneRecord(chrom, gene['start'], gene['stop'],
+                                    gene['strand'], gene['name']),
+                 'exons': [ExonRecord(chrom, exon_start, exon_stop)
+                           for exon_start, exon_stop in sorted(gene_exons)]})
+
+        return gene_dicts
+
+    def _block(self, chrom, block):
+
+        """Return the genes overlapping a block of a chromosome, assembling
+        them if the block is not cached."""
+
+        key = (chrom, block)
+
+        with self._lock:
+
+            gene_dicts = self._blocks.pop(key, None)
+
+            if gene_dicts is None:
+                gene_dicts = self._assemble(chrom, block * BLOCK_SIZE + 1,
+                                            (block + 1) * BLOCK_SIZE)
+
+            self._blocks[key] = gene_dicts
+
+            while len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+
+        return gene_dicts
+
+    def get_genes(self, region):
+
+        """Iterator returning information about genes in the genomic region
+        specified by region, in the same format as
+        :meth:`~EIYBrowse.filetypes.gffutils_db.GffutilsDb.get_genes`.
+
+        :param region: Genomic region to find genes in
+        :type region: :class:`pybedtools.Interval`
+        """
+
+        if region.chrom not in self.contigs:
+            return
+
+        first_block = max(region.start - 1, 0) // BLOCK_SIZE
+
+        for block in range(first_block, region.stop // BLOCK_SIZE + 1):
+
+            for gene_dict in self._block(region.chrom, block):
+
+                gene = gene_dict['gene']
+
+                if gene.start > region.stop or gene.stop < region.start:
+                    continue
+
+                # A gene spanning several blocks is yielded only from the
+                # block holding its (1-based) start, or from the first block
+                # if it starts before the region
+                owner = max((gene.start - 1) // BLOCK_SIZE, first_block)
+
+                if owner == block:
+                    yield gene_dict
+
+    def iter_gene_loci(self):
+
+        """Iterator returning the (name, chrom, start, stop) of every gene
+        in the file, used to build a
+        :class:`~EIYBrowse.nameindex.GeneNameIndex`. Start positions are
+        converted to 0-based co-ordinates.
+        """
+
+        for chrom in sorted(self.contigs):
+
+            genes, _, _ = self._read(chrom, 1, 2 ** 31 - 1)
+
+            for gene in genes.values():
+                yield gene['name'], chrom, gene['start'] - 1, gene['stop']
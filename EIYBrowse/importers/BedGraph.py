@@ -0,0 +1,129 @@
+"""Convert bedGraph files into folders of arrays for
+:class:`~EIYBrowse.filetypes.bedgraph.BedGraphArrays`.
+
+:func:`write_signal_arrays` writes any signal in the same format, and is
+also used to cache BAM file coverage by
+:class:`~EIYBrowse.filetypes.bam_coverage.BamCoverageFile`."""
+
+import gzip
+import logging
+import os
+import numpy as np
+
+from ..filetypes.bed_index import _header_lines
+from ..filetypes.binning import SignalArrays, zoom_level
+from ..filetypes.bedgraph import RUN_DTYPE, ZOOM_DTYPE, runs_file_name
+
+
+# Each zoom level has bins this many times wider than the level before
+ZOOM_FACTOR = 4
+
+# The first zoom level has bins this many times wider than the median run
+FIRST_ZOOM_RUNS = 4
+
+
+def read_bedgraph(bedgraph_path):
+
+    """Read the runs of a (optionally gzipped) bedGraph file.
+
+    :param str bedgraph_path: Path to the bedGraph file.
+    :returns: Iterator of (chrom, runs) tuples, where runs is a
+        :class:`~EIYBrowse.filetypes.binning.SignalArrays` object, in order
+        of chromosome name.
+    """
+
+    import pandas as pd
+
+    opener = gzip.open if bedgraph_path.endswith('.gz') else open
+
+    bedgraph = pd.read_csv(bedgraph_path, sep='\t', header=None,
+                           usecols=[0, 1, 2, 3], comment='#',
+                           skiprows=_header_lines(bedgraph_path, opener),
+                           dtype={0: str, 1: np.int64, 2: np.int64,
+                                  3: np.float64})
+
+    for chrom, runs in bedgraph.groupby(0, sort=True):
+
+        runs = runs.sort_values(1)
+
+        yield chrom, SignalArrays(runs[1].to_numpy(), runs[2].to_numpy(),
+                                  runs[3].to_numpy())
+
+
+def zoom_widths(runs):
+
+    """Return the zoom bin widths to precompute for the runs of one
+    chromosome: from FIRST_ZOOM_RUNS times the median run length, growing by
+    ZOOM_FACTOR until a single bin covers the whole chromosome."""
+
+    if not len(runs):
+        return []
+
+    zoom = FIRST_ZOOM_RUNS * max(1, int(np.median(runs.stops - runs.starts)))
+    widths = []
+
+    while zoom < runs.stops[-1]:
+        widths.append(zoom)
+        zoom *= ZOOM_FACTOR
+
+    return widths
+
+
+def write_records(path, dtype, **columns):
+
+    """Save columns as a record array with the given dtype."""
+
+    records = np.empty(len(columns['start']), dtype=dtype)
+
+    for name, values in columns.items():
+        records[name] = values
+
+    np.save(path, records)
+
+
+def write_signal_arrays(folder_path, chrom, runs):
+
+    """Write the runs of one chromosome, and its zoom levels, to a folder of
+    arrays.
+
+    :param str folder_path: Folder to write the arrays to.
+    :param str chrom: Chromosome name.
+    :param runs: Sorted, non-overlapping runs of signal.
+    :type runs: :class:`~EIYBrowse.filetypes.binning.SignalArrays`
+    """
+
+    if len(runs) and runs.stops[-1] > np.iinfo(np.int32).max:
+        raise ValueError(
+            'Chromosome {0} is too long to be stored'.format(chrom))
+
+    write_records(os.path.join(folder_path, runs_file_name(chrom)),
+                  RUN_DTYPE, start=runs.starts, stop=runs.stops,
+                  value=runs.means)
+
+    for zoom in zoom_widths(runs):
+
+        level = zoom_level(runs, zoom)
+
+        write_records(os.path.join(folder_path, runs_file_name(chrom, zoom)),
+                      ZOOM_DTYPE, start=level.starts, stop=level.stops,
+                      mean=level.means, max=level.maxes, min=level.mins)
+
+
+def bedgraph_to_arrays(bedgraph_path, folder_path):
+
+    """Convert a bedGraph file into a folder of arrays, with zoom levels.
+
+    :param str bedgraph_path: Path to the bedGraph file. Runs on each
+        chromosome must not overlap.
+    :param str folder_path: Folder to write the arrays to, which is created
+        if needed.
+    """
+
+    if not os.path.isdir(folder_path):
+        os.makedirs(folder_path)
+
+    for chrom, runs in read_bedgraph(bedgraph_path):
+
+        logging.info('Converting {0} runs on {1}'.format(len(runs), chrom))
+
+        write_signal_arrays(folder_path, chrom, runs)
@@ -0,0 +1,115 @@
+"""Build gene index files for :class:`~EIYBrowse.filetypes.gene_index.GeneIndexFile`
+from a gffutils database or a GTF file."""
+
+import logging
+import os
+import tempfile
+import numpy as np
+
+from ..filetypes.gffutils_db import GffutilsDb
+from ..filetypes.records import gene_name
+
+
+def genes_from_gffutils(db_path):
+
+    """Iterate over every gene in a gffutils database, yielding tuples of
+    (chrom, start, stop, strand, name, exons), where exons is a list of
+    (start, stop) pairs for the longest isoform."""
+
+    import pybedtools
+
+    gene_db = GffutilsDb(db_path)
+
+    chrom_extents = gene_db.gene_db.conn.execute(
+        'SELECT seqid, MAX(end) FROM features GROUP BY seqid ORDER BY seqid')
+
+    for chrom, chrom_end in chrom_extents.fetchall():
+
+        logging.info('Indexing genes on {0}'.format(chrom))
+
+        region = pybedtools.Interval(chrom, 0, chrom_end + 1)
+
+        for gene_dict in gene_db.get_genes(region):
+
+            gene = gene_dict['gene']
+
+            yield (chrom, gene.start, gene.stop, gene.strand, gene_name(gene),
+                   [(exon.start, exon.stop) for exon in gene_dict['exons']])
+
+
+def write_gene_index(genes, index_path):
+
+    """Write genes to a gene index file.
+
+    :param genes: Iterable of (chrom, start, stop, strand, name, exons)
+        tuples, as returned by :func:`genes_from_gffutils`.
+    :param str index_path: Path of the .npz file to write.
+    """
+
+    genes = sorted(genes, key=lambda g: (g[0], g[1]))
+
+    chroms = sorted(set(g[0] for g in genes))
+    chrom_offsets = np.searchsorted(
+        [g[0] for g in genes], chroms).tolist() + [len(genes)]
+
+    starts = np.array([g[1] for g in genes], dtype=np.int64)
+    stops = np.array([g[2] for g in genes], dtype=np.int64)
+
+    max_lengths = [int((stops[lo:hi] - starts[lo:hi]).max())
+                   for lo, hi in zip(chrom_offsets[:-1], chrom_offsets[1:])]
+
+    names = [g[4].encode('utf-8') for g in genes]
+    exons = [sorted(g[5]) for g in genes]
+
+    np.savez(index_path,
+             chroms=np.array(chroms, dtype=np.str_),
+             chrom_offsets=np.array(chrom_offsets, dtype=np.int64),
+             max_lengths=np.array(max_lengths, dtype=np.int64),
+             starts=starts,
+             stops=stops,
+             strands=np.array([g[3] or '.' for g in genes], dtype='S1'),
+             name_data=np.frombuffer(b''.join(names), dtype=np.uint8),
+             name_offsets=np.cumsum([0] + [len(n) for n in names]),
+             exon_offsets=np.cumsum([0] + [len(e) for e in exons]),
+             exon_starts=np.array([e[0] for g in exons for e in g],
+                                  dtype=np.int64),
+             exon_stops=np.array([e[1] for g in exons for e in g],
+                                 dtype=np.int64))
+
+
+def gene_index_from_gffutils(db_path, index_path):
+
+    """Build a gene index from a gffutils database.
+
+    :param str db_path: Path to the gffutils database.
+    :param str index_path: Path of the .npz file to write.
+    """
+
+    write_gene_index(genes_from_gffutils(db_path), index_path)
+
+
+def gene_index_from_gff(gff_path, index_path):
+
+    """Build a gene index directly from a GTF or GFF3 file, by way of a
+    temporary gffutils database.
+
+    :param str gff_path: Path to the GTF or GFF3 file.
+    :param str index_path: Path of the .npz file to write.
+    """
+
+    import gffutils
+
+    db_fd, db_path = tempfile.mkstemp(suffix='.db')
+    os.close(db_fd)
+
+    try:
+        logging.info('Building temporary gffutils database from {0}'.format(
+            gff_path))
+
+        gffutils.create_db(gff_path, db_path, force=True,
+                           merge_strategy='create_unique')
+
+        gene_index_from_gffutils(db_path, index_path)
+
+    finally:
+        os.remove(db_path)
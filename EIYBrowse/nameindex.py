@@ -0,0 +1,186 @@
+"""The nameindex module provides a case-insensitive index from gene names
+to their genomic loci, so that a gene can be plotted by name rather than
+by co-ordinates.
+
+The index is built from any gene datafile with an ``iter_gene_loci``
+method, such as :class:`~EIYBrowse.filetypes.gffutils_db.GffutilsDb` or
+:class:`~EIYBrowse.filetypes.gene_index.GeneIndexFile`. Building it means
+reading every gene in the datafile, so the index is saved next to the
+datafile as ``<datafile>.names.npz`` and re-used until the datafile
+changes.
+
+The index holds the lower-cased gene names as a sorted NumPy array, along
+with the chromosome, start and stop of each gene, so both exact and prefix
+lookups are binary searches. :meth:`GeneNameIndex.lookup_many` resolves
+a whole batch of names with a single vectorised search.
+"""
+
+import logging
+import os
+import numpy as np
+
+
+NAME_INDEX_SUFFIX = '.names.npz'
+
+# Sorts after any character that can appear in a gene name
+_MAX_CHAR = u'\U0010ffff'
+
+
+def name_index_path(datafile_path):
+
+    """Return the path the name index of a datafile is saved to.
+
+    :param str datafile_path: Path to the gene datafile.
+    """
+
+    return datafile_path + NAME_INDEX_SUFFIX
+
+
+class GeneNameIndex(object):
+
+    """Sorted, case-insensitive index of gene names."""
+
+    def __init__(self, names, chroms, starts, stops):
+
+        """Create a new GeneNameIndex. The arrays must already be sorted
+        by lower-cased name, as done by :meth:`from_loci`.
+
+        :param names: Array of gene names, as given in the datafile.
+        :param chroms: Array of the chromosome of each gene.
+        :param starts: Array of the 0-based start of each gene.
+        :param stops: Array of the end of each gene.
+        """
+
+        super(GeneNameIndex, self).__init__()
+
+        self.names, self.chroms = names, chroms
+        self.starts, self.stops = starts, stops
+
+        self.keys = np.char.lower(names)
+
+    def __len__(self):
+
+        return len(self.names)
+
+    @classmethod
+    def from_loci(cls, loci):
+
+        """Build an index from (name, chrom, start, stop) tuples.
+
+        Genes that share a name are ordered by chromosome and position, so
+        lookups consistently return the same one first.
+        """
+
+        names, chroms, starts, stops = [], [], [], []
+
+        for name, chrom, start, stop in loci:
+            names.append(name)
+            chroms.append(chrom)
+            starts.append(start)
+            stops.append(stop)
+
+        names = np.array(names, dtype=np.str_)
+        chroms = np.array(chroms, dtype=np.str_)
+        starts = np.array(starts, dtype=np.int64)
+        stops = np.array(stops, dtype=np.int64)
+
+        order = np.lexsort((starts, chroms, np.char.lower(names)))
+
+        return cls(names[order], chroms[order], starts[order], stops[order])
+
+    @classmethod
+    def load(cls, path):
+
+        """Load an index saved by :meth:`save`."""
+
+        with np.load(path) as index:
+            return cls(index['names'], index['chroms'],
+                       index['starts'], index['stops'])
+
+    def save(self, path):
+
+        """Save the index to path. The index is written to a temporary
+        file first, so a reader never sees a partially written index."""
+
+        temp_path = '{0}.{1}.part.npz'.format(path, os.getpid())
+
+        np.savez(temp_path, names=self.names, chroms=self.chroms,
+                 starts=self.starts, stops=self.stops)
+
+        os.replace(temp_path, path)
+
+    @classmethod
+    def for_datafile(cls, datafile):
+
+        """Return the name index of a gene datafile.
+
+        The saved index is loaded if it is at least as new as the datafile.
+        Otherwise the index is rebuilt from the datafile's
+        ``iter_gene_loci`` method and saved, if the datafile's directory is
+        writable.
+
+        :param datafile: Gene datafile with ``path`` and ``iter_gene_loci``
+            attributes.
+        """
+
+        path = name_index_path(datafile.path)
+
+        if (os.path.exists(path) and
+                os.path.getmtime(path) >= os.path.getmtime(datafile.path)):
+            return cls.load(path)
+
+        logging.info('Building gene name index for %s', datafile.path)
+
+        index = cls.from_loci(datafile.iter_gene_loci())
+
+        try:
+            index.save(path)
+        except (IOError, OSError):
+            logging.warning('Could not save gene name index to %s', path)
+
+        return index
+
+    def locus(self, i):
+
+        """Return the (chrom, start, stop) of entry i of the index."""
+
+        return str(self.chroms[i]), int(self.starts[i]), int(self.stops[i])
+
+    def lookup_many(self, names):
+
+        """Find many genes at once.
+
+        :param list names: Gene names to look up, in any case.
+        :returns: Array giving the position in the index of the first
+            exact match for each name, or -1 if there is no match.
+        """
+
+        queries = np.char.lower(np.array(names, dtype=np.str_))
+
+        if not len(self) or not len(queries):
+            return np.full(len(queries), -1, dtype=np.int64)
+
+        positions = np.searchsorted(self.keys, queries)
+        found = self.keys[np.minimum(positions, len(self) - 1)] == queries
+
+        return np.where(found, positions, -1)
+
+    def lookup(self, name):
+
+        """Return the positions in the index of every gene called name,
+        ignoring case."""
+
+        key = name.lower()
+
+        return np.arange(np.searchsorted(self.keys, key, 'left'),
+                         np.searchsorted(self.keys, key, 'right'))
+
+    def prefix(self, prefix):
+
+        """Return the positions in the index of every gene whose name
+        starts with prefix, ignoring case, in alphabetical order."""
+
+        key = prefix.lower()
+
+        return np.arange(np.searchsorted(self.keys, key, 'left'),
+                         np.searchsorted(self.keys, key + _MAX_CHAR, 'left'))
@@ -0,0 +1,144 @@
+"""The plugins module finds the tracks and filetypes that are installed,
+through the entry points of installed packages (see
+:mod:`EIYBrowse.filetypes` for how to define a new one).
+
+Each :class:`PluginRegistry` reads the names of its entry points the first
+time it is used, and only imports the module a plugin is defined in the
+first time that plugin is asked for. Opening a browser with a signal track
+therefore imports the signal track and its filetype, and nothing else.
+"""
+
+import importlib
+import os
+import threading
+
+
+def _entry_points(group):
+
+    """Return the entry points installed under group."""
+
+    try:
+        from importlib import metadata
+    except ImportError:
+        from pkg_resources import iter_entry_points
+        return list(iter_entry_points(group))
+
+    entry_points = metadata.entry_points()
+
+    if hasattr(entry_points, 'select'):
+        return list(entry_points.select(group=group))
+
+    return list(entry_points.get(group, []))
+
+
+class PluginRegistry(object):
+
+    """Mapping from plugin names to the classes that implement them, which
+    are loaded the first time they are looked up."""
+
+    def __init__(self, group, extra_modules=None):
+
+        """Create a new registry.
+
+        :param str group: Entry point group the plugins are defined in.
+        :param list extra_modules: Names of modules with a ``_registry``
+            dictionary of further plugins (e.g. the metaseq filetypes),
+            which are only imported if a name is not found in the entry
+            points. Modules which cannot be imported are ignored.
+        """
+
+        super(PluginRegistry, self).__init__()
+
+        self.group = group
+        self.extra_modules = extra_modules or []
+
+        self._lock = threading.RLock()
+        self._entry_points = None
+        self._extra = None
+        self._loaded = {}
+
+    def entry_points(self):
+
+        """Return a dictionary of the entry points of the group by name,
+        read from the installed package metadata on the first call.
+
+        No plugins are found when building the documentation on Read the
+        Docs.
+        """
+
+        with self._lock:
+
+            if self._entry_points is None:
+
+                if os.environ.get('READTHEDOCS', None) == 'True':
+                    self._entry_points = {}
+                else:
+                    self._entry_points = {
+                        entry_point.name: entry_point
+                        for entry_point in _entry_points(self.group)}
+
+            return self._entry_points
+
+    def extra(self):
+
+        """Return the plugins in the ``_registry`` of each extra module,
+        importing the modules on the first call."""
+
+        with self._lock:
+
+            if self._extra is None:
+
+                self._extra = {}
+
+                if os.environ.get('READTHEDOCS', None) != 'True':
+                    for module_name in self.extra_modules:
+                        try:
+                            module = importlib.import_module(module_name)
+                        except ImportError:
+                            continue
+                        self._extra.update(module._registry)
+
+            return self._extra
+
+    def names(self):
+
+        """Return the names of all the plugins, importing the extra
+        modules."""
+
+        return sorted(set(self.entry_points()) | set(self.extra()))
+
+    def __getitem__(self, name):
+
+        with self._lock:
+
+            if name not in self._loaded:
+
+                if name in self.entry_points():
+                    self._loaded[name] = self.entry_points()[name].load()
+                elif name in self.extra():
+                    self._loaded[name] = self.extra()[name]
+                else:
+                    raise KeyError(name)
+
+            return self._loaded[name]
+
+    def __contains__(self, name):
+
+        return name in self.entry_points() or name in self.extra()
+
+    def __iter__(self):
+
+        return iter(self.names())
+
+    def __len__(self):
+
+        return len(self.names())
+
+    def get(self, name, default=None):
+
+        """Return the plugin called name, or default if there is none."""
+
+        try:
+            return self[name]
+        except KeyError:
+            return default
@@ -0,0 +1,126 @@
+"""The prefetch module allows a :class:`~EIYBrowse.core.Browser` to warm the
+data caches of its tracks in the background.
+
+During interactive browsing the next region requested is almost always
+the window immediately to the left or right of the current one, or the
+current window zoomed out. Once a region has been plotted, the
+:class:`Prefetcher` asks every track to fetch the data for these
+neighbouring regions on a small pool of background threads, so that the
+data is already cached (see :mod:`EIYBrowse.datacache`) by the time the
+user asks for it.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def neighbouring_regions(region):
+
+    """Return the regions most likely to be requested after region.
+
+    These are the windows of the same width immediately to the left and
+    to the right of region, followed by the region zoomed out by a factor
+    of two. Regions are clipped at the start of the chromosome.
+
+    :param region: The region that was just plotted.
+    :type region: :class:`pybedtools.Interval`
+    :returns: List of :class:`pybedtools.Interval` objects.
+    """
+
+    import pybedtools
+
+    width = region.stop - region.start
+
+    candidates = [(region.start - width, region.start),
+                  (region.stop, region.stop + width),
+                  (region.start - width // 2,
+                   region.stop + width - width // 2)]
+
+    neighbours = []
+
+    for start, stop in candidates:
+        start = max(0, start)
+        if start < stop:
+            neighbours.append(pybedtools.Interval(region.chrom, start, stop))
+
+    return neighbours
+
+
+class Prefetcher(object):
+
+    """Fetch data for the regions neighbouring the last plotted region on
+    background threads.
+
+    At most max_workers regions are fetched at the same time. Whenever
+    a new region is requested from the browser, :meth:`cancel` is called
+    so that any prefetches which have not yet started are dropped in
+    favour of the new request.
+    """
+
+    def __init__(self, max_workers=2):
+
+        """Create a new Prefetcher.
+
+        :param int max_workers: Maximum number of background threads
+            fetching data at any one time.
+        """
+
+        super(Prefetcher, self).__init__()
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def schedule(self, region, tracks):
+
+        """Cancel any outstanding prefetches, then queue up prefetches of
+        the regions neighbouring region for every track.
+
+        :param region: The region that was just plotted.
+        :type region: :class:`pybedtools.Interval`
+        :param list tracks: List of :class:`~EIYBrowse.tracks.base.Track`
+            objects whose caches should be warmed.
+        """
+
+        self.cancel()
+
+        futures = [self.executor.submit(self._warm, track, neighbour)
+                   for neighbour in neighbouring_regions(region)
+                   for track in tracks]
+
+        with self._lock:
+            self._pending.extend(futures)
+
+    def cancel(self):
+
+        """Drop any prefetches which have not yet started. Prefetches that
+        are already running are allowed to finish, as the data they
+        fetch will still end up in the cache."""
+
+        with self._lock:
+            for future in self._pending:
+                future.cancel()
+            self._pending = []
+
+    def shutdown(self):
+
+        """Cancel outstanding prefetches and stop the background threads."""
+
+        self.cancel()
+        self.executor.shutdown(wait=False)
+
+    @staticmethod
+    def _warm(track, region):
+
+        """Ask a single track to prefetch a single region. A failed
+        prefetch should never affect the foreground request, so errors
+        are logged and otherwise ignored."""
+
+        try:
+            track.prefetch(region)
+        except Exception: # pylint: disable=broad-except
+            logging.debug('Prefetch of %s:%d-%d failed for %r',
+                          region.chrom, region.start, region.stop, track,
+                          exc_info=True)
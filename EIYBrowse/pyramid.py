@@ -0,0 +1,377 @@
+"""The pyramid module pre-renders whole chromosomes as a pyramid of
+fixed-width image tiles, laid out as described in :mod:`EIYBrowse.tiles`,
+along with a small HTML page for viewing them. The output is a static
+directory that can be shared without running
+:mod:`EIYBrowse.server`::
+
+    eiybrowse-pyramid browser_config.yaml chr1 chr2 \\
+        --chrom-sizes mm9.chrom.sizes --max-zoom 16 --output tiles/
+
+Each tile only shows the tracks' data, with no track labels or figure
+margins, so tile x ends exactly where tile x + 1 begins.
+
+Tiles are written to ``<output>/<chrom>/<zoom>/<x>.<format>``. A tile is
+only rendered if it is missing, or older than the configuration file or
+any of the datafiles it uses, so an interrupted run can simply be started
+again.
+
+Rendering is split into jobs which are spread over a pool of worker
+processes. Each job covers one tile and all of its descendants a few zoom
+levels deeper. Before rendering a level, the job asks every track to
+fetch the data for the whole of the job's region at that level's
+resolution in a single request (see
+:meth:`~EIYBrowse.core.Browser.prefetch`), and the individual tiles are
+then served from the track data caches. Tracks whose data does not depend
+on the zoom level, such as interval tracks, only fetch their data once
+for the coarsest tile and re-use it for every deeper level.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+
+from .configuration import datafiles_from_config
+from .tiles import tile_count, tile_region, tile_width, DEFAULT_BASE_WIDTH
+
+
+# Number of zoom levels below its root tile that each job renders. A job
+# renders at most 2 ** (JOB_DEPTH + 1) - 1 tiles.
+JOB_DEPTH = 5
+
+# Browser object and output options owned by each worker process
+_WORKER_BROWSER = None
+_WORKER_OPTIONS = None
+
+VIEWER_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>EIYBrowse</title>
+<style>
+body {{ font-family: sans-serif; margin: 0.5em; }}
+#view {{ overflow-x: scroll; white-space: nowrap; }}
+#view img {{ display: inline-block; }}
+</style>
+</head>
+<body>
+<select id="chrom"></select>
+<button id="zoom_out">&minus;</button>
+<button id="zoom_in">+</button>
+<span id="status"></span>
+<div id="view"></div>
+<script>
+var pyramid = {metadata};
+var view = document.getElementById('view');
+var chrom = document.getElementById('chrom');
+var state = {{zoom: pyramid.min_zoom}};
+
+Object.keys(pyramid.chromosomes).forEach(function (name) {{
+    chrom.add(new Option(name, name));
+}});
+
+function draw(centre) {{
+    var length = pyramid.chromosomes[chrom.value];
+    var width = pyramid.base_width / Math.pow(2, state.zoom);
+    var tiles = Math.ceil(length / width);
+    view.innerHTML = '';
+    for (var x = 0; x < tiles; x++) {{
+        var img = document.createElement('img');
+        img.loading = 'lazy';
+        img.src = [chrom.value, state.zoom, x + '.' + pyramid.format].join('/');
+        view.appendChild(img);
+    }}
+    document.getElementById('status').textContent =
+        'zoom ' + state.zoom + ' (' + tiles + ' tiles)';
+    view.scrollLeft = centre * view.scrollWidth - view.clientWidth / 2;
+}}
+
+function centre() {{
+    return (view.scrollLeft + view.clientWidth / 2) / (view.scrollWidth || 1);
+}}
+
+document.getElementById('zoom_in').onclick = function () {{
+    state.zoom = Math.min(pyramid.max_zoom, state.zoom + 1);
+    draw(centre());
+}};
+document.getElementById('zoom_out').onclick = function () {{
+    state.zoom = Math.max(pyramid.min_zoom, state.zoom - 1);
+    draw(centre());
+}};
+chrom.onchange = function () {{ draw(0.5); }};
+
+draw(0.5);
+</script>
+</body>
+</html>
+"""
+
+
+def tile_path(output_dir, chrom, zoom, x, fmt):
+
+    """Return the path a tile should be written to.
+
+    :param str output_dir: Root directory of the pyramid.
+    :param str chrom: Chromosome name.
+    :param int zoom: Zoom level of the tile.
+    :param int x: 0-based index of the tile along the chromosome.
+    :param str fmt: Image format of the tile.
+    """
+
+    return os.path.join(output_dir, chrom, str(zoom),
+                        '{0}.{1}'.format(x, fmt))
+
+
+def source_mtime(config_path, config_dict):
+
+    """Return the latest modification time of the configuration file and
+    all the datafiles it refers to. Any tile older than this is out of
+    date.
+
+    :param str config_path: Path to the configuration file.
+    :param dict config_dict: Parsed configuration file.
+    """
+
+    paths = [config_path] + datafiles_from_config(config_dict)
+
+    return max(os.path.getmtime(p) for p in paths if os.path.exists(p))
+
+
+def pyramid_jobs(chrom, chrom_length, min_zoom, max_zoom,
+                 base_width=DEFAULT_BASE_WIDTH):
+
+    """Split the tiles for a chromosome into jobs.
+
+    Each job is a tuple of (chrom, chrom_length, zoom, x, last_zoom), which
+    asks for tile x at the given zoom level to be rendered along with all
+    of its descendants down to last_zoom. The deepest JOB_DEPTH + 1 levels
+    are covered by jobs rooted JOB_DEPTH levels above max_zoom, and every
+    tile above that is a job of its own.
+
+    :param str chrom: Chromosome name.
+    :param int chrom_length: Length of the chromosome in basepairs.
+    :param int min_zoom: Most zoomed-out level to render.
+    :param int max_zoom: Most zoomed-in level to render.
+    :param int base_width: Width of a zoom level 0 tile.
+    """
+
+    job_zoom = max(min_zoom, max_zoom - JOB_DEPTH)
+
+    for zoom in range(min_zoom, job_zoom):
+        for x in range(tile_count(chrom_length, zoom, base_width)):
+            yield chrom, chrom_length, zoom, x, zoom
+
+    for x in range(tile_count(chrom_length, job_zoom, base_width)):
+        yield chrom, chrom_length, job_zoom, x, max_zoom
+
+
+def _init_worker(config_yaml, options):
+
+    """Initialise a worker by building its browser from the configuration.
+    Runs once in each worker process."""
+
+    # pylint: disable=global-statement
+    global _WORKER_BROWSER, _WORKER_OPTIONS
+
+    import matplotlib.pyplot as plt
+    from .configuration import browser_from_config_yaml
+
+    plt.switch_backend('agg')
+
+    _WORKER_BROWSER = browser_from_config_yaml(config_yaml)
+    _WORKER_OPTIONS = options
+
+    # Tiles are drawn edge to edge, without labels or margins, so that
+    # adjacent tiles join up in the viewer
+    _WORKER_BROWSER.margins = False
+
+
+def _is_up_to_date(path, mtime):
+
+    return os.path.exists(path) and os.path.getmtime(path) >= mtime
+
+
+def _render_job(job):
+
+    """Render all the out of date tiles in a job. Runs in a worker process
+    and returns the number of tiles rendered."""
+
+    import pybedtools
+
+    chrom, chrom_length, zoom, x, last_zoom = job
+    options = _WORKER_OPTIONS
+    base_width = options['base_width']
+
+    rendered = 0
+
+    for level in range(zoom, last_zoom + 1):
+
+        scale = 2 ** (level - zoom)
+        first = x * scale
+        last = min((x + 1) * scale,
+                   tile_count(chrom_length, level, base_width))
+
+        stale = [i for i in range(first, last)
+                 if not _is_up_to_date(
+                     tile_path(options['output_dir'], chrom, level, i,
+                               options['format']),
+                     options['mtime'])]
+
+        if not stale:
+            continue
+
+        width = tile_width(level, base_width)
+
+        _WORKER_BROWSER.prefetch(
+            pybedtools.Interval(chrom, first * width, last * width),
+            windows=last - first)
+
+        for i in stale:
+            _write_tile(chrom, level, i, options)
+            rendered += 1
+
+    return rendered
+
+
+def _write_tile(chrom, zoom, x, options):
+
+    """Render a single tile and write it to disk. The image is written to
+    a temporary file first, so an interrupted run never leaves a partial
+    tile that looks up to date."""
+
+    path = tile_path(options['output_dir'], chrom, zoom, x, options['format'])
+
+    image = _WORKER_BROWSER.render(
+        tile_region(chrom, zoom, x, options['base_width']),
+        fmt=options['format'], dpi=options['dpi'])
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    temp_path = path + '.part'
+
+    with open(temp_path, 'wb') as tile_file:
+        tile_file.write(image)
+
+    os.replace(temp_path, path)
+
+
+def read_chrom_sizes(path):
+
+    """Read a UCSC style chrom.sizes file into a dictionary.
+
+    :param str path: Path to a tab-delimited file of chromosome names and
+        lengths.
+    """
+
+    with open(path) as sizes_file:
+        return {chrom: int(length) for chrom, length in
+                (line.split()[:2] for line in sizes_file if line.strip())}
+
+
+def write_viewer(output_dir, metadata):
+
+    """Write the HTML viewer to the root of the pyramid.
+
+    :param str output_dir: Root directory of the pyramid.
+    :param dict metadata: Description of the pyramid, which is embedded in
+        the page.
+    """
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    with open(os.path.join(output_dir, 'index.html'), 'w') as viewer:
+        viewer.write(VIEWER_TEMPLATE.format(
+            metadata=json.dumps(metadata, sort_keys=True)))
+
+
+def main(argv=None):
+
+    """Entry point for the ``eiybrowse-pyramid`` command."""
+
+    import yaml
+
+    parser = argparse.ArgumentParser(
+        description='Pre-render chromosomes as a pyramid of image tiles')
+    parser.add_argument('config', metavar='CONFIG_YAML',
+                        help='Browser configuration file')
+    parser.add_argument('chromosomes', metavar='CHROM', nargs='+',
+                        help='Chromosomes to render, either as a name found '
+                             'in --chrom-sizes or as name:length')
+    parser.add_argument('-s', '--chrom-sizes', metavar='CHROM_SIZES',
+                        help='File of chromosome names and lengths')
+    parser.add_argument('-o', '--output', default='tiles',
+                        help='Directory to write the pyramid to')
+    parser.add_argument('--min-zoom', type=int, default=0,
+                        help='Most zoomed-out level (default: %(default)s)')
+    parser.add_argument('--max-zoom', type=int, required=True,
+                        help='Most zoomed-in level')
+    parser.add_argument('--tile-base-width', type=int,
+                        default=DEFAULT_BASE_WIDTH, metavar='BP',
+                        help='Width of a zoom level 0 tile in basepairs')
+    parser.add_argument('-f', '--format', default='png',
+                        choices=['png', 'svg'], help='Tile image format')
+    parser.add_argument('--dpi', type=float, help='Tile image resolution')
+    parser.add_argument('-w', '--workers', type=int,
+                        default=multiprocessing.cpu_count(),
+                        help='Number of worker processes')
+    parser.add_argument('--verbose', action='store_const',
+                        dest='loglevel', const=logging.INFO,
+                        default=logging.WARNING, help='Report progress')
+
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.loglevel)
+
+    if not 0 <= args.min_zoom <= args.max_zoom:
+        parser.error('--min-zoom must be between 0 and --max-zoom')
+
+    chrom_sizes = read_chrom_sizes(args.chrom_sizes) if args.chrom_sizes else {}
+    chromosomes = {}
+
+    for chrom in args.chromosomes:
+        if ':' in chrom:
+            chrom, length = chrom.rsplit(':', 1)
+            chromosomes[chrom] = int(length)
+        elif chrom in chrom_sizes:
+            chromosomes[chrom] = chrom_sizes[chrom]
+        else:
+            parser.error('No length given for chromosome {0}'.format(chrom))
+
+    with open(args.config) as config_file:
+        config_yaml = config_file.read()
+
+    options = {'output_dir': args.output,
+               'format': args.format,
+               'dpi': args.dpi,
+               'base_width': args.tile_base_width,
+               'mtime': source_mtime(args.config,
+                                     yaml.safe_load(config_yaml))}
+
+    write_viewer(args.output, {'chromosomes': chromosomes,
+                               'min_zoom': args.min_zoom,
+                               'max_zoom': args.max_zoom,
+                               'base_width': args.tile_base_width,
+                               'format': args.format})
+
+    jobs = [job for chrom, length in sorted(chromosomes.items())
+            for job in pyramid_jobs(chrom, length,
+                                    args.min_zoom, args.max_zoom,
+                                    args.tile_base_width)]
+
+    pool = multiprocessing.Pool(args.workers, initializer=_init_worker,
+                                initargs=(config_yaml, options))
+
+    rendered = 0
+
+    try:
+        for i, job_rendered in enumerate(
+                pool.imap_unordered(_render_job, jobs)):
+            rendered += job_rendered
+            logging.info('%d/%d jobs done, %d tiles rendered',
+                         i + 1, len(jobs), rendered)
+    finally:
+        pool.terminate()
+        pool.join()
+
+    logging.warning('Rendered %d tiles to %s', rendered, args.output)
@@ -0,0 +1,239 @@
+"""The rendercache module provides a persistent on-disk cache of rendered
+browser images, so that figures which have not changed since they were
+last rendered can be served straight from disk.
+
+Images are stored under a key which is a hash of everything that can
+change the output:
+
+* the normalised configuration of every track in the browser,
+* the size and modification time of every datafile used by the tracks,
+* the region plotted,
+* the browser width, row height and margins, and the image format and
+  resolution.
+
+Changing the configuration of a track therefore only invalidates the
+images rendered by browsers containing that track, and touching a datafile
+only invalidates the images that used it. Old images are never explicitly
+invalidated; they are simply no longer requested, and are removed once the
+cache grows beyond its size budget, least recently used first.
+
+The cache is enabled through the browser section of a configuration
+file::
+
+    browser:
+      render_cache:
+        path: /scratch/eiybrowse_cache
+        max_megabytes: 2048
+
+Only tracks created from a configuration file (see
+:func:`~EIYBrowse.configuration.track_from_track_config`) record the
+configuration needed to build a key. Browsers containing any other tracks
+are rendered without the cache.
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+
+def datafile_paths(track_conf):
+
+    """Return the paths of all the datafiles named in a track's
+    configuration dictionary.
+
+    :param dict track_conf: Configuration options of a single track.
+    """
+
+    paths = []
+
+    if track_conf:
+        if 'file_path' in track_conf:
+            paths.append(track_conf['file_path'])
+        paths.extend(track_conf.get('file_paths', []))
+
+    return paths
+
+
+def file_fingerprint(path):
+
+    """Return a tuple which changes whenever the file at path changes.
+
+    For a folder of datafiles (e.g.
+    :class:`~EIYBrowse.filetypes.my5c_folder.My5CFolder`) the fingerprint
+    includes every file in the folder.
+
+    :param str path: Path to a datafile or folder of datafiles.
+    """
+
+    if not os.path.exists(path):
+        return (path, None)
+
+    if os.path.isdir(path):
+        return (path, [file_fingerprint(os.path.join(path, name))
+                       for name in sorted(os.listdir(path))])
+
+    stat = os.stat(path)
+
+    return (path, stat.st_size, stat.st_mtime_ns)
+
+
+class DiskRenderCache(object):
+
+    """Cache of rendered images stored as individual files in a directory.
+
+    The modification time of each image file is updated whenever the image
+    is read, so that the oldest files are always the least recently used.
+    Several processes can share the same cache directory, as images are
+    written to a temporary file and then moved into place.
+    """
+
+    def __init__(self, path, max_megabytes=1024):
+
+        """Create a new DiskRenderCache.
+
+        :param str path: Directory to store the images in. Will be created
+            if it does not exist.
+        :param float max_megabytes: Size budget for the stored images.
+        """
+
+        super(DiskRenderCache, self).__init__()
+
+        self.path = path
+        self.max_bytes = int(max_megabytes * 1024 ** 2)
+
+        self._total_bytes = None
+        self._lock = threading.Lock()
+
+        if not os.path.isdir(path):
+            os.makedirs(path, exist_ok=True)
+
+    def key(self, browser, region, fmt, dpi):
+
+        """Return the cache key for a browser image, or None if the browser
+        contains tracks that cannot be keyed.
+
+        :param browser: Browser that will render the image.
+        :type browser: :class:`~EIYBrowse.core.Browser`
+        :param region: Genomic region to be plotted.
+        :type region: :class:`pybedtools.Interval`
+        :param str fmt: Image format.
+        :param float dpi: Image resolution.
+        """
+
+        import matplotlib
+
+        track_fingerprints = []
+
+        for track in browser.tracks:
+
+            if track.config is None:
+                return None
+
+            track_conf = list(track.config.values())[0]
+
+            track_fingerprints.append(
+                [track.config,
+                 [file_fingerprint(p) for p in datafile_paths(track_conf)]])
+
+        description = {'tracks': track_fingerprints,
+                       'region': [region.chrom, region.start, region.stop],
+                       'figure': [browser.width, browser.rowheight,
+                                  browser.margins],
+                       'format': fmt,
+                       'dpi': dpi or matplotlib.rcParams['savefig.dpi']}
+
+        normalised = json.dumps(description, sort_keys=True, default=str)
+
+        return hashlib.sha1(normalised.encode('utf-8')).hexdigest()
+
+    def _image_path(self, key, fmt):
+
+        return os.path.join(self.path, key[:2], '{0}.{1}'.format(key, fmt))
+
+    def get(self, key, fmt):
+
+        """Return the stored image, or None if there is no image stored
+        under key."""
+
+        image_path = self._image_path(key, fmt)
+
+        try:
+            with open(image_path, 'rb') as image_file:
+                image = image_file.read()
+        except IOError:
+            return None
+
+        os.utime(image_path, None)
+
+        return image
+
+    def put(self, key, fmt, image):
+
+        """Store an image under key, then remove the least recently used
+        images if the cache is over its size budget."""
+
+        image_path = self._image_path(key, fmt)
+        temp_path = '{0}.{1}.part'.format(image_path, os.getpid())
+
+        os.makedirs(os.path.dirname(image_path), exist_ok=True)
+
+        with open(temp_path, 'wb') as image_file:
+            image_file.write(image)
+
+        # An image already stored under key is replaced, and no longer
+        # counts towards the total
+        try:
+            replaced_bytes = os.stat(image_path).st_size
+        except OSError:
+            replaced_bytes = 0
+
+        os.replace(temp_path, image_path)
+
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(s.st_size for _, s in self._scan())
+            else:
+                self._total_bytes += len(image) - replaced_bytes
+
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _scan(self):
+
+        """Return (path, stat) pairs for every stored image."""
+
+        images = []
+
+        for dir_path, _, file_names in os.walk(self.path):
+            for file_name in file_names:
+                if file_name.endswith('.part'):
+                    continue
+                image_path = os.path.join(dir_path, file_name)
+                try:
+                    images.append((image_path, os.stat(image_path)))
+                except OSError:
+                    pass
+
+        return images
+
+    def _evict(self):
+
+        """Remove the least recently used images until the cache is back
+        under 90% of its budget. The directory is rescanned, as other
+        processes sharing the cache may have added or removed images."""
+
+        images = sorted(self._scan(), key=lambda i: i[1].st_mtime)
+        total_bytes = sum(stat.st_size for _, stat in images)
+        target = 0.9 * self.max_bytes
+
+        for image_path, stat in images:
+            if total_bytes <= target:
+                break
+            try:
+                os.remove(image_path)
+            except OSError:
+                pass
+            total_bytes -= stat.st_size
+
+        self._total_bytes = total_bytes
@@ -0,0 +1,398 @@
+"""The server module provides a small HTTP server which renders browser
+images on demand, so that EIYBrowse figures can be embedded in other web
+pages without starting a new Python process for every image.
+
+The configuration file is loaded once by each process in a pool of
+render workers, which keep their datafiles open between requests.
+Rendered images are held in an in-memory least-recently-used cache, and
+are served with an ETag header so that clients can re-validate cached
+images cheaply.
+
+Two kinds of URL are understood::
+
+    /region/<chrom>:<start>-<stop>.<png|svg>
+    /region/<gene>[+<flank>].<png|svg>
+    /tile/<chrom>/<zoom>/<x>.<png|svg>
+
+where genes are looked up as described in
+:meth:`~EIYBrowse.core.Browser.resolve_region` (e.g. ``/region/Sox2+50kb.png``)
+and tiles are laid out as described in :mod:`EIYBrowse.tiles`. Either
+kind of URL accepts an optional ``dpi`` query parameter.
+
+The server is started with the ``eiybrowse-server`` command, and only
+listens on localhost unless told otherwise::
+
+    eiybrowse-server browser_config.yaml --port 8000 --workers 4
+"""
+
+import argparse
+import hashlib
+import logging
+import multiprocessing
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+
+from .tiles import tile_region, DEFAULT_BASE_WIDTH
+from .utils import parse_region
+
+
+CONTENT_TYPES = {'png': 'image/png',
+                 'svg': 'image/svg+xml'}
+
+# Seconds to wait for a worker to render an image
+RENDER_TIMEOUT = 300
+
+# Browser object owned by each render worker process
+_WORKER_BROWSER = None
+
+
+def _init_worker(config_yaml):
+
+    """Initialise a render worker by building its browser from the
+    configuration. Runs once in each worker process."""
+
+    # pylint: disable=global-statement
+    global _WORKER_BROWSER
+
+    import matplotlib.pyplot as plt
+    from .configuration import browser_from_config_yaml
+
+    plt.switch_backend('agg')
+
+    _WORKER_BROWSER = browser_from_config_yaml(config_yaml)
+
+    # Open every datafile now, rather than while serving the first request
+    _WORKER_BROWSER.warmup()
+
+
+def etag_matches(etag, if_none_match):
+
+    """Whether an If-None-Match request header matches etag. The header
+    holds '*' or a comma separated list of entity tags, any of which may be
+    weak (W/ prefixed), and each is compared with etag as a whole.
+
+    :param str etag: Quoted entity tag of the response.
+    :param str if_none_match: Value of the If-None-Match header.
+    """
+
+    for tag in if_none_match.split(','):
+
+        tag = tag.strip()
+
+        if tag.startswith('W/'):
+            tag = tag[2:]
+
+        if tag == '*' or tag == etag:
+            return True
+
+    return False
+
+
+def _resolve(region_spec):
+
+    """Look up a gene with the worker's browser. Runs in a worker
+    process."""
+
+    region = _WORKER_BROWSER.resolve_region(region_spec)
+
+    return region.chrom, region.start, region.stop
+
+
+def _render(chrom, start, stop, fmt, dpi):
+
+    """Render a region with the worker's browser. Runs in a worker
+    process."""
+
+    import pybedtools
+
+    return _WORKER_BROWSER.render(pybedtools.Interval(chrom, start, stop),
+                                  fmt=fmt, dpi=dpi)
+
+
+class ImageCache(object):
+
+    """In-memory least-recently-used cache of rendered images.
+
+    The cache is limited by the total size of the stored images rather
+    than by the number of images, as an SVG of a gene-dense region can
+    be many times larger than a PNG.
+    """
+
+    def __init__(self, max_bytes):
+
+        """Create a new ImageCache.
+
+        :param int max_bytes: Maximum total size of the cached images.
+        """
+
+        super(ImageCache, self).__init__()
+
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+
+        """Return the (etag, image) pair stored under key, or None."""
+
+        with self._lock:
+            try:
+                entry = self._images.pop(key)
+            except KeyError:
+                return None
+            self._images[key] = entry
+            return entry
+
+    def put(self, key, image):
+
+        """Store an image under key and return its (etag, image) pair.
+        Images larger than the whole cache are not stored."""
+
+        entry = ('"{0}"'.format(hashlib.sha1(image).hexdigest()), image)
+
+        if len(image) > self.max_bytes:
+            return entry
+
+        with self._lock:
+            old_entry = self._images.pop(key, None)
+            if old_entry is not None:
+                self.total_bytes -= len(old_entry[1])
+
+            self._images[key] = entry
+            self.total_bytes += len(image)
+
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted) = self._images.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+        return entry
+
+
+class BrowserServer(ThreadingHTTPServer):
+
+    """HTTP server which hands rendering off to a pool of worker
+    processes and caches the results."""
+
+    daemon_threads = True
+
+    def __init__(self, address, config_yaml,
+                 workers=2, cache_bytes=256 * 1024 ** 2,
+                 base_width=DEFAULT_BASE_WIDTH, dpi=None):
+
+        """Create a new server.
+
+        :param tuple address: (host, port) to listen on.
+        :param str config_yaml: Browser configuration, as YAML.
+        :param int workers: Number of render worker processes.
+        :param int cache_bytes: Size of the rendered image cache.
+        :param int base_width: Width of a zoom level 0 tile, see
+            :mod:`EIYBrowse.tiles`.
+        :param float dpi: Default image resolution.
+        :raises ImproperlyConfigured: If the configuration is invalid.
+        """
+
+        from .configuration import browser_from_config_yaml
+
+        # Build a browser here first, so that a bad configuration stops the
+        # server from starting, rather than failing in every worker
+        browser_from_config_yaml(config_yaml)
+
+        ThreadingHTTPServer.__init__(self, address, BrowserRequestHandler)
+
+        self.pool = multiprocessing.Pool(workers, initializer=_init_worker,
+                                         initargs=(config_yaml,))
+        self.cache = ImageCache(cache_bytes)
+        self.base_width, self.dpi = base_width, dpi
+
+    def resolve_region(self, region_spec):
+
+        """Return the region given by a region string or gene name. Gene
+        names are looked up by one of the render workers.
+
+        :raises ValueError: If the region is invalid.
+        :raises LookupError: If the gene could not be found.
+        :raises multiprocessing.TimeoutError: If the worker took longer than
+            RENDER_TIMEOUT.
+        """
+
+        import pybedtools
+
+        if ':' in region_spec:
+            return parse_region(region_spec)
+
+        chrom, start, stop = self.pool.apply_async(
+            _resolve, (region_spec,)).get(RENDER_TIMEOUT)
+
+        return pybedtools.Interval(chrom, start, stop)
+
+    def get_image(self, region, fmt, dpi):
+
+        """Return the (etag, image) pair for a region, rendering it if it
+        is not already cached.
+
+        :raises multiprocessing.TimeoutError: If the worker took longer than
+            RENDER_TIMEOUT.
+        """
+
+        key = (region.chrom, region.start, region.stop, fmt, dpi)
+
+        entry = self.cache.get(key)
+
+        if entry is None:
+            image = self.pool.apply_async(_render, key).get(RENDER_TIMEOUT)
+            entry = self.cache.put(key, image)
+
+        return entry
+
+    def server_close(self):
+
+        ThreadingHTTPServer.server_close(self)
+
+        self.pool.terminate()
+        self.pool.join()
+
+
+class BrowserRequestHandler(BaseHTTPRequestHandler):
+
+    """Translate request paths into regions and send back the rendered
+    image."""
+
+    def do_GET(self): # pylint: disable=invalid-name
+
+        """Handle a GET request for a region or a tile."""
+
+        url = urlsplit(self.path)
+
+        try:
+            region, fmt = self.parse_path(unquote(url.path))
+            dpi = self.parse_dpi(parse_qs(url.query))
+        except ValueError as err:
+            self.send_error(400, str(err))
+            return
+        except LookupError:
+            self.send_error(404)
+            return
+        except multiprocessing.TimeoutError:
+            logging.error('Timed out looking up %s', self.path)
+            self.send_error(504)
+            return
+        except Exception: # pylint: disable=broad-except
+            logging.exception('Failed to look up %s', self.path)
+            self.send_error(500)
+            return
+
+        try:
+            etag, image = self.server.get_image(region, fmt, dpi)
+        except multiprocessing.TimeoutError:
+            logging.error('Timed out rendering %s', self.path)
+            self.send_error(504)
+            return
+        except Exception: # pylint: disable=broad-except
+            logging.exception('Failed to render %s', self.path)
+            self.send_error(500)
+            return
+
+        if etag_matches(etag, self.headers.get('If-None-Match', '')):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPES[fmt])
+        self.send_header('Content-Length', str(len(image)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(image)
+
+    def parse_path(self, path):
+
+        """Return the region and image format requested by path.
+
+        :raises LookupError: If the path does not match a known URL.
+        :raises ValueError: If the region or tile is invalid.
+        """
+
+        stem, _, fmt = path.rpartition('.')
+
+        if fmt not in CONTENT_TYPES:
+            raise LookupError(path)
+
+        parts = stem.strip('/').split('/')
+
+        if len(parts) == 2 and parts[0] == 'region':
+            return self.server.resolve_region(parts[1]), fmt
+
+        if len(parts) == 4 and parts[0] == 'tile':
+            chrom, zoom, x = parts[1], int(parts[2]), int(parts[3])
+            return tile_region(chrom, zoom, x, self.server.base_width), fmt
+
+        raise LookupError(path)
+
+    def parse_dpi(self, query):
+
+        """Return the dpi given in the query string, or the server's
+        default."""
+
+        if 'dpi' in query:
+            return float(query['dpi'][0])
+
+        return self.server.dpi
+
+    def log_message(self, format, *args): # pylint: disable=redefined-builtin
+
+        logging.info(format, *args)
+
+
+def main(argv=None):
+
+    """Entry point for the ``eiybrowse-server`` command."""
+
+    parser = argparse.ArgumentParser(
+        description='Serve EIYBrowse images over HTTP')
+    parser.add_argument('config', metavar='CONFIG_YAML',
+                        help='Browser configuration file')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='Address to listen on (default: %(default)s)')
+    parser.add_argument('--port', type=int, default=8000,
+                        help='Port to listen on (default: %(default)s)')
+    parser.add_argument('--workers', type=int,
+                        default=multiprocessing.cpu_count(),
+                        help='Number of render worker processes')
+    parser.add_argument('--cache-size', type=int, default=256, metavar='MB',
+                        help='Size of the rendered image cache in MB '
+                             '(default: %(default)s)')
+    parser.add_argument('--tile-base-width', type=int,
+                        default=DEFAULT_BASE_WIDTH, metavar='BP',
+                        help='Width of a zoom level 0 tile in basepairs')
+    parser.add_argument('--dpi', type=float,
+                        help='Default image resolution')
+    parser.add_argument('--verbose', action='store_const',
+                        dest='loglevel', const=logging.INFO,
+                        default=logging.WARNING, help='Log every request')
+
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.loglevel)
+
+    with open(args.config) as config_file:
+        config_yaml = config_file.read()
+
+    server = BrowserServer((args.host, args.port), config_yaml,
+                           workers=args.workers,
+                           cache_bytes=args.cache_size * 1024 ** 2,
+                           base_width=args.tile_base_width,
+                           dpi=args.dpi)
+
+    logging.warning('Serving on http://%s:%d/', args.host, args.port)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,64 @@
+"""The tiles module defines how a chromosome is divided into fixed-width
+tiles at different zoom levels, in the same way that map tiles divide the
+world.
+
+At zoom level 0 each tile spans base_width basepairs. Every level deeper
+halves the width of a tile, so at zoom level z tile x spans the region
+from ``x * base_width / 2**z`` to ``(x + 1) * base_width / 2**z``.
+"""
+
+
+# The default width of a zoom level 0 tile is large enough for one tile to
+# cover any human or mouse chromosome.
+DEFAULT_BASE_WIDTH = 2 ** 28
+
+
+def tile_width(zoom, base_width=DEFAULT_BASE_WIDTH):
+
+    """Return the width in basepairs of a tile at a given zoom level.
+
+    :param int zoom: Zoom level, where 0 is the most zoomed-out.
+    :param int base_width: Width of a tile at zoom level 0.
+    :raises ValueError: If the zoom level is negative or so deep that
+        tiles would be less than one basepair wide.
+    """
+
+    if zoom < 0 or base_width >> zoom < 1:
+        raise ValueError('Invalid zoom level {0}'.format(zoom))
+
+    return base_width >> zoom
+
+
+def tile_region(chrom, zoom, x, base_width=DEFAULT_BASE_WIDTH):
+
+    """Return the genomic region covered by a tile.
+
+    :param str chrom: Chromosome name.
+    :param int zoom: Zoom level of the tile.
+    :param int x: 0-based index of the tile along the chromosome.
+    :param int base_width: Width of a tile at zoom level 0.
+    :returns: :class:`pybedtools.Interval` covered by the tile.
+    """
+
+    import pybedtools
+
+    if x < 0:
+        raise ValueError('Invalid tile index {0}'.format(x))
+
+    width = tile_width(zoom, base_width)
+
+    return pybedtools.Interval(chrom, x * width, (x + 1) * width)
+
+
+def tile_count(chrom_length, zoom, base_width=DEFAULT_BASE_WIDTH):
+
+    """Return the number of tiles needed to cover a chromosome.
+
+    :param int chrom_length: Length of the chromosome in basepairs.
+    :param int zoom: Zoom level of the tiles.
+    :param int base_width: Width of a tile at zoom level 0.
+    """
+
+    width = tile_width(zoom, base_width)
+
+    return -(-chrom_length // width)
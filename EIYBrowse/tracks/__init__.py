@@ -1,12 +1,28 @@
-from pkg_resources import iter_entry_points
+"""Tracks are found through the EIYBrowse.tracks entry point (see
+:mod:`EIYBrowse.filetypes` for how plugins are defined). The module
+defining each track is only imported the first time that track is used,
+either through :data:`defined_tracks` or as an attribute of this module
+(e.g. ``EIYBrowse.tracks.scale_bar``).
 
-import os
-on_rtd = os.environ.get('READTHEDOCS', None) == 'True'
+Most tracks are defined in a submodule with the same name as the track.
+Importing that submodule would normally replace the attribute with the
+module, so the track class is stored on this module once it is found.
+"""
 
-if not on_rtd:
-    defined_tracks = {ep.name: ep.load()
-                      for ep in iter_entry_points('EIYBrowse.tracks')}
-else:
-    defined_tracks = {}
+from ..plugins import PluginRegistry
 
-globals().update(defined_tracks)
+
+defined_tracks = PluginRegistry('EIYBrowse.tracks')
+
+
+def __getattr__(name):
+
+    try:
+        track = defined_tracks[name]
+    except KeyError:
+        raise AttributeError(
+            "module '{0}' has no attribute '{1}'".format(__name__, name))
+
+    globals()[name] = track
+
+    return track
@@ -9,7 +9,7 @@ The :class:`FileTrack` class should be chosen as a base class
 if the track does rely on some external data file.
 """
 
-from ..filetypes import open_file
+from ..filetypes import LazyDatafile
 import abc
 
 
@@ -32,6 +32,10 @@ class Track(object):
         self.name = name
         self.name_rotate = name_rotate
 
+        # Set by EIYBrowse.configuration if the track was created from a
+        # configuration file, and used to key cached images.
+        self.config = None
+
     # Some classes won't need to do anything here, and can leave
     # this as it is. So we need to disable some warnings:
     # pylint: disable=unused-argument, no-self-use
@@ -42,6 +46,34 @@ class Track(object):
 
         return {}
 
+    def prefetch(self, region, windows=1):
+
+        """Fetch the data for region without plotting it, so that a later
+        call to :meth:`plot` can be served from the track's cache. Called
+        from a background thread by :class:`~EIYBrowse.prefetch.Prefetcher`.
+
+        Tracks without a data cache have nothing to do here.
+
+        :param region: Genomic region to fetch data for.
+        :type region: :class:`pybedtools.Interval`
+        :param int windows: Number of equal-width windows that region
+            will later be plotted as (e.g. a run of adjacent tiles), so
+            that the data can be fetched at the right resolution.
+        """
+
+        pass
+
+    def warmup(self):
+
+        """Open any datafiles the track uses, so that the first plot does not
+        have to wait for them. Called by
+        :meth:`~EIYBrowse.core.Browser.warmup`.
+
+        Tracks without datafiles have nothing to do here.
+        """
+
+        pass
+
     def plot(self, region, plot_ax, label_ax=None):
 
         """Public method called when we need to plot the track to an
@@ -120,23 +152,31 @@ class FileTrack(Track):
 
         self.datafile = datafile
 
+    def warmup(self):
+
+        if isinstance(self.datafile, LazyDatafile):
+            self.datafile.open()
+
     @classmethod
     def from_config_dict(cls, file_path, file_type,
-                               **kwargs):
+                               file_options=None, **kwargs):
 
         """Instead of instantiating a new track object with an open
         datafile object, instead pass the path to the datafile and
         the file_type string specifiying the class which handles that
-        file format. Open the datafile and instantiate the class with
-        the newly created datafile object.
+        file format. Instantiate the class with a
+        :class:`~EIYBrowse.filetypes.LazyDatafile`, which opens the
+        datafile the first time the track fetches data from it.
 
         :param str file_path: Path to the datafile location
         :param str file_type: String specifying the format of the datafile.
             The mapping between format specifiers and classes is defined by
             the EIYBrowse.filetypes entry point (see setuptools documentation
             or :mod:`EIYBrowse.filetypes` for more information.)
+        :param dict file_options: Optional keyword arguments for the class
+            which opens the datafile.
         """
 
-        datafile = open_file(file_path, file_type)
+        datafile = LazyDatafile(file_path, file_type, **(file_options or {}))
 
         return cls(datafile, **kwargs)
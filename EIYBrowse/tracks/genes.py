@@ -1,7 +1,12 @@
 """The genes module defines a track for plotting the position of genes"""
 
+import numpy as np
+from matplotlib.collections import LineCollection, PolyCollection
 from .base import FileTrack
-import matplotlib.pyplot as plt
+from ..utils import (font_from_text_kwargs, text_width,
+                     pack_rows, merge_intervals)
+from ..filetypes.records import gene_name
+from ..nameindex import GeneNameIndex
 
 
 def get_start_stop_on_axes(axes, interval):
@@ -9,8 +14,8 @@ def get_start_stop_on_axes(axes, interval):
     """Given a set of axes and a genomic interval, return
     the start and stop of the interval in axes co-ordinates
 
-    :param plot_ax: Axes to plot the gene name label on
-    :type plot_ax: :class:`matplotlib.axes.AxesSubplot`
+    :param axes: Axes whose x limits give the plotted genomic region
+    :type axes: :class:`matplotlib.axes.AxesSubplot`
     :param interval: Genomic interval for which to determine the extent
         in axis co-ordinates
     :type interval: :class:`pybedtools.Interval`
@@ -50,28 +55,37 @@ class GeneTrack(FileTrack):
     """
 
     def __init__(self, datafile,
-                 color='#377eb8',
+                 color='r',
                  name=None, name_rotate=False,
+                 pack_labels=True,
                  **kwargs):
 
         """To create a new gene track:
 
         :param datafile: Object providing access to the names and locations
-            of genes. At the moment only
-            :class:`~EIYBrowse.filetypes.gffutils_db.GffutilsDb` objects are
-            supported.
-        :param str color: Color specifier for the gene icons
+            of genes, such as
+            :class:`~EIYBrowse.filetypes.gffutils_db.GffutilsDb`,
+            :class:`~EIYBrowse.filetypes.gene_index.GeneIndexFile` or
+            :class:`~EIYBrowse.filetypes.tabix_gff.TabixGffFile` objects.
+        :param str color: Color specifier for the gene icons (default red)
         :param str name: Optional name label
         :param bool name_rotate: Whether to rotate the name label 90 degrees
+        :param bool pack_labels: Whether to leave room for every gene's name
+            label when arranging genes into rows. If False, genes are packed
+            by their bodies alone, which needs fewer rows in gene-dense
+            regions, and labels that do not fit are left out.
         """
 
         super(GeneTrack, self).__init__(datafile,
                                         name, name_rotate)
 
         self.color, self.kwargs = color, kwargs
+        self.pack_labels = pack_labels
 
         self.gene_rows = GeneRows()
 
+        self.name_index = None
+
     def get_config(self, region, browser):
 
         """Calculate the number of vertial rows needed in the axis that will
@@ -81,7 +95,7 @@ class GeneTrack(FileTrack):
         :meth:`EIYBrowse.filetypes.gffutils_db.GffutilsDb.get_genes` method of
         the backend. The private :meth:`_get_gene_extents` method then iterates
         over the found genes and returns the start/stop of the gene when
-        plotted (including the name label). Each gene is added to
+        plotted (including the name label). The genes are then packed into
         self.gene_rows, which is a :class:`GeneRows` object that assigns each
         gene to a vertical row, making sure that none of them overlap.
 
@@ -96,19 +110,50 @@ class GeneTrack(FileTrack):
         :type browser: :class:`~EIYBrowse.core.Browser`
         """
 
-        self.gene_rows.rows = []
-
         genes = self.datafile.get_genes(region)
 
         # TODO: Here we use the browser's width to determine overlaps, but
         # if we were passed a gridspec to plot to then the browser's width
         # is irrelevant.
-        for gene, start, stop in self._get_gene_extents(region, genes, browser):
-
-            self.gene_rows.add_gene(gene, start, stop)
+        self.gene_rows.pack(self._get_gene_extents(region, genes, browser))
 
         return {'rows': self.total_rows()}
 
+    def locate_genes(self, names):
+
+        """Find the genomic loci of many genes by name.
+
+        Names are looked up in the datafile's
+        :class:`~EIYBrowse.nameindex.GeneNameIndex`, which is loaded (or
+        built) the first time this method is called. Case is ignored, and a
+        name that is not found exactly is accepted if it is the prefix of
+        exactly one gene name.
+
+        :param list names: Gene names to look up.
+        :returns: List with the (chrom, start, stop) of each gene, or None
+            for names that could not be found.
+        """
+
+        if not hasattr(self.datafile, 'iter_gene_loci'):
+            return [None] * len(names)
+
+        if self.name_index is None:
+            self.name_index = GeneNameIndex.for_datafile(self.datafile)
+
+        index = self.name_index
+        loci = []
+
+        for name, i in zip(names, index.lookup_many(names).tolist()):
+
+            if i < 0:
+                matches = index.prefix(name)
+                if len(matches) and len(set(index.keys[matches])) == 1:
+                    i = matches[0]
+
+            loci.append(index.locus(i) if i >= 0 else None)
+
+        return loci
+
     def total_rows(self):
 
         """The number of rows needed to plot the current set of genes.
@@ -124,44 +169,35 @@ class GeneTrack(FileTrack):
         """Private method that iterates over genes and calculates the
         axis space that they will need to occupy, including their name label.
 
-        At the moment, this calls :meth:`_get_gene_extent` and actually plots
-        the gene, then queries the space used. This is of course highly
-        inefficient as we have to plot every gene twice (once to figure out
-        how big it is, and then again once we have assigned it to the correct
-        vertical line) and should be replaced with something a bit more clever
-        ASAP.
+        Extents are measured in points from the left edge of the data axis.
+        The gene body is scaled from genomic co-ordinates to the width of the
+        data axis given by
+        :meth:`~EIYBrowse.core.Browser.data_axis_width`, and the width of
+        the name label is calculated from the font metrics by
+        :func:`~EIYBrowse.utils.text_width`, so nothing has to be drawn.
         """
 
-        old_figure = plt.gcf()
-        _figure = plt.figure(figsize=(browser.width, 1))
-        _plot_axis = _figure.add_subplot(111)
-        _plot_axis.set_xlim(region.start, region.stop)
-        _renderer = _figure.canvas.get_renderer()
-
-        for gene in genes:
-
-            start, stop = self._get_gene_extent(gene, _plot_axis, _renderer)
-            yield gene, start, stop
-
-        plt.close(_figure)
-        plt.figure(old_figure.number)
+        axis_width = browser.data_axis_width() * 72.
+        scale = axis_width / (region.stop - region.start)
 
-    def _get_gene_extent(self, gene, _plot_axis, _renderer):
+        font = font_from_text_kwargs(self.kwargs)
+        padding = text_width('  ', font)
 
-        """Plot the gene to _plot_axis, then ask _renderer how big the gene is.
-        """
+        for gene_dict in genes:
 
-        gene_line, gene_label = self.plot_gene_dict(_plot_axis, gene,
-                                                    plot_exons=False)
+            gene = gene_dict['gene']
 
-        line_bounds = gene_line.get_window_extent(_renderer)
-        label_bounds = gene_label.get_window_extent(_renderer)
+            start = (max(gene.start, region.start) - region.start) * scale
+            stop = (min(gene.stop, region.stop) - region.start) * scale
 
-        start = line_bounds.x0
-        stop = max([line_bounds.x1, label_bounds.x1])
-        stop = stop * 1.1
+            # The name label is drawn from the start of the gene, even if
+            # that is outside the region
+            if self.pack_labels:
+                label_start = (gene.start - region.start) * scale
+                stop = max(stop,
+                           label_start + text_width(gene_name(gene), font))
 
-        return start, stop
+            yield gene_dict, start, stop + padding
 
     def plot_name(self, plot_ax, start, name, row_index=0):
 
@@ -179,19 +215,59 @@ class GeneTrack(FileTrack):
 
         return plot_ax.text(start, row_index - span, name, **self.kwargs)
 
-    def plot_gene_body(self, plot_ax, gene, row_index=0):
+    def plot_names(self, plot_ax, region):
 
-        """Plot the body of the gene to the plotting axes.
+        """Plot the name labels of all the genes that have room for them.
 
-        First we get the extent of the gene in axis co-ordinates.
+        A label is drawn from the start of its gene, and is culled if it
+        would run into the next gene in the same row. When the genes were
+        packed with their labels (the default), every label fits. With
+        pack_labels set to False, genes are packed more tightly and labels
+        are only drawn where there is space.
 
-        We then determine the vertial position of the gene . First the vertial
-        span of each row is calculated by dividing the extent of the whole
-        axis (which is always 1) by the total number of rows. The position of
-        the current gene is then given by the top position of the current row
-        (given by row_index) minus two fifths of the row span.
+        :param plot_ax: Axes to plot the gene name labels on
+        :type plot_ax: :class:`matplotlib.axes.AxesSubplot`
+        :param region: Genomic region being plotted.
+        :type region: :class:`pybedtools.Interval`
+        """
 
-        :param plot_ax: Axes to plot the gene name label on
+        font = font_from_text_kwargs(self.kwargs)
+        dpi = plot_ax.figure.dpi
+
+        bp_per_pixel = ((region.stop - region.start) /
+                        plot_ax.get_window_extent().width)
+        padding = text_width(' ', font, dpi)
+
+        labels = []
+
+        for i, gene_row in enumerate(self.gene_rows.rows):
+
+            row_index = 1.0 - (i * (1.0 / self.total_rows()))
+            genes = [gene_dict['gene'] for gene_dict in gene_row['genes']]
+
+            for gene, next_gene in zip(genes, genes[1:] + [None]):
+
+                name = gene_name(gene)
+
+                if next_gene is not None:
+                    available = (next_gene.start - gene.start) / bp_per_pixel
+                    if text_width(name, font, dpi) + padding > available:
+                        continue
+
+                labels.append(
+                    self.plot_name(plot_ax, gene.start, name, row_index))
+
+        return labels
+
+    def plot_gene_body(self, plot_ax, gene, row_index=0):
+
+        """Plot the body of a single gene to the plotting axes.
+
+        The body is drawn two fifths of a row span below the top of the
+        row given by row_index, as in :meth:`_plot`, which draws all the
+        genes at once.
+
+        :param plot_ax: Axes to plot the gene body on
         :type plot_ax: :class:`matplotlib.axes.AxesSubplot`
         :param gene: Gene object to be plotted
         :type gene: :class:`pybedtools.Interval`
@@ -205,25 +281,17 @@ class GeneTrack(FileTrack):
 
         gene_height = row_index - 2 * span / 5.
 
-        line_patch = plot_ax.axhline(
-            gene_height, start, stop, linewidth=1, color='r')
-
-        return line_patch
+        return plot_ax.axhline(
+            gene_height, start, stop, linewidth=1, color=self.color)
 
     def plot_exon(self, plot_ax, exon, row_index=0):
 
-        """Plot the exon to the plotting axes.
-
-        First we get the extent of the exon in axis co-ordinates.
+        """Plot a single exon to the plotting axes.
 
-        We then determine the vertial position of the exon . First the vertial
-        span of each row is calculated by dividing the extent of the whole
-        axis (which is always 1) by the total number of rows. The top of
-        the current exon is then given by the top position of the current row
-        (row_index) minus one fifth of the row span, and the bottom
-        is given by the row_index minus three fifths of the row span.
+        The exon spans from one fifth to three fifths of a row span below
+        the top of the row given by row_index.
 
-        :param plot_ax: Axes to plot the gene name label on
+        :param plot_ax: Axes to plot the exon on
         :type plot_ax: :class:`matplotlib.axes.AxesSubplot`
         :param exon: Exon object to be plotted
         :type exon: :class:`pybedtools.Interval`
@@ -238,32 +306,28 @@ class GeneTrack(FileTrack):
         exon_top = row_index - (span / 5.)
         exon_bottom = row_index - (3 * span / 5.)
 
-        plot_ax.axhspan(exon_top, exon_bottom,
-                        start, stop,
-                        color='r')
+        return plot_ax.axhspan(exon_top, exon_bottom,
+                               start, stop,
+                               color=self.color)
 
     def plot_gene_dict(self, plot_ax, gene_dict, row_index=0,
                        plot_exons=True):
 
-        """Plot the gene dictionary to the plotting axes.
-
-        The 'gene' key of gene_dict should contain a
-        :class:`pybedtools.Interval` representing the entire gene, which is
-        passed to :meth:`plot_gene_body`.
+        """Plot a single gene dictionary to the plotting axes.
 
-        The 'exons' key should contain a list of :class:`pybedtools.Interval`
-        objects representing each individual exon of the gene's longest
-        isoform, which are passed to :meth:`plot_exon` if plot_exons is True.
+        The 'gene' key of gene_dict is passed to :meth:`plot_gene_body`,
+        each of the records in the 'exons' key to :meth:`plot_exon` if
+        plot_exons is True, and finally the name label of the gene is
+        plotted by :meth:`plot_name`.
 
-        Finally, the name label of the gene is plotted by :meth:`plot_name`.
-
-        :param plot_ax: Axes to plot the gene name label on
+        :param plot_ax: Axes to plot the gene on
         :type plot_ax: :class:`matplotlib.axes.AxesSubplot`
         :param dict gene_dict: Dictionary containing the details of the gene
             to be plotted
         :param float row_index: Vertical position of the row on which the gene
             is to be plotted
         :param bool plot_exons: Whether to plot the exons
+        :returns: The gene body and name label artists
         """
 
         gene = gene_dict['gene']
@@ -271,17 +335,10 @@ class GeneTrack(FileTrack):
 
         if plot_exons:
             for exon in gene_dict['exons']:
-
                 self.plot_exon(plot_ax, exon, row_index)
 
-        # FIXME: need to be able to specify the gene name attribute to look for
-        try:
-            name_label_patch = self.plot_name(
-                plot_ax, gene.start, gene.attributes['Name'][0], row_index)
-        except KeyError:
-            name_label_patch = self.plot_name(
-                plot_ax, gene.start, gene.attributes['gene_id'][0], row_index)
-
+        name_label_patch = self.plot_name(
+            plot_ax, gene.start, gene_name(gene), row_index)
 
         return gene_body_patch, name_label_patch
 
@@ -289,19 +346,81 @@ class GeneTrack(FileTrack):
 
         """Private method which plots all the genes over the specified
         interval.
+
+        Rather than adding an artist for every gene and every exon, all the
+        gene bodies are drawn as a single
+        :class:`~matplotlib.collections.LineCollection` and all the exons
+        as a single :class:`~matplotlib.collections.PolyCollection`. Within
+        each row, features less than a pixel apart are first merged by
+        :func:`~EIYBrowse.utils.merge_intervals`, so the number of shapes
+        drawn is limited by the width of the plot rather than by the
+        number of genes. Name labels are then added by :meth:`plot_names`.
+
+        The vertial span of each row is the extent of the whole axis (which
+        is always 1) divided by the total number of rows. Gene bodies are
+        drawn two fifths of a row span below the top of their row, and exons
+        from one fifth to three fifths of a row span below it.
         """
 
         plot_ax.axis('off')
         plot_ax.set_xlim(region.start, region.stop)
         plot_ax.set_ylim(0, 1)
 
+        bp_per_pixel = ((region.stop - region.start) /
+                        plot_ax.get_window_extent().width)
+
+        span = 1. / self.total_rows()
+
+        bodies, exons = [], []
+
         for i, gene_row in enumerate(self.gene_rows.rows):
 
-            for gene_dict in gene_row['genes']:
+            row_index = 1.0 - (i * span)
+
+            genes = [gene_dict['gene'] for gene_dict in gene_row['genes']]
+            row_exons = [exon for gene_dict in gene_row['genes']
+                         for exon in gene_dict['exons']]
+
+            body_starts, body_stops = merge_intervals(
+                [gene.start for gene in genes],
+                [gene.stop for gene in genes], bp_per_pixel)
 
-                row_index = 1.0 - (i * (1.0 / self.total_rows()))
+            body_height = row_index - 2 * span / 5.
 
-                self.plot_gene_dict(plot_ax, gene_dict, row_index)
+            bodies.extend(
+                ((start, body_height), (stop, body_height))
+                for start, stop in zip(
+                    np.maximum(body_starts, region.start).tolist(),
+                    np.minimum(body_stops, region.stop).tolist()))
+
+            exon_starts, exon_stops = merge_intervals(
+                [exon.start for exon in row_exons],
+                [exon.stop for exon in row_exons], bp_per_pixel)
+
+            exon_top = row_index - (span / 5.)
+            exon_bottom = row_index - (3 * span / 5.)
+
+            # Exons of a visible gene can lie wholly outside the region, and
+            # are dropped rather than drawn inside out at its edge
+            exon_starts = np.maximum(exon_starts, region.start)
+            exon_stops = np.minimum(exon_stops, region.stop)
+            visible = exon_starts < exon_stops
+
+            exons.extend(
+                ((start, exon_bottom), (start, exon_top),
+                 (stop, exon_top), (stop, exon_bottom))
+                for start, stop in zip(exon_starts[visible].tolist(),
+                                       exon_stops[visible].tolist()))
+
+        plot_ax.add_collection(
+            LineCollection(bodies, colors=self.color, linewidths=1))
+
+        # The edges make sure exons narrower than a pixel are still drawn
+        plot_ax.add_collection(
+            PolyCollection(exons, facecolors=self.color,
+                           edgecolors=self.color, linewidths=0.5))
+
+        self.plot_names(plot_ax, region)
 
 
 class GeneRows(object):
@@ -314,15 +433,50 @@ class GeneRows(object):
 
         self.rows = []
 
+    def pack(self, gene_extents):
+
+        """Replace the current rows with a new set of genes.
+
+        The genes are assigned to rows by :func:`~EIYBrowse.utils.pack_rows`,
+        so that the start position of each gene is after the stop position
+        of the previous gene in the same row. Within each row, genes are kept
+        in order of their start position, and the 'stop' key of the row
+        gives the rightmost position used by any of its genes.
+
+        :param gene_extents: Iterable of (gene, start, stop) tuples, where
+            start and stop give the space the gene needs in axis
+            co-ordinates.
+        """
+
+        genes, starts, stops = [], [], []
+
+        for gene, start, stop in gene_extents:
+            genes.append(gene)
+            starts.append(start)
+            stops.append(stop)
+
+        row_indices, total_rows = pack_rows(starts, stops)
+
+        self.rows = [{'genes': [], 'stop': 0} for _ in range(total_rows)]
+
+        for i in sorted(range(len(genes)), key=starts.__getitem__):
+            row = self.rows[row_indices[i]]
+            row['genes'].append(genes[i])
+            row['stop'] = max(row['stop'], stops[i])
+
     def add_gene(self, gene, start, stop):
 
-        """Add a gene to the internal store.
+        """Add a single gene to the current rows.
 
         Calls the :meth:`get_gene_row` method to return the row we should
         add the gene to such that it doesn't overlap with any already
         added genes. Then adds the gene to the returned row and updates
         the 'stop' key to reflect the new rightmost position in the row.
 
+        Genes added in order of their start position end up in the same
+        rows as when they are packed together by :meth:`pack`, which is
+        faster for many genes.
+
         :param gene: Gene object to be plotted
         :type gene: :class:`pybedtools.Interval`
         :param float start: Start position of the gene in axis co-ordinates
@@ -331,21 +485,21 @@ class GeneRows(object):
 
         row = self.get_gene_row(start)
         row['genes'].append(gene)
-        row['stop'] = stop
+        row['stop'] = max(row['stop'], stop)
 
     def get_gene_row(self, start):
 
-        """Go through all of the existing rows and return the first row where
-        the start position of the new gene would not overlap the stop position
-        of any existing genes in that row.
+        """Return the row that became free earliest, if its stop position
+        is before start, as chosen by :func:`~EIYBrowse.utils.pack_rows`.
 
-        If no existing row is found, make a new empty row and return that.
+        If no existing row is free, make a new empty row and return that.
 
         :param float start: Start position of the gene in axis co-ordinates
         """
 
-        for row in self.rows:
-            if start > row['stop']:
+        if self.rows:
+            row = min(self.rows, key=lambda r: r['stop'])
+            if row['stop'] < start:
                 return row
 
         new_row = {'genes': [],
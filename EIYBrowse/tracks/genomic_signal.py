@@ -1,7 +1,43 @@
 from .base import FileTrack
+from ..datacache import SignalCache
+from ..transforms import parse_transforms, transformed_signal
 import numpy as np
 
 
+# Number of bins used by bins: auto before the first plot
+DEFAULT_AUTO_BINS = 800
+
+# Ways of summarising the signal within each bin
+SIGNAL_SUMMARIES = ('mean', 'max', 'min', 'envelope')
+
+# With bins: auto, the number of bins is rounded up to one of these
+# multiples of a power of two
+AUTO_BIN_STEPS = (1, 1.25, 1.5, 1.75)
+
+
+def auto_bins(pixels, bases):
+
+    """Return the number of bins to use for a plot pixels wide of a region
+    bases long.
+
+    There should be at least one bin per pixel, but no more bins than bases.
+    The count is rounded up to the next value in a coarse ladder (1, 1.25,
+    1.5 or 1.75 times a power of two), so that plots of slightly different
+    widths use the same bins, and can share data from the signal cache.
+
+    :param float pixels: Width of the plot in pixels.
+    :param int bases: Width of the region in basepairs.
+    """
+
+    pixels = max(1., float(pixels))
+
+    power = 2 ** int(np.floor(np.log2(pixels)))
+    bins = min(int(np.ceil(power * step)) for step in AUTO_BIN_STEPS + (2,)
+               if power * step >= pixels)
+
+    return max(1, min(bins, bases))
+
+
 class GenomicSignalTrack(FileTrack):
 
     """Track for displaying a continuous signal accross a genomic region"""
@@ -10,44 +46,180 @@ class GenomicSignalTrack(FileTrack):
                  bins=800, height=4,
                  color='#377eb8', negative_color=None,
                  ymin=None, ymax=None,
-                 name=None, name_rotate=False):
+                 name=None, name_rotate=False,
+                 summary='mean', transforms=None):
+
+        """To create a new genomic signal track:
+
+        :param datafile: Datafile object with a ``local_coverage`` method,
+            such as a :class:`~EIYBrowse.filetypes.bigwig.BigWigFile` or a
+            metaseq genomic signal object.
+        :param bins: Number of bins to divide the plotted region into, or
+            'auto' to use about one bin per pixel of the plot (see
+            :func:`auto_bins`), at the resolution it is rendered at.
+        :type bins: int or str
+        :param int height: Number of rows of height the track takes up
+        :param str color: Color of the signal
+        :param str negative_color: If given, the color of negative values
+        :param float ymin: Lower limit of the y axis
+        :param float ymax: Upper limit of the y axis
+        :param str name: Optional name label
+        :param bool name_rotate: Whether to rotate the name label 90 degrees
+        :param str summary: How to summarise the signal within each bin:
+            'mean', 'max', 'min', or 'envelope' to fill the band between the
+            minimum and maximum of each bin, so that narrow peaks remain
+            visible in wide regions. For datafiles that only provide the
+            mean (such as the metaseq genomic signal classes), the other
+            summaries are approximated from the means of smaller bins (see
+            :meth:`~EIYBrowse.datacache.SignalCache.local_summaries`).
+        :param list transforms: Transforms to apply to the binned signal
+            before it is plotted, such as smoothing (see
+            :mod:`EIYBrowse.transforms`).
+        """
 
         super(GenomicSignalTrack, self).__init__(datafile,
                                                  name, name_rotate)
 
+        if summary not in SIGNAL_SUMMARIES:
+            raise ValueError('Unknown signal summary "{0}", expected one of '
+                             '{1}'.format(summary, ', '.join(SIGNAL_SUMMARIES)))
+
+        self.summary = summary
+        self.transforms = parse_transforms(transforms)
+
         self.bins, self.height = bins, height
         self.color, self.negative_color = color, negative_color
         self.ymin, self.ymax = ymin, ymax
 
+        self.data_cache = SignalCache(datafile)
+
+        self.last_bins = DEFAULT_AUTO_BINS
+
     def get_config(self, region, browser):
 
         return {'rows': self.height}
 
+    def plot_bins(self, ax, region):
+
+        """Return the number of bins to plot region to ax with, working it
+        out from the width of ax in pixels if bins is 'auto'."""
+
+        if self.bins != 'auto':
+            return self.bins
+
+        self.last_bins = auto_bins(ax.get_window_extent().width,
+                                   region.stop - region.start)
+
+        return self.last_bins
+
+    def prefetch(self, region, windows=1):
+
+        # With bins: auto, neighbouring regions are assumed to be plotted at
+        # the same size as the last plot
+        bins = self.last_bins if self.bins == 'auto' else self.bins
+
+        self.get_signal(region, bins * windows)
+
+    def get_signal(self, region, bins):
+
+        """Return the binned signal over region, as the lower and upper edge
+        of the area to fill under each bin, with any transforms applied.
+        The transforms are applied to both edges, and the extra bins they
+        need beyond the region are fetched along with it.
+
+        :returns: Tuple of (x, lower, upper), as for
+            :meth:`get_summary_signal`.
+        """
+
+        if not self.transforms:
+            return self.get_summary_signal(region, bins)
+
+        def fetch(wide_region, wide_bins):
+
+            """Fetch the edges of the signal over a widened region."""
+
+            sig_x, lower, upper = self.get_summary_signal(wide_region,
+                                                          wide_bins)
+
+            return sig_x, [upper] if lower is None else [lower, upper]
+
+        sig_x, signals = transformed_signal(fetch, region, bins,
+                                            self.transforms)
+
+        if len(signals) == 1:
+            return sig_x, None, signals[0]
+
+        return sig_x, signals[0], signals[1]
+
+    def get_summary_signal(self, region, bins):
+
+        """Return the binned signal over region, as the lower and upper edge
+        of the area to fill under each bin.
+
+        The mean is fetched with the datafile's ``local_coverage`` method.
+        Any other summary is taken from
+        :meth:`~EIYBrowse.datacache.SignalCache.local_summaries`, which
+        calculates the mean, maximum and minimum of every bin together.
+
+        :returns: Tuple of (x, lower, upper). lower is None unless the
+            summary is 'envelope', in which case it holds the minimum of
+            each bin.
+        """
+
+        if self.summary == 'mean':
+            sig_x, sig_y = self.data_cache.local_coverage(region, bins=bins)
+            return sig_x, None, sig_y
+
+        sig_x, sig_ys = self.data_cache.local_summaries(region, bins)
+
+        if self.summary == 'envelope':
+            return sig_x, sig_ys['min'], sig_ys['max']
+
+        return sig_x, None, sig_ys[self.summary]
+
     def _plot(self, ax, region):
 
+        """Fill the area under the signal, or between the minimum and the
+        maximum for the envelope summary. If a negative_color is given, the
+        positive and negative parts are filled separately, using where
+        masks rather than copies of the signal."""
+
         ax.set_axis_off()
 
-        sig_x, sig_y = self.datafile.local_coverage(
-            region, bins=self.bins)
+        sig_x, lower, upper = self.get_signal(region,
+                                              self.plot_bins(ax, region))
+
+        data = (sig_x, upper)
 
-        if self.negative_color is not None:
-            pos_y = sig_y.copy()
-            pos_y[pos_y <= 0.] = np.NAN
+        # Bins are positioned by their start, so the value of the last bin
+        # is carried on to the end of the region
+        if len(sig_x) and sig_x[-1] < region.stop:
+            sig_x = np.append(sig_x, region.stop)
+            upper = np.append(upper, upper[-1])
+            if lower is not None:
+                lower = np.append(lower, lower[-1])
 
-            pos_patches = ax.fill_between(
-                sig_x, pos_y, color=self.color)
+        if self.negative_color is None:
 
-            neg_y = sig_y.copy()
-            neg_y[neg_y >= 0.] = np.NAN
+            patches = ax.fill_between(sig_x, 0 if lower is None else lower,
+                                      upper, color=self.color)
 
-            neg_patches = ax.fill_between(
-                sig_x, neg_y, color=self.negative_color)
+        elif lower is None:
 
-            patches = [pos_patches, neg_patches]
+            patches = [
+                ax.fill_between(sig_x, upper, where=upper > 0,
+                                color=self.color),
+                ax.fill_between(sig_x, upper, where=upper < 0,
+                                color=self.negative_color)]
 
         else:
 
-            patches = ax.fill_between(sig_x, sig_y, color=self.color)
+            # Bands that cross zero are split between the two colours
+            patches = [
+                ax.fill_between(sig_x, np.maximum(lower, 0), upper,
+                                where=upper > 0, color=self.color),
+                ax.fill_between(sig_x, lower, np.minimum(upper, 0),
+                                where=lower < 0, color=self.negative_color)]
 
         ax.set_xlim(region.start, region.stop)
         bottom, top = ax.get_ylim()
@@ -58,5 +230,5 @@ class GenomicSignalTrack(FileTrack):
         ax.set_ylim(bottom, top)
 
         return {'patches': patches,
-                'data': (sig_x, sig_y),
+                'data': data,
                 }
@@ -4,7 +4,6 @@ loci are measured against many loci e.g. 5C or Hi-C data.
 """
 
 from .base import FileTrack
-from PIL import Image
 import numpy as np
 from math import ceil
 from matplotlib import cm
@@ -43,6 +42,8 @@ def rotate_heatmap(data, flip=False):
         axis (default is upwards).
     """
 
+    from PIL import Image
+
     # The width will be equal to the diagonal of the rotated square
 
     # Make a PIL image from a copy of the array (due to a PIL 2to3 bug)
@@ -2,13 +2,23 @@
 genomic features, or intervals, such as those you might find in
 a bed file.
 
+When a region holds more intervals than can be told apart, the track
+switches to a density mode, and plots the number of intervals overlapping
+each pixel instead of the intervals themselves.
+
 Whilst the UCSC browser treats genes as a specialized case of
 intervals, we have a separate track for genes:
 :class:`EIYBrowse.tracks.genes`.
 """
 
+import numpy as np
+import matplotlib
+from matplotlib.cbook import normalize_kwargs
+from matplotlib.collections import LineCollection
 from .base import FileTrack
-import itertools
+from ..datacache import IntervalCache
+from ..utils import (font_from_text_kwargs, text_width, pack_rows,
+                     interval_coverage)
 
 
 class GenomicIntervalTrack(FileTrack):
@@ -21,20 +31,32 @@ class GenomicIntervalTrack(FileTrack):
     # pylint: disable=too-many-arguments
     def __init__(self, datafile,
                  labels=None, glyphs=None,
-                 name=None, name_rotate=False):
+                 name=None, name_rotate=False,
+                 max_rows=10,
+                 density_threshold=1., density_rows=2):
 
         """To create a new genomic interval track:
 
         :param datafile: Datafile object which will handles access to the
-            genomic intervals across a specific region.
+            genomic intervals across a specific region, such as a
+            :class:`~EIYBrowse.filetypes.bed_index.BedIndexFile` or a
+            metaseq BED file.
         :param labels: If specified, a dictionary of additional arguments
             to pass to :func:`matplotlib.pyplot.text`
         :type labels: dict or None
         :param glyphs: If specified, a dictionary of additional arguments
-            to pass to :meth:`matplotlib.axes.AxesSubplot.hlines`
+            to pass to :class:`matplotlib.collections.LineCollection`
         :type glyphs: dict or None
         :param str name: Optional name label
         :param bool name_rotate: Whether to rotate the name label 90 degrees
+        :param int max_rows: Overlapping intervals are arranged into
+            separate rows, up to this many. Any intervals that do not fit
+            are drawn in the last row.
+        :param float density_threshold: If there are more intervals than
+            this per pixel of the plot, draw the number of intervals over
+            each pixel instead of the intervals themselves.
+        :param int density_rows: Number of rows to use for the density
+            plot.
         """
 
         super(GenomicIntervalTrack, self).__init__(datafile,
@@ -47,7 +69,7 @@ class GenomicIntervalTrack(FileTrack):
             glyphs = {}
 
         if 'colors' in glyphs:
-            self.colors = itertools.cycle(glyphs['colors'])
+            self.colors = list(glyphs['colors'])
             del glyphs['colors']
         else:
             self.colors = None
@@ -59,10 +81,29 @@ class GenomicIntervalTrack(FileTrack):
             self.jitter = 0
 
         self.labels, self.glyphs = labels, glyphs
+        self.max_rows = max_rows
+        self.density_threshold, self.density_rows = (density_threshold,
+                                                     density_rows)
+
+        self.data_cache = IntervalCache(datafile)
+
+        self.intervals, self.interval_rows, self.total_rows = None, None, 1
+        self.density = False
 
     def get_config(self, region, browser):
 
-        """Calculate how many rows of height need to be requested.
+        """Fetch the intervals overlapping region and arrange them into
+        rows, so that no two intervals in the same row overlap once drawn.
+
+        As for :class:`~EIYBrowse.tracks.genes.GeneTrack`, intervals are
+        measured in points across the width of the data axis given by
+        :meth:`~EIYBrowse.core.Browser.data_axis_width`, and packed by
+        :func:`~EIYBrowse.utils.pack_rows`. Intervals that would be drawn
+        less than a point apart are put in separate rows.
+
+        If there are more than density_threshold intervals per pixel of the
+        data axis (at the default figure resolution), no rows are packed,
+        and the track is drawn in density mode instead.
 
         :param region: Genomic region to plot
         :type region: :class:`pybedtools.Interval`
@@ -70,16 +111,153 @@ class GenomicIntervalTrack(FileTrack):
         :type browser: :class:`~EIYBrowse.core.Browser`
         """
 
-        #TODO: At the moment we only request one row. The logic that guides
-        # arrangement of genes in the genes track should be refactored so
-        # that it can be used to arrange genomic intervals here.
+        intervals = self.data_cache.intervals(region)
+
+        self.intervals = intervals
+
+        pixels = browser.data_axis_width() * matplotlib.rcParams['figure.dpi']
+        self.density = len(intervals) > self.density_threshold * pixels
+
+        if self.density:
+            self.interval_rows, self.total_rows = None, 1
+            return {'rows': self.density_rows}
+
+        scale = browser.data_axis_width() * 72. / (region.stop - region.start)
+
+        starts = (np.maximum(intervals.starts, region.start) -
+                  region.start) * scale
+        stops = (np.minimum(intervals.stops, region.stop) -
+                 region.start) * scale
+
+        rows, total_rows = pack_rows(starts, stops + 1.)
+
+        self.interval_rows = np.minimum(rows, self.max_rows - 1)
+        self.total_rows = max(1, min(total_rows, self.max_rows))
+
+        return {'rows': self.total_rows}
+
+    def prefetch(self, region, windows=1):
+
+        """Warm the interval cache for region. Intervals do not depend on
+        the resolution of the plot, so windows is ignored.
+
+        :param region: Genomic region to fetch intervals for
+        :type region: :class:`pybedtools.Interval`
+        :param int windows: Number of windows region will be plotted as.
+        """
+
+        self.data_cache.intervals(region)
+
+    def interval_colors(self):
+
+        """Return the colour of each interval, taking colours from the
+        colors glyph option in turn, or None if no colours were given."""
+
+        if self.colors is None:
+            return None
+
+        return [self.colors[i % len(self.colors)]
+                for i in range(len(self.intervals))]
+
+    def plot_labels(self, ax, region, colors=None):
+
+        """Plot the name labels of the intervals that have room for them.
+
+        A label is drawn below the start of its interval, and is culled if
+        it would run into the next interval in the same row or off the
+        right hand edge of the plot. Gaps are
+        measured with array operations first, so that only intervals with
+        at least a few pixels of room have their labels measured, which
+        keeps dense regions fast.
+
+        :param ax: Axes to plot the labels on
+        :type ax: :class:`matplotlib.axes.AxesSubplot`
+        :param region: Genomic region being plotted
+        :type region: :class:`pybedtools.Interval`
+        :param list colors: Colour of each interval, or None
+        """
+
+        starts, rows = self.intervals.starts, self.interval_rows
+
+        if not len(starts):
+            return []
+
+        font = font_from_text_kwargs(self.labels)
+        dpi = ax.figure.dpi
+        padding = text_width(' ', font, dpi)
+
+        bp_per_pixel = ((region.stop - region.start) /
+                        ax.get_window_extent().width)
+
+        label_starts = np.maximum(starts, region.start)
+
+        # Room in pixels from the start of each label to the next interval
+        # in its row, or to the edge of the plot for the last interval
+        order = np.lexsort((starts, rows))
+        next_starts = np.full(len(starts), region.stop)
+        same_row = rows[order][1:] == rows[order][:-1]
+        next_starts[order[:-1][same_row]] = starts[order][1:][same_row]
+        gaps = (next_starts - label_starts) / bp_per_pixel
+
+        names = self.intervals.names
+        span = 1. / self.total_rows
+
+        labels = []
+
+        for i in np.nonzero(gaps > 2 * padding)[0].tolist():
+
+            if names[i] == '.' or \
+                    text_width(names[i], font, dpi) + padding > gaps[i]:
+                continue
+
+            label_kwargs = dict(self.labels)
+            if colors is not None:
+                label_kwargs['color'] = colors[i]
+
+            labels.append(ax.text(label_starts[i],
+                                  1. - (rows[i] + 0.8) * span,
+                                  names[i], **label_kwargs))
+
+        return labels
+
+    def plot_density(self, ax, region):
+
+        """Plot the number of intervals overlapping each pixel of the axis,
+        as counted by :func:`~EIYBrowse.utils.interval_coverage`.
+
+        :param ax: Axes to plot the density on
+        :type ax: :class:`matplotlib.axes.AxesSubplot`
+        :param region: Genomic region being plotted
+        :type region: :class:`pybedtools.Interval`
+        """
+
+        bins = max(1, int(round(ax.get_window_extent().width)))
+
+        edges, counts = interval_coverage(self.intervals.starts,
+                                          self.intervals.stops,
+                                          region.start, region.stop, bins)
 
-        return {'rows': 1}
+        glyph_kwargs = normalize_kwargs(self.glyphs, LineCollection)
+
+        if self.colors is not None:
+            color = self.colors[0]
+        else:
+            color = glyph_kwargs.get('color', '#377eb8')
+
+        patches = ax.fill_between(edges, np.append(counts, counts[-1]),
+                                  step='post', color=color, linewidth=0)
+
+        ax.set_ylim(0, max(counts.max(), 1))
+
+        return {'patches': [patches], 'data': (edges, counts)}
 
     def _plot(self, ax, region):
 
-        """Handle plotting to the specified plotting axis. Get all the
-        intervals that overlap the requested region, then plot them.
+        """Handle plotting to the specified plotting axis. All of the
+        intervals found by :meth:`get_config` are drawn as a single
+        :class:`~matplotlib.collections.LineCollection`, each in its own
+        row, and then labelled by :meth:`plot_labels`. In density mode,
+        :meth:`plot_density` is used instead.
         """
 
         ax.set_axis_off()
@@ -87,24 +265,29 @@ class GenomicIntervalTrack(FileTrack):
         ax.set_xlim(region.start, region.end)
         ax.set_ylim(0, 1)
 
-        patches = []
+        if self.density:
+            return self.plot_density(ax, region)
+
+        span = 1. / self.total_rows
+        rows = self.interval_rows
+
+        jitter = np.where(np.arange(len(rows)) % 2, 1, -1) * self.jitter
+        heights = 1. - (rows + 0.35) * span + jitter * span
 
-        for i, interval in enumerate(self.datafile.adapter[region]):
+        segments = np.empty((len(rows), 2, 2))
+        segments[:, 0, 0] = self.intervals.starts
+        segments[:, 1, 0] = self.intervals.stops
+        segments[:, :, 1] = heights[:, np.newaxis]
 
-            vertical_pos = 0.65 + ((i % 2 or -1) * self.jitter)
+        glyph_kwargs = {'linewidth': 4}
+        glyph_kwargs.update(normalize_kwargs(self.glyphs, LineCollection))
 
-            if self.colors is not None:
-                col = self.colors.next()
-                self.labels['color'] = col
-                self.glyphs['color'] = col
+        colors = self.interval_colors()
+        if colors is not None:
+            glyph_kwargs['color'] = colors
 
-            patches.append(
-                ax.hlines(vertical_pos,
-                          interval.start, interval.stop,
-                          lw=4, **self.glyphs))
+        patches = ax.add_collection(LineCollection(segments, **glyph_kwargs))
 
-            if not interval.name == '.':
-                ax.text(interval.start, 0.2, interval.name,
-                        **self.labels)
+        labels = self.plot_labels(ax, region, colors)
 
-        return {'patches': patches}
+        return {'patches': [patches], 'labels': labels}
@@ -5,7 +5,6 @@ position in basepair co-ordinates.
 
 from .base import Track
 from ..utils import format_genomic_distance
-from matplotlib import pyplot as plt
 
 
 class LocationTrack(Track):
@@ -28,6 +27,8 @@ class LocationTrack(Track):
 
         """Private method to actually do the plotting."""
 
+        from matplotlib import pyplot as plt
+
         ax.spines['left'].set_visible(False)
         ax.spines['bottom'].set_visible(False)
         ax.spines['right'].set_visible(False)
@@ -0,0 +1,216 @@
+"""The metaplot module defines a track showing the average profile of a
+signal over a set of features (e.g. peaks or transcription start sites),
+with a confidence band.
+
+The signal over every feature is fetched in one batch by
+:func:`~EIYBrowse.filetypes.binning.coverage_matrix`, as a features x bins
+matrix, so the track can use any datafile a
+:class:`~EIYBrowse.tracks.genomic_signal.GenomicSignalTrack` can. The
+profile does not depend on the region being browsed, so it is calculated
+once and drawn the same way in every plot.
+"""
+
+from statistics import NormalDist
+import numpy as np
+
+from .base import FileTrack
+from ..filetypes.binning import SUMMARIES, coverage_matrix
+
+
+class MetaplotTrack(FileTrack):
+
+    """Track for displaying the mean signal over a set of features"""
+
+    # pylint: disable=too-many-arguments, too-many-instance-attributes
+    def __init__(self, datafile, features,
+                 bins=100, width=None, anchor='center',
+                 summary='mean', confidence=0.95,
+                 height=4, color='#377eb8',
+                 ymin=None, ymax=None, workers=None,
+                 chrom_sizes=None,
+                 name=None, name_rotate=False):
+
+        """To create a new metaplot track:
+
+        :param datafile: Datafile object with a ``local_coverage`` method,
+            as for :class:`~EIYBrowse.tracks.genomic_signal.GenomicSignalTrack`.
+        :param features: Features to average the signal over, as an
+            iterable of :class:`pybedtools.Interval` objects (e.g. a
+            :class:`pybedtools.BedTool`).
+        :param int bins: Number of bins to divide each feature into
+        :param int width: If given, the signal is taken over a window of
+            this many basepairs around the anchor of each feature, rather
+            than over the features themselves, which are scaled to the same
+            number of bins.
+        :param str anchor: Position the windows are centered on, either
+            'center' for the middle of each feature, or 'start' for its
+            5' end (e.g. the transcription start site of a gene).
+        :param str summary: Summary of the signal within each bin, one of
+            'mean', 'max' or 'min'.
+        :param float confidence: Confidence level of the band around the
+            mean, from the normal approximation to the standard error.
+        :param int height: Number of rows of height the track takes up
+        :param str color: Color of the mean and the confidence band
+        :param float ymin: Lower limit of the y axis
+        :param float ymax: Upper limit of the y axis
+        :param int workers: Number of chromosomes to fetch at the same time.
+        :param dict chrom_sizes: Optional length of each chromosome, used to
+            leave out windows running past the end of their chromosome.
+            Defaults to the ``chrom_sizes`` of the datafile, if it has them.
+        :param str name: Optional name label
+        :param bool name_rotate: Whether to rotate the name label 90 degrees
+        """
+
+        super(MetaplotTrack, self).__init__(datafile, name, name_rotate)
+
+        if anchor not in ('center', 'start'):
+            raise ValueError('Unknown metaplot anchor "{0}", expected '
+                             'center or start'.format(anchor))
+
+        if summary not in SUMMARIES:
+            raise ValueError('Unknown signal summary "{0}", expected one of '
+                             '{1}'.format(summary, ', '.join(SUMMARIES)))
+
+        self.features = features
+
+        self.bins, self.width, self.anchor = bins, width, anchor
+        self.summary, self.confidence = summary, confidence
+        self.height, self.color = height, color
+        self.ymin, self.ymax = ymin, ymax
+        self.workers = workers
+        self.chrom_sizes = chrom_sizes
+
+        self.profile = None
+
+    def get_config(self, region, browser):
+
+        return {'rows': self.height}
+
+    def feature_windows(self):
+
+        """Return the chromosome, start, stop and strand of the window to
+        fetch for each feature, leaving out any window that would start
+        before the beginning of its chromosome, or end after the end of it
+        where the length of the chromosome is known."""
+
+        features = list(self.features)
+
+        chroms = np.array([feature.chrom for feature in features])
+        strands = np.array([feature.strand for feature in features])
+        starts = np.array([feature.start for feature in features],
+                          dtype=np.int64)
+        stops = np.array([feature.stop for feature in features],
+                         dtype=np.int64)
+
+        if self.width is not None:
+
+            if self.anchor == 'center':
+                anchors = (starts + stops) // 2
+            else:
+                anchors = np.where(strands == '-', stops, starts)
+
+            starts = anchors - self.width // 2
+            stops = starts + self.width
+
+        keep = (starts >= 0) & (stops > starts)
+
+        chrom_sizes = self.chrom_sizes
+        if chrom_sizes is None:
+            chrom_sizes = getattr(self.datafile, 'chrom_sizes', None) or {}
+
+        if len(features) and chrom_sizes:
+            sizes = np.array([chrom_sizes.get(chrom, -1) for chrom in chroms],
+                             dtype=np.int64)
+            keep &= (sizes < 0) | (stops <= sizes)
+
+        return chroms[keep], starts[keep], stops[keep], strands[keep]
+
+    def get_profile(self):
+
+        """Return the mean signal in each bin over all the features, and
+        the half width of its confidence band, calculating them on the
+        first call."""
+
+        if self.profile is None:
+
+            chroms, starts, stops, strands = self.feature_windows()
+
+            matrix = coverage_matrix(self.datafile, chroms, starts, stops,
+                                     self.bins, self.summary, strands,
+                                     self.workers)
+
+            mean = matrix.mean(axis=0) if len(matrix) else \
+                np.zeros(self.bins)
+
+            if len(matrix) > 1:
+                sem = matrix.std(axis=0, ddof=1) / np.sqrt(len(matrix))
+            else:
+                sem = np.zeros(self.bins)
+
+            z_score = NormalDist().inv_cdf(0.5 + self.confidence / 2.)
+
+            self.profile = (mean, z_score * sem)
+
+        return self.profile
+
+    def prefetch(self, region, windows=1):
+
+        self.get_profile()
+
+    def _plot(self, ax, region):
+
+        ax.set_axis_off()
+
+        mean, error = self.get_profile()
+
+        profile_x = np.arange(self.bins) + 0.5
+
+        patches = [ax.fill_between(profile_x, mean - error, mean + error,
+                                   color=self.color, alpha=0.3,
+                                   linewidth=0),
+                   ax.plot(profile_x, mean, color=self.color)[0]]
+
+        ax.set_xlim(0, self.bins)
+        bottom, top = ax.get_ylim()
+        if not self.ymin is None:
+            bottom = self.ymin
+        if not self.ymax is None:
+            top = self.ymax
+        ax.set_ylim(bottom, top)
+
+        if self.width is not None:
+            ax.text(0, 0, '-{0:,}'.format(self.width // 2),
+                    transform=ax.transAxes, fontsize='x-small',
+                    horizontalalignment='left', verticalalignment='top')
+            ax.text(1, 0, '+{0:,}'.format(self.width // 2),
+                    transform=ax.transAxes, fontsize='x-small',
+                    horizontalalignment='right', verticalalignment='top')
+
+        return {'patches': patches,
+                'data': (mean, error),
+                }
+
+    @classmethod
+    def from_config_dict(cls, file_path, file_type, features_path,
+                         file_options=None, **kwargs):
+
+        """Open the datafile as for
+        :meth:`~EIYBrowse.tracks.base.FileTrack.from_config_dict`, and read
+        the features from a BED file.
+
+        :param str features_path: Path to a BED file of the features to
+            average the signal over.
+        :param chrom_sizes: Optional path to a UCSC style chrom.sizes file,
+            or dictionary, of the length of each chromosome.
+        """
+
+        import pybedtools
+
+        kwargs['features'] = pybedtools.BedTool(features_path)
+
+        if isinstance(kwargs.get('chrom_sizes'), str):
+            from ..pyramid import read_chrom_sizes
+            kwargs['chrom_sizes'] = read_chrom_sizes(kwargs['chrom_sizes'])
+
+        return super(MetaplotTrack, cls).from_config_dict(
+            file_path, file_type, file_options, **kwargs)
@@ -0,0 +1,257 @@
+"""The signal_matrix module defines a track for comparing the signal of many
+samples (e.g. a cohort of ChIP-seq or ATAC-seq experiments) over the same
+region.
+
+Rather than stacking one :class:`~EIYBrowse.tracks.genomic_signal.GenomicSignalTrack`
+per sample, which fetches the samples one after another and draws a
+separate artist for each, the signal matrix track fetches every sample at
+the same time on a pool of threads, and assembles a samples x bins array.
+The array is then drawn all at once, either as a heatmap image or as
+small multiples sharing a single y scale.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from matplotlib.collections import PolyCollection
+
+from .base import Track
+from .genomic_signal import DEFAULT_AUTO_BINS, auto_bins
+from ..datacache import SignalCache
+from ..filetypes import LazyDatafile
+
+
+# Fraction of each sample's row that the tallest signal fills in the small
+# multiples style
+SMALL_MULTIPLE_FILL = 0.9
+
+
+class SignalMatrixTrack(Track):
+
+    """Track for displaying the signal of many samples across a genomic
+    region, one sample per row."""
+
+    # pylint: disable=too-many-arguments, too-many-instance-attributes
+    def __init__(self, datafiles,
+                 samples=None,
+                 bins='auto', height=4,
+                 style='heatmap', summary='mean',
+                 cmap='Blues', color='#377eb8',
+                 vmin=None, vmax=None,
+                 workers=8,
+                 name=None, name_rotate=False):
+
+        """To create a new signal matrix track:
+
+        :param list datafiles: Datafile objects with a ``local_coverage``
+            method, one per sample.
+        :param list samples: Optional names of the samples, drawn to the
+            left of each row.
+        :param bins: Number of bins to divide the plotted region into, or
+            'auto' to use about one bin per pixel (see
+            :func:`~EIYBrowse.tracks.genomic_signal.auto_bins`).
+        :type bins: int or str
+        :param int height: Number of rows of height the track takes up
+        :param str style: 'heatmap' to draw the samples x bins array as an
+            image, or 'lines' to draw each sample's signal in its own row,
+            as small multiples.
+        :param str summary: Summary of the signal within each bin, one of
+            'mean', 'max' or 'min'.
+        :param str cmap: Colour map of the heatmap
+        :param str color: Colour of the small multiples
+        :param float vmin: Signal value at the bottom of the colour map
+            or of each small multiple. Defaults to the smallest value in the
+            array, or 0 if that is positive.
+        :param float vmax: Signal value at the top of the colour map or of
+            each small multiple. Defaults to the largest value in the array.
+        :param int workers: Number of samples to fetch at the same time.
+        :param str name: Optional name label
+        :param bool name_rotate: Whether to rotate the name label 90 degrees
+        """
+
+        super(SignalMatrixTrack, self).__init__(name, name_rotate)
+
+        if style not in ('heatmap', 'lines'):
+            raise ValueError('Unknown signal matrix style "{0}", expected '
+                             'heatmap or lines'.format(style))
+
+        if summary not in ('mean', 'max', 'min'):
+            raise ValueError('Unknown signal summary "{0}", expected one of '
+                             'mean, max, min'.format(summary))
+
+        self.datafiles = datafiles
+        self.samples = samples
+
+        self.bins, self.height = bins, height
+        self.style, self.summary = style, summary
+        self.cmap, self.color = cmap, color
+        self.vmin, self.vmax = vmin, vmax
+
+        self.data_caches = [SignalCache(datafile) for datafile in datafiles]
+        self.workers = workers
+
+        self.last_bins = DEFAULT_AUTO_BINS
+
+    def get_config(self, region, browser):
+
+        return {'rows': self.height}
+
+    def plot_bins(self, ax, region):
+
+        """Return the number of bins to plot region to ax with, working it
+        out from the width of ax in pixels if bins is 'auto'."""
+
+        if self.bins != 'auto':
+            return self.bins
+
+        self.last_bins = auto_bins(ax.get_window_extent().width,
+                                   region.stop - region.start)
+
+        return self.last_bins
+
+    def _sample_signal(self, data_cache, region, bins):
+
+        """Return the binned signal of one sample."""
+
+        if self.summary == 'mean':
+            return data_cache.local_coverage(region, bins=bins)
+
+        sig_x, sig_ys = data_cache.local_summaries(region, bins)
+
+        return sig_x, sig_ys[self.summary]
+
+    def signal_matrix(self, region, bins):
+
+        """Fetch the signal of every sample over region, in parallel.
+
+        :param region: Genomic region to fetch the signal for
+        :type region: :class:`pybedtools.Interval`
+        :param int bins: Number of bins to divide region into
+        :returns: Array of bin positions, and a samples x bins array of
+            signal.
+        """
+
+        # The pool only lives as long as the fetch, so tracks don't hold on
+        # to idle threads between plots
+        with ThreadPoolExecutor(max(1, self.workers)) as executor:
+            signals = list(executor.map(
+                lambda data_cache: self._sample_signal(data_cache, region,
+                                                       bins),
+                self.data_caches))
+
+        if not signals:
+            return np.zeros(0), np.zeros((0, bins))
+
+        return signals[0][0], np.array([sig_y for _, sig_y in signals],
+                                       dtype=np.float64)
+
+    def warmup(self):
+
+        for datafile in self.datafiles:
+            if isinstance(datafile, LazyDatafile):
+                datafile.open()
+
+    def prefetch(self, region, windows=1):
+
+        bins = self.last_bins if self.bins == 'auto' else self.bins
+
+        self.signal_matrix(region, bins * windows)
+
+    def color_limits(self, matrix):
+
+        """Return the (vmin, vmax) shared by every sample, taken from the
+        track options if they were given and from the signal otherwise."""
+
+        finite = matrix[np.isfinite(matrix)]
+
+        vmin, vmax = self.vmin, self.vmax
+
+        if vmin is None:
+            vmin = min(0., finite.min()) if finite.size else 0.
+        if vmax is None:
+            vmax = finite.max() if finite.size else 1.
+
+        if vmax <= vmin:
+            vmax = vmin + 1.
+
+        return vmin, vmax
+
+    def plot_small_multiples(self, ax, sig_x, matrix, vmin, vmax):
+
+        """Draw the signal of every sample in its own row, with the first
+        sample at the top, as a single
+        :class:`~matplotlib.collections.PolyCollection`."""
+
+        n_samples, bins = matrix.shape
+
+        baselines = np.arange(1, n_samples + 1, dtype=np.float64)
+        scaled = ((np.clip(matrix, vmin, vmax) - vmin) / (vmax - vmin) *
+                  SMALL_MULTIPLE_FILL)
+
+        # Each polygon runs along the baseline of its row at either end
+        verts = np.empty((n_samples, bins + 2, 2))
+        verts[:, 1:-1, 0] = sig_x
+        verts[:, 0, 0], verts[:, -1, 0] = sig_x[0], sig_x[-1]
+        verts[:, 1:-1, 1] = baselines[:, np.newaxis] - scaled
+        verts[:, 0, 1] = verts[:, -1, 1] = baselines
+
+        return ax.add_collection(
+            PolyCollection(verts, facecolors=self.color,
+                           edgecolors='none'))
+
+    def _plot(self, ax, region):
+
+        ax.set_axis_off()
+
+        sig_x, matrix = self.signal_matrix(region,
+                                           self.plot_bins(ax, region))
+
+        n_samples = len(self.data_caches)
+
+        ax.set_xlim(region.start, region.stop)
+        ax.set_ylim(max(n_samples, 1), 0)
+
+        if not n_samples:
+            return {'patches': [], 'data': (sig_x, matrix)}
+
+        vmin, vmax = self.color_limits(matrix)
+
+        if self.style == 'heatmap':
+            patches = ax.imshow(matrix, aspect='auto', cmap=self.cmap,
+                                vmin=vmin, vmax=vmax,
+                                interpolation='nearest',
+                                extent=(region.start, region.stop,
+                                        n_samples, 0))
+        else:
+            patches = self.plot_small_multiples(ax, sig_x, matrix,
+                                                vmin, vmax)
+
+        if self.samples:
+            for i, sample in enumerate(self.samples):
+                ax.text(-0.005, i + 0.5, sample,
+                        transform=ax.get_yaxis_transform(),
+                        horizontalalignment='right',
+                        verticalalignment='center', fontsize='x-small')
+
+        return {'patches': patches,
+                'data': (sig_x, matrix),
+                }
+
+    @classmethod
+    def from_config_dict(cls, file_paths, file_type,
+                         file_options=None, **kwargs):
+
+        """Create a new track with one datafile for each path in file_paths,
+        which is opened the first time the track fetches data from it.
+
+        :param list file_paths: Paths to the datafile of each sample
+        :param str file_type: String specifying the format of the
+            datafiles (see :meth:`~EIYBrowse.tracks.base.FileTrack.from_config_dict`)
+        :param dict file_options: Optional keyword arguments for the class
+            which opens the datafiles.
+        """
+
+        datafiles = [LazyDatafile(file_path, file_type,
+                                  **(file_options or {}))
+                     for file_path in file_paths]
+
+        return cls(datafiles, **kwargs)
@@ -0,0 +1,275 @@
+"""The transforms module holds transformations which can be applied to a
+binned signal before it is plotted, such as smoothing a noisy
+low-coverage track.
+
+Transforms are given in the configuration of a signal track as a list,
+and applied in order. Each is either the name of a transform which takes
+no options, or a mapping from the name of a transform to its option::
+
+    tracks:
+      - signal:
+          file_path: reads.bw
+          file_type: bigwig
+          transforms:
+            - rolling_median: 5
+            - gaussian: 2
+            - log1p
+
+Window sizes are given in bins. Transforms that look at neighbouring bins
+need some bins beyond each end of the plotted region (their flank), which
+:func:`transformed_signal` fetches from the datafile along with the
+region, so that the plotted signal has no edge effects.
+"""
+
+import abc
+import warnings
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+# Number of box filters the Gaussian is approximated by
+GAUSSIAN_BOXES = 3
+
+
+class Transform(object):
+
+    """Base class for signal transforms.
+
+    A transform takes an array of binned signal with flank extra bins at
+    each end, and returns the transformed signal without them.
+    """
+
+    __metaclass__ = abc.ABCMeta
+
+    flank = 0
+
+    @abc.abstractmethod
+    def __call__(self, values):
+
+        """Transform values, returning flank fewer bins at each end. To be
+        overwritten by all subclasses."""
+
+
+class RollingMean(Transform):
+
+    """Mean of a centred window of bins, from a cumulative sum, so that it
+    takes the same time whatever the size of the window. Bins without a
+    value (NaN) are left out of the sum, so that they do not spread along
+    it, and a window with no values at all gives NaN."""
+
+    def __init__(self, window):
+
+        """Create a new rolling mean transform.
+
+        :param int window: Number of bins in the window. Even windows are
+            widened by one bin, so that they can be centred.
+        """
+
+        super(RollingMean, self).__init__()
+
+        self.flank = int(window) // 2
+
+    def __call__(self, values):
+
+        window = 2 * self.flank + 1
+        present = ~np.isnan(values)
+
+        totals = np.concatenate([[0.], np.cumsum(np.where(present, values,
+                                                          0.))])
+        counts = np.concatenate([[0], np.cumsum(present)])
+
+        window_totals = totals[window:] - totals[:-window]
+        window_counts = counts[window:] - counts[:-window]
+
+        return np.divide(window_totals, window_counts,
+                         out=np.full(len(window_totals), np.nan),
+                         where=window_counts > 0)
+
+
+class RollingMedian(Transform):
+
+    """Median of a centred window of bins, which removes isolated spikes
+    without blurring steps in the signal. Bins without a value (NaN) are
+    left out of the median, and a window with no values at all gives
+    NaN."""
+
+    def __init__(self, window):
+
+        """Create a new rolling median transform.
+
+        :param int window: Number of bins in the window. Even windows are
+            widened by one bin, so that they can be centred.
+        """
+
+        super(RollingMedian, self).__init__()
+
+        self.flank = int(window) // 2
+
+    def __call__(self, values):
+
+        with warnings.catch_warnings():
+            # Windows with no values at all are expected to give NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return np.nanmedian(
+                sliding_window_view(values, 2 * self.flank + 1), axis=-1)
+
+
+class Gaussian(Transform):
+
+    """Gaussian smoothing, approximated by GAUSSIAN_BOXES rolling means in
+    turn, so that it takes the same time whatever the width of the
+    Gaussian. The box widths are chosen so that the variance of the
+    combined filter matches the Gaussian's as closely as odd widths allow
+    (as in Kovesi, *Fast almost-Gaussian filtering*, 2010)."""
+
+    def __init__(self, sigma):
+
+        """Create a new Gaussian smoothing transform.
+
+        :param float sigma: Standard deviation of the Gaussian, in bins.
+        """
+
+        super(Gaussian, self).__init__()
+
+        self.boxes = [RollingMean(width)
+                      for width in box_widths(float(sigma), GAUSSIAN_BOXES)]
+        self.flank = sum(box.flank for box in self.boxes)
+
+    def __call__(self, values):
+
+        for box in self.boxes:
+            values = box(values)
+
+        return values
+
+
+def box_widths(sigma, boxes):
+
+    """Return the odd widths of boxes box filters which, applied in turn,
+    have a variance closest to sigma squared. Every width is one of two
+    consecutive odd numbers.
+
+    :param float sigma: Standard deviation to match, in bins.
+    :param int boxes: Number of box filters.
+    """
+
+    variance = 12. * sigma ** 2
+
+    lower = int(np.sqrt(variance / boxes + 1))
+    lower -= 1 - lower % 2
+
+    # Number of boxes of the lower width, with the rest two bins wider
+    n_lower = int(round((variance - boxes * lower ** 2 - 4 * boxes * lower -
+                         3 * boxes) / (-4. * lower - 4)))
+    n_lower = min(max(n_lower, 0), boxes)
+
+    return [lower] * n_lower + [lower + 2] * (boxes - n_lower)
+
+
+class Log1p(Transform):
+
+    """log(1 + x) of the signal, applied to the magnitude of negative values
+    so that signals such as log ratios keep their sign."""
+
+    def __call__(self, values):
+
+        return np.sign(values) * np.log1p(np.abs(values))
+
+
+TRANSFORMS = {'rolling_mean': RollingMean,
+              'rolling_median': RollingMedian,
+              'gaussian': Gaussian,
+              'log1p': Log1p}
+
+
+def parse_transforms(transforms_config):
+
+    """Create transform objects from their configuration.
+
+    :param list transforms_config: List of transform names (for transforms
+        without options), single-item dictionaries mapping a transform
+        name to its option, or :class:`Transform` objects.
+    :returns: List of :class:`Transform` objects.
+    :raises ValueError: If a transform is not known.
+    """
+
+    transforms = []
+
+    for transform in transforms_config or []:
+
+        if isinstance(transform, Transform):
+            transforms.append(transform)
+            continue
+
+        if isinstance(transform, dict):
+            (name, option), = transform.items()
+            options = (option,)
+        else:
+            name, options = transform, ()
+
+        if name not in TRANSFORMS:
+            raise ValueError('Unknown signal transform "{0}", expected one '
+                             'of {1}'.format(name,
+                                             ', '.join(sorted(TRANSFORMS))))
+
+        transforms.append(TRANSFORMS[name](*options))
+
+    return transforms
+
+
+def transformed_signal(fetch, region, bins, transforms):
+
+    """Fetch the binned signal over region and apply a list of transforms
+    to it.
+
+    The region is widened by the total flank of the transforms on each
+    side, keeping the same bin width, so that the bins at the ends of the
+    region are transformed using the real signal beyond them. Where there
+    is no signal to fetch (before the start of the chromosome), the
+    flank is filled with the value of the outermost bin.
+
+    :param fetch: Function taking a region and a number of bins, and
+        returning the bin positions and a list of signal arrays (e.g. the
+        lower and upper edge of the plotted signal).
+    :param region: Genomic region to get the signal for.
+    :type region: :class:`pybedtools.Interval`
+    :param int bins: Number of bins to divide the region into.
+    :param list transforms: :class:`Transform` objects to apply, in order.
+    :returns: Array of bin start positions, and list of transformed signal
+        arrays.
+    """
+
+    import pybedtools
+
+    flank = sum(transform.flank for transform in transforms)
+
+    step = float(region.stop - region.start) / bins
+
+    left = min(flank, int(region.start // step))
+
+    wide_region = pybedtools.Interval(
+        region.chrom, int(round(region.start - left * step)),
+        int(round(region.stop + flank * step)))
+
+    wide_x, signals = fetch(wide_region, bins + left + flank)
+
+    # Index of the first bin of region, which may be a little off the
+    # expected one if the cache stitched the signal together
+    first = np.searchsorted(wide_x, region.start - step / 2.)
+
+    transformed = []
+
+    for signal in signals:
+
+        signal = np.asarray(signal, dtype=np.float64)
+
+        signal = np.pad(signal, (max(0, flank - first),
+                                 max(0, first + bins + flank - len(signal))),
+                        'edge')[max(0, first - flank):][:bins + 2 * flank]
+
+        for transform in transforms:
+            signal = transform(signal)
+
+        transformed.append(signal)
+
+    return region.start + np.arange(bins) * step, transformed
@@ -2,6 +2,13 @@
 by other components but don't have their own place.
 """
 
+import heapq
+import re
+import numpy as np
+
+
+_DISTANCE_UNITS = {'': 1, 'bp': 1, 'kb': 1000, 'mb': 1000000}
+
 
 def format_genomic_distance(distance, precision=1):
     """Turn an integer genomic distance into a pretty string.
@@ -21,3 +28,232 @@ def format_genomic_distance(distance, precision=1):
     else:
         fmt_string = formatting_string + 'Mb'
         return fmt_string.format(float(distance) / 1000000)
+
+
+def parse_genomic_distance(distance_string):
+    """Turn a genomic distance string such as ``50kb``, ``1.5Mb`` or
+    ``200`` into an integer number of basepairs. This is the inverse of
+    :func:`format_genomic_distance`.
+
+    :param str distance_string: Distance to parse.
+    :raises ValueError: If the string is not a valid distance.
+    """
+
+    match = re.match(r'^\s*([\d.,]+)\s*([a-zA-Z]*)\s*$', distance_string)
+
+    try:
+        number, unit = match.groups()
+        return int(round(float(number.replace(',', '')) *
+                         _DISTANCE_UNITS[unit.lower()]))
+    except (AttributeError, KeyError, ValueError):
+        raise ValueError(
+            'Could not parse genomic distance "{0}"'.format(distance_string))
+
+
+def parse_region(region_string):
+    """Turn a region string of the form chrom:start-stop into a genomic
+    interval. Commas in the co-ordinates are ignored, so
+    ``chr7:1,000,000-2,000,000`` is also accepted.
+
+    :param str region_string: Region to parse.
+    :returns: :class:`pybedtools.Interval` spanning the region.
+    :raises ValueError: If the string is not a valid region.
+    """
+
+    import pybedtools
+
+    try:
+        chrom, coords = region_string.rsplit(':', 1)
+        start, stop = [int(c.replace(',', '')) for c in coords.split('-')]
+    except ValueError:
+        raise ValueError(
+            'Could not parse region "{0}", expected '
+            'chrom:start-stop'.format(region_string))
+
+    if not 0 <= start < stop:
+        raise ValueError(
+            'Region start {0} must be smaller than region end {1}'.format(
+                start, stop))
+
+    return pybedtools.Interval(chrom, start, stop)
+
+
+# Horizontal advance of each glyph, keyed by (font file, size, dpi)
+_GLYPH_ADVANCES = {}
+
+
+def font_from_text_kwargs(text_kwargs):
+    """Return the font that :func:`matplotlib.pyplot.text` would use when
+    called with text_kwargs.
+
+    :param dict text_kwargs: Keyword arguments that will be passed to
+        :func:`matplotlib.pyplot.text`.
+    :returns: :class:`matplotlib.font_manager.FontProperties`
+    """
+
+    from matplotlib.font_manager import FontProperties
+
+    font = text_kwargs.get('fontproperties')
+
+    if isinstance(font, FontProperties):
+        return font
+    elif isinstance(font, dict):
+        return FontProperties(**font)
+
+    def option(*names):
+        for name in names:
+            if name in text_kwargs:
+                return text_kwargs[name]
+        return None
+
+    return FontProperties(family=option('family', 'fontfamily'),
+                          style=option('style', 'fontstyle'),
+                          weight=option('weight', 'fontweight'),
+                          size=option('size', 'fontsize'))
+
+
+def text_width(text, font=None, dpi=72.):
+    """Return the width of a single line of text, without drawing it.
+
+    The width is calculated by summing the advance of each glyph, which
+    is looked up once per font, size and resolution and then cached. This
+    ignores kerning, so can be very slightly larger than the rendered
+    width.
+
+    :param str text: Text to measure.
+    :param font: Font the text will be drawn in. Defaults to matplotlib's
+        default font.
+    :type font: :class:`matplotlib.font_manager.FontProperties`
+    :param float dpi: Resolution to measure at. At the default of 72, the
+        width is given in points.
+    :returns: Width of the text in pixels at the given resolution.
+    """
+
+    from matplotlib.font_manager import FontProperties, findfont, get_font
+
+    if font is None:
+        font = FontProperties()
+
+    font_path = findfont(font)
+    size = font.get_size_in_points()
+
+    advances = _GLYPH_ADVANCES.setdefault((font_path, size, dpi), {})
+
+    missing = set(text).difference(advances)
+
+    if missing:
+        ft_font = get_font(font_path)
+        ft_font.set_size(size, dpi)
+
+        for char in missing:
+            # linearHoriAdvance is in 16.16 fixed point pixels
+            advances[char] = (ft_font.load_char(ord(char)).linearHoriAdvance /
+                              65536.)
+
+    return sum(advances[char] for char in text)
+
+
+def pack_rows(starts, stops):
+    """Assign features to rows so that no two features in the same row
+    overlap, using as few rows as possible.
+
+    Features are taken in order of their start position, and each one is
+    placed in the row which became free earliest, provided that row's last
+    feature stops before the new feature starts. Otherwise a new row is
+    opened. The stop positions of the last feature in each row are kept
+    in a heap, so packing n features takes O(n log n) time.
+
+    :param starts: Start position of each feature.
+    :type starts: list or :class:`numpy.ndarray`
+    :param stops: Stop position of each feature (including any space needed
+        for a label).
+    :type stops: list or :class:`numpy.ndarray`
+    :returns: Array giving the 0-based row of each feature, and the total
+        number of rows used.
+    """
+
+    starts, stops = np.asarray(starts), np.asarray(stops)
+
+    rows = np.zeros(len(starts), dtype=int)
+    row_ends = []
+
+    for i in np.argsort(starts, kind='mergesort').tolist():
+
+        start, stop = starts[i], stops[i]
+
+        if row_ends and row_ends[0][0] < start:
+            row = row_ends[0][1]
+            heapq.heapreplace(row_ends, (stop, row))
+        else:
+            row = len(row_ends)
+            heapq.heappush(row_ends, (stop, row))
+
+        rows[i] = row
+
+    return rows, len(row_ends)
+
+
+def merge_intervals(starts, stops, gap=0):
+    """Merge overlapping intervals, and intervals separated by no more
+    than gap.
+
+    Used to merge features that would be drawn within the same pixel, so
+    that the number of shapes drawn depends on the width of the plot
+    rather than on the number of features.
+
+    :param starts: Start position of each interval.
+    :type starts: list or :class:`numpy.ndarray`
+    :param stops: Stop position of each interval.
+    :type stops: list or :class:`numpy.ndarray`
+    :param float gap: Largest distance between two intervals that are
+        merged together.
+    :returns: Arrays of the starts and stops of the merged intervals, in
+        order of start position.
+    """
+
+    starts, stops = np.asarray(starts), np.asarray(stops)
+
+    if not len(starts):
+        return starts, stops
+
+    order = np.argsort(starts, kind='mergesort')
+    starts, stops = starts[order], np.maximum.accumulate(stops[order])
+
+    new_block = np.concatenate([[True], starts[1:] > stops[:-1] + gap])
+    block_starts = np.nonzero(new_block)[0]
+
+    return starts[block_starts], np.maximum.reduceat(stops, block_starts)
+
+
+def interval_coverage(starts, stops, start, stop, bins):
+    """Count the intervals overlapping each of a number of equal-width bins.
+
+    Rather than testing every interval against every bin, each interval
+    adds one to the bin it starts in and subtracts one from the bin after
+    the one it stops in, and the counts are then given by the cumulative
+    sum, so the cost is linear in the number of intervals plus the number
+    of bins.
+
+    :param starts: Start position of each interval.
+    :type starts: list or :class:`numpy.ndarray`
+    :param stops: Stop position of each interval (exclusive).
+    :type stops: list or :class:`numpy.ndarray`
+    :param int start: Start of the first bin.
+    :param int stop: End of the last bin.
+    :param int bins: Number of bins.
+    :returns: Array of the bins + 1 bin edges, and array of the number of
+        intervals overlapping each bin.
+    """
+
+    starts, stops = np.asarray(starts), np.asarray(stops)
+
+    edges = np.linspace(start, stop, bins + 1)
+
+    first = np.searchsorted(edges[1:], starts, 'right')
+    last = np.searchsorted(edges[:-1], stops, 'left')
+
+    changes = np.zeros(bins + 1, dtype=np.int64)
+    np.add.at(changes, first.clip(0, bins), 1)
+    np.add.at(changes, last.clip(first, bins), -1)
+
+    return edges, np.cumsum(changes[:-1])
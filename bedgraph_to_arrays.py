@@ -0,0 +1,25 @@
+import argparse
+import logging
+from EIYBrowse.importers.BedGraph import bedgraph_to_arrays
+
+parser = argparse.ArgumentParser(description='Convert a bedGraph file into a folder of memory-mapped arrays with zoom levels')
+parser.add_argument('-b','--bedgraph-path', metavar='BEDGRAPH_PATH', required=True, help='Input bedGraph file')
+parser.add_argument('-o','--folder-path', metavar='FOLDER_PATH', required=True, help='Folder to write the arrays to')
+parser.add_argument('--debug',
+    help='Print lots of debugging statements',
+    action="store_const",dest="loglevel",const=logging.DEBUG,
+    default=logging.WARNING
+)
+parser.add_argument('--verbose',
+    help='Be verbose',
+    action="store_const",dest="loglevel",const=logging.INFO
+)
+
+
+if __name__ == '__main__':
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.loglevel)
+
+    bedgraph_to_arrays(args.bedgraph_path, args.folder_path)
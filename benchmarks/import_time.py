@@ -0,0 +1,119 @@
+"""Import time check for EIYBrowse modules.
+
+Imports each module in a fresh interpreter with ``python -X importtime``,
+and fails if the import takes longer than the budget, or if it pulls in
+any of the heavy dependencies that should only be loaded when they are
+first used (matplotlib, pandas, pybedtools, PIL, gffutils, yaml). Only the
+standard library is used, e.g.::
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py -m EIYBrowse.server --budget 250
+
+The exit status is 1 if any module fails, so this can be run as part of a
+test job to catch import time regressions.
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+
+# Modules used for data access, configuration and command line --help,
+# which should not need any plotting or parsing libraries
+DEFAULT_MODULES = ['EIYBrowse.configuration',
+                   'EIYBrowse.core',
+                   'EIYBrowse.datacache',
+                   'EIYBrowse.server',
+                   'EIYBrowse.pyramid',
+                   'EIYBrowse.batch',
+                   'EIYBrowse.filetypes.bedgraph',
+                   'EIYBrowse.filetypes.bigwig',
+                   'EIYBrowse.filetypes.bed_index',
+                   'EIYBrowse.importers.BedGraph']
+
+HEAVY_MODULES = ['matplotlib', 'pandas', 'pybedtools', 'PIL', 'gffutils',
+                 'yaml', 'metaseq', 'pkg_resources']
+
+IMPORTTIME_LINE = re.compile(
+    r'^import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \| '
+    r'(?P<indent>\s*)(?P<module>\S+)$')
+
+parser = argparse.ArgumentParser(
+    description='Check the import time of EIYBrowse modules')
+parser.add_argument('-m', '--module', action='append', dest='modules',
+                    help='Module to check (can be given more than once). '
+                         'Defaults to the data and command line modules.')
+parser.add_argument('-b', '--budget', type=float, default=400,
+                    help='Maximum import time of each module, in '
+                         'milliseconds')
+parser.add_argument('-r', '--repeat', type=int, default=3,
+                    help='Number of times to import each module. The '
+                         'fastest import is compared with the budget.')
+parser.add_argument('--allow-heavy', action='store_true',
+                    help='Do not fail modules that import heavy '
+                         'dependencies')
+
+
+def import_time(module):
+
+    """Import module in a new interpreter, and return its cumulative import
+    time in milliseconds and the names of all the modules it imported."""
+
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c',
+         'import {0}'.format(module)],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, check=True)
+
+    total, imported = None, set()
+
+    for line in result.stderr.splitlines():
+
+        match = IMPORTTIME_LINE.match(line)
+
+        if match is None:
+            continue
+
+        imported.add(match.group('module'))
+
+        if match.group('module') == module and not match.group('indent'):
+            total = int(match.group('cumulative')) / 1000.
+
+    return total, imported
+
+
+def check_module(args, module):
+
+    """Print the import time of module, and return whether it passed."""
+
+    timings = [import_time(module) for _ in range(args.repeat)]
+
+    fastest = min(total for total, _ in timings)
+    imported = timings[0][1]
+
+    heavy = sorted(name for name in imported if name in HEAVY_MODULES)
+
+    passed = fastest <= args.budget and (args.allow_heavy or not heavy)
+
+    print('{0:<8} {1:<36} {2:>8.1f} ms  {3}'.format(
+        'ok' if passed else 'FAIL', module, fastest,
+        'heavy imports: ' + ', '.join(heavy) if heavy else '').rstrip())
+
+    return passed
+
+
+def main():
+
+    args = parser.parse_args()
+
+    results = [check_module(args, module)
+               for module in args.modules or DEFAULT_MODULES]
+
+    print('{0} of {1} modules within {2:g} ms'.format(
+        sum(results), len(results), args.budget))
+
+    return 0 if all(results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
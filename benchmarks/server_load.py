@@ -0,0 +1,86 @@
+"""Load test for the EIYBrowse HTTP server (see EIYBrowse.server).
+
+Simulates a number of clients panning along a chromosome and reports the
+request throughput and latency percentiles. Only the standard library is
+used, so this can be run against a server on localhost without network
+access, e.g.::
+
+    eiybrowse-server browser_config.yaml --port 8000 &
+    python benchmarks/server_load.py -r chr7:30000000-31000000 -c 8 -n 50
+"""
+
+import argparse
+import threading
+import time
+from urllib.request import urlopen
+
+from EIYBrowse.utils import parse_region
+
+parser = argparse.ArgumentParser(description='Load test an EIYBrowse server')
+parser.add_argument('-u', '--url', default='http://127.0.0.1:8000',
+                    help='Base URL of the server')
+parser.add_argument('-r', '--region', required=True,
+                    help='Starting region, as chrom:start-stop')
+parser.add_argument('-c', '--clients', type=int, default=4,
+                    help='Number of concurrent clients')
+parser.add_argument('-n', '--requests', type=int, default=20,
+                    help='Number of requests made by each client')
+parser.add_argument('-p', '--pan', type=float, default=0.1,
+                    help='Fraction of the window to pan by between requests')
+parser.add_argument('-f', '--format', default='png', choices=['png', 'svg'],
+                    help='Image format to request')
+parser.add_argument('--repeat', action='store_true',
+                    help='Have every client request the same regions, to '
+                         'measure cache hits rather than renders')
+
+
+def run_client(args, client_index, latencies):
+
+    region = parse_region(args.region)
+    width = region.stop - region.start
+    step = max(1, int(width * args.pan))
+
+    offset = 0 if args.repeat else client_index * args.requests * step
+
+    for i in range(args.requests):
+
+        start = region.start + offset + i * step
+        url = '{0}/region/{1}:{2}-{3}.{4}'.format(
+            args.url, region.chrom, start, start + width, args.format)
+
+        request_start = time.time()
+        urlopen(url).read()
+        latencies.append(time.time() - request_start)
+
+
+def percentile(values, fraction):
+
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+if __name__ == '__main__':
+
+    args = parser.parse_args()
+
+    latencies = []
+
+    clients = [threading.Thread(target=run_client,
+                                args=(args, i, latencies))
+               for i in range(args.clients)]
+
+    start = time.time()
+
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+
+    elapsed = time.time() - start
+
+    print('{0} requests in {1:.2f}s ({2:.1f} requests/s)'.format(
+        len(latencies), elapsed, len(latencies) / elapsed))
+
+    for fraction in (0.5, 0.9, 0.99):
+        print('p{0:.0f} latency: {1:.1f}ms'.format(
+            fraction * 100, percentile(latencies, fraction) * 1000))
@@ -0,0 +1,30 @@
+import argparse
+import logging
+from EIYBrowse.importers.GeneIndex import gene_index_from_gffutils, gene_index_from_gff
+
+parser = argparse.ArgumentParser(description='Build a compact gene index from a gffutils database or a GTF/GFF3 file')
+group = parser.add_mutually_exclusive_group(required=True)
+group.add_argument('-d','--database-path', metavar='DATABASE_PATH', help='Input gffutils database')
+group.add_argument('-g','--gff-path', metavar='GFF_PATH', help='Input GTF or GFF3 file')
+parser.add_argument('-o','--index-path', metavar='INDEX_PATH', required=True, help='Gene index (.npz) path to write to')
+parser.add_argument('--debug',
+    help='Print lots of debugging statements',
+    action="store_const",dest="loglevel",const=logging.DEBUG,
+    default=logging.WARNING
+)
+parser.add_argument('--verbose',
+    help='Be verbose',
+    action="store_const",dest="loglevel",const=logging.INFO
+)
+
+
+if __name__ == '__main__':
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.loglevel)
+
+    if args.database_path:
+        gene_index_from_gffutils(args.database_path, args.index_path)
+    else:
+        gene_index_from_gff(args.gff_path, args.index_path)
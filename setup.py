@@ -21,6 +21,8 @@ setup(
     entry_points = {'EIYBrowse.tracks': [
                         'genes = EIYBrowse.tracks.genes:GeneTrack',
                         'signal = EIYBrowse.tracks.genomic_signal:GenomicSignalTrack',
+                        'signal_matrix = EIYBrowse.tracks.signal_matrix:SignalMatrixTrack',
+                        'metaplot = EIYBrowse.tracks.metaplot:MetaplotTrack',
                         'intervals = EIYBrowse.tracks.interval:GenomicIntervalTrack',
                         'square_interactions = EIYBrowse.tracks.interactions:SquareInteractionsTrack',
                         'triangular_interactions = EIYBrowse.tracks.interactions:TriangularInteractionsTrack',
@@ -32,6 +34,17 @@ setup(
                         'gffutils_db = EIYBrowse.filetypes.gffutils_db:GffutilsDb',
                         'my5c_folder = EIYBrowse.filetypes.my5c_folder:My5CFolder',
                         'npz_folder = EIYBrowse.filetypes.npz_folder:NpzFolder',
+                        'gene_index = EIYBrowse.filetypes.gene_index:GeneIndexFile',
+                        'tabix_gff = EIYBrowse.filetypes.tabix_gff:TabixGffFile',
+                        'bed_index = EIYBrowse.filetypes.bed_index:BedIndexFile',
+                        'bigwig = EIYBrowse.filetypes.bigwig:BigWigFile',
+                        'bedgraph_arrays = EIYBrowse.filetypes.bedgraph:BedGraphArrays',
+                        'bam_coverage = EIYBrowse.filetypes.bam_coverage:BamCoverageFile',
+                    ],
+                    'console_scripts': [
+                        'eiybrowse-server = EIYBrowse.server:main',
+                        'eiybrowse-pyramid = EIYBrowse.pyramid:main',
+                        'eiybrowse-render = EIYBrowse.batch:main',
                     ]
                    },
     install_requires = ["matplotlib", "pybedtools","numpy"],
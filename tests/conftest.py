@@ -0,0 +1,43 @@
+import gffutils
+import pytest
+
+
+# Genes covering the cases gene filetypes need to handle: several mRNAs,
+# transcripts that are not mRNAs, a gene with both, a gene without any
+# transcripts, and genes on a second chromosome
+GFF = """\
+chr1\ttest\tgene\t100\t900\t.\t+\t.\tID=g1;Name=Alpha
+chr1\ttest\tmRNA\t100\t500\t.\t+\t.\tID=t1a;Parent=g1
+chr1\ttest\tmRNA\t100\t900\t.\t+\t.\tID=t1b;Parent=g1
+chr1\ttest\texon\t100\t200\t.\t+\t.\tID=e1;Parent=t1a,t1b
+chr1\ttest\texon\t400\t500\t.\t+\t.\tID=e2;Parent=t1a
+chr1\ttest\texon\t800\t900\t.\t+\t.\tID=e3;Parent=t1b
+chr1\ttest\tgene\t1000\t2000\t.\t-\t.\tID=g2;Name=Beta
+chr1\ttest\ttranscript\t1000\t1500\t.\t-\t.\tID=t2a;Parent=g2
+chr1\ttest\ttranscript\t1500\t2000\t.\t-\t.\tID=t2b;Parent=g2
+chr1\ttest\texon\t1000\t1100\t.\t-\t.\tID=e4;Parent=t2a
+chr1\ttest\texon\t1900\t2000\t.\t-\t.\tID=e5;Parent=t2b
+chr1\ttest\tgene\t3000\t4000\t.\t+\t.\tID=g3;Name=Gamma
+chr1\ttest\tmRNA\t3000\t3500\t.\t+\t.\tID=t3a;Parent=g3
+chr1\ttest\ttranscript\t3000\t4000\t.\t+\t.\tID=t3b;Parent=g3
+chr1\ttest\texon\t3000\t3500\t.\t+\t.\tID=e6;Parent=t3a
+chr1\ttest\texon\t3000\t4000\t.\t+\t.\tID=e7;Parent=t3b
+chr1\ttest\tgene\t5000\t6000\t.\t+\t.\tID=g4;Name=Delta
+chr2\ttest\tgene\t100\t900\t.\t+\t.\tID=g5;Name=Epsilon
+chr2\ttest\tmRNA\t100\t900\t.\t+\t.\tID=t5;Parent=g5
+chr2\ttest\texon\t100\t900\t.\t+\t.\tID=e8;Parent=t5
+"""
+
+
+@pytest.fixture(scope='session')
+def gff_path(tmpdir_factory):
+    path = tmpdir_factory.mktemp('gff').join('genes.gff3')
+    path.write(GFF)
+    return str(path)
+
+
+@pytest.fixture(scope='session')
+def gffutils_db_path(tmpdir_factory):
+    path = str(tmpdir_factory.mktemp('gffutils').join('genes.db'))
+    gffutils.create_db(GFF, path, from_string=True)
+    return path
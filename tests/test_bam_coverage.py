@@ -0,0 +1,155 @@
+import multiprocessing
+import os
+import threading
+import time
+
+import numpy as np
+import pysam
+import pytest
+from pybedtools import Interval
+
+from EIYBrowse.filetypes import bam_coverage
+from EIYBrowse.filetypes.bam_coverage import (BamCoverageFile, add_blocks,
+                                              build_coverage_cache,
+                                              chrom_coverage)
+
+
+CHROM_SIZES = [('chr1', 5000), ('chr2', 1000)]
+
+FLAGS = bam_coverage.DEFAULT_EXCLUDE_FLAGS
+
+
+def reads(seed=0, count=400):
+
+    """Random (chrom, start, cigar, flag, mapq) reads, some of them spliced,
+    duplicates or of low mapping quality."""
+
+    rng = np.random.RandomState(seed)
+    for _ in range(count):
+        chrom, length = CHROM_SIZES[rng.randint(len(CHROM_SIZES))]
+        start = int(rng.randint(0, length - 200))
+        cigar = [(0, 50)] if rng.rand() < 0.7 else [(0, 20), (3, 100),
+                                                    (0, 30)]
+        flag = 0x400 if rng.rand() < 0.1 else 0
+        yield chrom, start, cigar, flag, int(rng.randint(0, 60))
+
+
+def depth(chrom, length, min_mapq=0):
+
+    """Read depth at every base of chrom, counted base by base."""
+
+    bases = np.zeros(length)
+    for read_chrom, start, cigar, flag, mapq in reads():
+        if read_chrom != chrom or flag & FLAGS or mapq < min_mapq:
+            continue
+        position = start
+        for operation, bases_in_operation in cigar:
+            if operation == 0:
+                bases[position:position + bases_in_operation] += 1
+            position += bases_in_operation
+    return bases
+
+
+@pytest.fixture
+def bam_path(tmpdir):
+    unsorted_path = str(tmpdir.join('unsorted.bam'))
+    path = str(tmpdir.join('reads.bam'))
+    header = {'HD': {'VN': '1.0'},
+              'SQ': [{'SN': chrom, 'LN': length}
+                     for chrom, length in CHROM_SIZES]}
+    with pysam.AlignmentFile(unsorted_path, 'wb', header=header) as bam:
+        for i, (chrom, start, cigar, flag, mapq) in enumerate(reads()):
+            read = pysam.AlignedSegment(bam.header)
+            read.query_name = 'read{0}'.format(i)
+            read.reference_name, read.reference_start = chrom, start
+            read.cigartuples, read.flag = cigar, flag
+            read.mapping_quality = mapq
+            read.query_sequence = 'A' * sum(n for op, n in cigar if op == 0)
+            bam.write(read)
+    pysam.sort('-o', path, unsorted_path)
+    pysam.index(path)
+    return path
+
+
+def test_add_blocks_counts_bases_in_each_bin():
+    bases = np.zeros(10, dtype=np.int64)
+    add_blocks(bases, [5, 12, 0], [8, 47, 100], 10)
+    expected = np.zeros(100)
+    for start, stop in [(5, 8), (12, 47), (0, 100)]:
+        expected[start:stop] += 1
+    assert bases.tolist() == expected.reshape(10, 10).sum(axis=1).tolist()
+
+
+@pytest.mark.parametrize('min_mapq', [0, 30])
+def test_chrom_coverage_is_mean_depth_per_bin(bam_path, min_mapq):
+    coverage = chrom_coverage(bam_path, 'chr1', 5000, 10, min_mapq, FLAGS)
+
+    per_bin = np.repeat(coverage.means, coverage.stops - coverage.starts)
+    assert coverage.stops[-1] == 5000
+    assert np.allclose(per_bin[::10], depth('chr1', 5000, min_mapq).reshape(
+        -1, 10).mean(axis=1))
+
+
+def test_cache_is_built_once_and_reused(bam_path):
+    datafile = BamCoverageFile(bam_path, processes=1)
+    _, sig_y = datafile.local_coverage(Interval('chr2', 0, 1000), 10)
+    assert np.allclose(sig_y, depth('chr2', 1000).reshape(10, -1).mean(
+        axis=1))
+
+    source = os.path.join(datafile.path, bam_coverage.SOURCE_FILE)
+    built = os.path.getmtime(source)
+    BamCoverageFile(bam_path, processes=1)
+    assert os.path.getmtime(source) == built
+    assert sorted(os.listdir(bam_path + '.coverage')) == [
+        'bin10.q0.F1796', 'bin10.q0.F1796.lock']
+
+
+def _build_in_worker(bam_path, folder_path):
+    os.makedirs(folder_path)
+    build_coverage_cache(bam_path, folder_path, 10, 0, FLAGS)
+    return sorted(os.listdir(folder_path))
+
+
+def test_cache_is_built_in_daemonic_process(bam_path, tmpdir):
+    pool = multiprocessing.Pool(1)
+    try:
+        files = pool.apply(_build_in_worker,
+                           (bam_path, str(tmpdir.join('cache'))))
+    finally:
+        pool.terminate()
+    assert 'chr1.npy' in files and bam_coverage.SOURCE_FILE in files
+
+
+def test_cache_built_while_waiting_for_lock_is_not_rebuilt(bam_path,
+                                                           monkeypatch):
+    folder_path = os.path.join(bam_path + '.coverage', 'bin10.q0.F1796')
+    os.makedirs(folder_path)
+
+    builds = []
+    build = bam_coverage.build_coverage_cache
+
+    def recording_build(*args):
+        builds.append(args)
+        build(*args)
+
+    monkeypatch.setattr(bam_coverage, 'build_coverage_cache',
+                        recording_build)
+
+    opened = []
+
+    with open(folder_path + '.lock', 'a') as lock_file, \
+            bam_coverage.file_lock(lock_file):
+        thread = threading.Thread(target=lambda: opened.append(
+            BamCoverageFile(bam_path, processes=1)))
+        thread.start()
+        time.sleep(0.1)
+
+        # Another process builds the cache while this one holds the lock
+        build(bam_path, folder_path, 10, 0, FLAGS, 1)
+
+    thread.join()
+
+    assert not builds
+    assert opened[0].path == folder_path
+    assert sorted(os.listdir(bam_path + '.coverage')) == [
+        'bin10.q0.F1796', 'bin10.q0.F1796.lock']
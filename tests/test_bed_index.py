@@ -0,0 +1,83 @@
+import gzip
+import os
+
+import numpy as np
+import pytest
+from pybedtools import Interval
+
+from EIYBrowse.filetypes.bed_index import BED_INDEX_SUFFIX, BedIndexFile
+
+
+BED = """\
+track name=test
+#chrom\tstart\tstop\tname
+chr1\t500\t600\tc
+chr1\t100\t200\ta
+chr1\t150\t5000\tlong
+chr1\t300\t400\tb
+chr2\t0\t100\tα
+"""
+
+
+def overlapping(bed_text, region):
+
+    """Names of the intervals in bed_text overlapping region, found by
+    checking every line in turn."""
+
+    names = []
+    for line in bed_text.splitlines():
+        fields = line.split('\t')
+        if len(fields) < 3 or not fields[1].isdigit():
+            continue
+        if fields[0] == region.chrom and int(fields[1]) < region.stop \
+                and int(fields[2]) > region.start:
+            names.append((int(fields[1]), fields[3]))
+    return [name for _, name in sorted(names)]
+
+
+@pytest.fixture
+def bed_path(tmpdir):
+    path = tmpdir.join('intervals.bed')
+    path.write_text(BED, encoding='utf-8')
+    return str(path)
+
+
+@pytest.mark.parametrize('region', [Interval('chr1', 0, 10000),
+                                    Interval('chr1', 200, 300),
+                                    Interval('chr1', 4000, 4500),
+                                    Interval('chr1', 5000, 6000),
+                                    Interval('chr2', 50, 60),
+                                    Interval('chrX', 0, 100)])
+def test_intervals_match_a_scan_of_the_file(bed_path, region):
+    intervals = BedIndexFile(bed_path).intervals(region)
+    assert intervals.names == overlapping(BED, region)
+    assert (np.diff(intervals.starts) >= 0).all()
+    assert (intervals.stops > region.start).all()
+    assert (intervals.starts < region.stop).all()
+
+
+def test_index_is_saved_and_reused(bed_path):
+    first = BedIndexFile(bed_path)
+    assert os.path.exists(bed_path + BED_INDEX_SUFFIX)
+    second = BedIndexFile(bed_path)
+    assert len(first) == len(second) == 5
+    assert second.intervals(Interval('chr1', 0, 250)).names == ['a', 'long']
+
+
+def test_gzipped_bed_file(tmpdir):
+    path = str(tmpdir.join('intervals.bed.gz'))
+    with gzip.open(path, 'wt') as bed_file:
+        bed_file.write('chr1\t10\t20\n')
+    intervals = BedIndexFile(path).intervals(Interval('chr1', 0, 100))
+    assert intervals.starts.tolist() == [10]
+    assert intervals.names == ['.']
+
+
+@pytest.mark.parametrize('bed_text', ['', 'track name=empty\n#comment\n'])
+def test_bed_file_without_intervals_gives_empty_index(tmpdir, bed_text):
+    path = tmpdir.join('empty.bed')
+    path.write(bed_text)
+    for _ in range(2):
+        index = BedIndexFile(str(path))
+        assert len(index) == 0
+        assert len(index.intervals(Interval('chr1', 0, 100))) == 0
@@ -0,0 +1,173 @@
+import numpy as np
+import pyBigWig
+import pytest
+from pybedtools import Interval
+
+from EIYBrowse.filetypes.bedgraph import BedGraphArrays
+from EIYBrowse.filetypes.bigwig import BigWigFile
+from EIYBrowse.filetypes.binning import (MIN_ZOOM_BINS, SignalArrays,
+                                         bin_signal, choose_zoom,
+                                         summarise_signal, zoom_level)
+from EIYBrowse.importers.BedGraph import bedgraph_to_arrays
+
+
+CHROM_SIZE = 10000
+
+
+def random_runs(seed=0, count=300):
+
+    """Sorted, non-overlapping runs with gaps between some of them."""
+
+    rng = np.random.RandomState(seed)
+    edges = np.sort(rng.choice(np.arange(1, CHROM_SIZE), 2 * count,
+                               replace=False))
+    starts, stops = edges[::2], edges[1::2]
+    return SignalArrays(starts, stops, rng.uniform(-5, 5, count).round(2))
+
+
+def per_base(runs, start, stop, bins):
+
+    """Summarise runs base by base, ignoring positions without signal."""
+
+    values = np.full(CHROM_SIZE, np.nan)
+    for run_start, run_stop, value in zip(runs.starts, runs.stops,
+                                          runs.means):
+        values[run_start:run_stop] = value
+
+    summaries = {'mean': [], 'max': [], 'min': []}
+    for piece in np.split(values[start:stop], bins):
+        covered = piece[~np.isnan(piece)]
+        summaries['mean'].append(covered.mean() if len(covered) else 0)
+        summaries['max'].append(covered.max() if len(covered) else 0)
+        summaries['min'].append(covered.min() if len(covered) else 0)
+    return {name: np.array(values) for name, values in summaries.items()}
+
+
+@pytest.mark.parametrize('start, stop, bins', [(0, CHROM_SIZE, 100),
+                                               (1234, 5234, 40),
+                                               (500, 600, 100),
+                                               (9000, 9100, 1)])
+def test_summarise_signal_matches_per_base_summaries(start, stop, bins):
+    runs = random_runs()
+    binned = summarise_signal(runs, start, stop, bins)
+    expected = per_base(runs, start, stop, bins)
+
+    assert np.allclose(binned['x'], start + np.arange(bins) *
+                       (stop - start) / bins)
+    for summary in ('mean', 'max', 'min'):
+        assert np.allclose(binned[summary], expected[summary])
+
+
+def test_summarise_signal_splits_runs_at_fractional_bin_edges():
+    runs = SignalArrays([0], [3], [2.])
+    binned = summarise_signal(runs, 0, 4, 3)
+    assert np.allclose(binned['covered'], [4. / 3, 4. / 3, 1. / 3])
+    assert np.allclose(binned['mean'], 2.)
+
+
+def test_bin_signal_rejects_unknown_summary():
+    with pytest.raises(ValueError):
+        bin_signal(random_runs(), 0, 100, 10, summary='median')
+
+
+def test_zoom_level_keeps_coverage_and_extremes():
+    runs = random_runs()
+    level = zoom_level(runs, 100)
+
+    assert (level.starts % 100 == 0).all()
+    expected = per_base(runs, 0, CHROM_SIZE, 100)
+    covered = level.starts // 100
+    assert np.allclose(level.means, expected['mean'][covered])
+    assert np.allclose(level.maxes, expected['max'][covered])
+    assert np.allclose(level.mins, expected['min'][covered])
+
+    # Means over several zoom bins are weighted by their covered positions
+    assert np.allclose(summarise_signal(level, 0, CHROM_SIZE, 10)['mean'],
+                       summarise_signal(runs, 0, CHROM_SIZE, 10)['mean'])
+
+
+def test_choose_zoom_needs_several_zoom_bins_per_bin():
+    zooms = [10, 40, 160]
+    assert choose_zoom(zooms, 0, 1000, 100) is None
+    assert choose_zoom(zooms, 0, 4000, 100) == 10
+    assert choose_zoom(zooms, 0, 1000000, 100) == 160
+
+
+@pytest.fixture
+def bedgraph_arrays(tmpdir):
+    runs = random_runs()
+    bedgraph = tmpdir.join('signal.bedGraph')
+    bedgraph.write('track type=bedGraph\n' + ''.join(
+        'chr1\t{0}\t{1}\t{2}\n'.format(start, stop, value)
+        for start, stop, value in zip(runs.starts, runs.stops, runs.means)))
+    folder = str(tmpdir.join('signal'))
+    bedgraph_to_arrays(str(bedgraph), folder)
+    return runs, BedGraphArrays(folder)
+
+
+def test_bedgraph_arrays_full_resolution(bedgraph_arrays):
+    runs, datafile = bedgraph_arrays
+    assert datafile.zooms['chr1']
+
+    sig_x, sig_y = datafile.local_coverage(Interval('chr1', 1000, 2000), 10,
+                                           summary='max')
+    assert np.allclose(sig_x, np.arange(1000, 2000, 100))
+    assert np.allclose(sig_y, per_base(runs, 1000, 2000, 10)['max'])
+
+
+def test_bedgraph_arrays_zoom_level_on_zoom_bin_edges(bedgraph_arrays):
+    runs, datafile = bedgraph_arrays
+    zoom = min(datafile.zooms['chr1'])
+
+    # Bins just wide enough to use the finest zoom level, with edges on
+    # zoom bin edges, so that the zoom level gives the exact summaries
+    step = zoom * MIN_ZOOM_BINS
+    bins = CHROM_SIZE // step
+    region = Interval('chr1', 0, bins * step)
+    assert choose_zoom(datafile.zooms['chr1'], 0, bins * step, bins) == zoom
+    _, summaries = datafile.local_summaries(region, bins)
+    expected = per_base(runs, 0, bins * step, bins)
+
+    for summary in ('mean', 'max', 'min'):
+        assert np.allclose(summaries[summary], expected[summary], atol=1e-5)
+
+
+def test_bedgraph_arrays_unknown_chromosome(bedgraph_arrays):
+    _, datafile = bedgraph_arrays
+    _, sig_y = datafile.local_coverage(Interval('chrX', 0, 1000), 10)
+    assert (sig_y == 0).all()
+
+
+@pytest.fixture
+def bigwig(tmpdir):
+    runs = random_runs()
+    path = str(tmpdir.join('signal.bw'))
+    writer = pyBigWig.open(path, 'w')
+    writer.addHeader([('chr1', CHROM_SIZE)])
+    writer.addEntries(['chr1'] * len(runs), runs.starts.tolist(),
+                      ends=runs.stops.tolist(),
+                      values=runs.means.tolist())
+    writer.close()
+    return runs, BigWigFile(path)
+
+
+@pytest.mark.parametrize('start, stop, bins', [(0, CHROM_SIZE, 100),
+                                               (2000, 2050, 50),
+                                               (2000, 2050, 100)])
+def test_bigwig_matches_per_base_summaries(bigwig, start, stop, bins):
+    runs, datafile = bigwig
+    sig_x, summaries = datafile.local_summaries(Interval('chr1', start, stop),
+                                                bins)
+    reference = summarise_signal(runs, start, stop, bins)
+    assert np.allclose(sig_x, reference['x'])
+    for summary in ('mean', 'max', 'min'):
+        assert np.allclose(summaries[summary], reference[summary], atol=1e-5)
+
+
+def test_bigwig_bins_past_chromosome_end_are_zero(bigwig):
+    runs, datafile = bigwig
+    region = Interval('chr1', CHROM_SIZE - 500, CHROM_SIZE + 500)
+    _, sig_y = datafile.local_coverage(region, 10)
+    assert (sig_y[5:] == 0).all()
+    assert np.allclose(sig_y[:5], summarise_signal(
+        runs, CHROM_SIZE - 500, CHROM_SIZE, 5)['mean'], atol=1e-5)
@@ -0,0 +1,176 @@
+import numpy as np
+from pybedtools import Interval
+
+from EIYBrowse.datacache import SignalCache, IntervalCache
+
+
+class PositionSignal(object):
+
+    """Signal equal to the position at the start of each bin, which records
+    every region it is asked for."""
+
+    def __init__(self):
+        self.requests = []
+
+    def local_coverage(self, region, bins):
+        self.requests.append((region.start, region.stop, bins))
+        step = float(region.stop - region.start) / bins
+        sig_x = region.start + np.arange(bins) * step
+        return sig_x, sig_x.copy()
+
+
+class PositionAdapter(object):
+
+    """Adapter returning one feature every 100bp, which records every region
+    it is asked for."""
+
+    def __init__(self):
+        self.requests = []
+
+    def __getitem__(self, region):
+        self.requests.append((region.start, region.stop))
+        first = region.start // 100 * 100
+        return [Interval(region.chrom, start, start + 50)
+                for start in range(first, region.stop, 100)
+                if start + 50 > region.start]
+
+
+class PositionFeatures(object):
+
+    def __init__(self):
+        self.adapter = PositionAdapter()
+
+
+def test_signal_cache_repeat_is_not_fetched():
+    datafile = PositionSignal()
+    cache = SignalCache(datafile)
+    cache.local_coverage(Interval('chr1', 0, 1000), 100)
+    cache.local_coverage(Interval('chr1', 0, 1000), 100)
+    assert datafile.requests == [(0, 1000, 100)]
+
+
+def test_signal_cache_pan_fetches_only_flank():
+    datafile = PositionSignal()
+    cache = SignalCache(datafile)
+    cache.local_coverage(Interval('chr1', 0, 1000), 100)
+    sig_x, sig_y = cache.local_coverage(Interval('chr1', 100, 1100), 100)
+    assert datafile.requests[1:] == [(1000, 1100, 10)]
+    assert np.allclose(sig_x, np.arange(100, 1100, 10))
+    assert np.allclose(sig_y, sig_x)
+
+
+def test_signal_cache_unaligned_pan_keeps_bins_on_grid():
+    datafile = PositionSignal()
+    cache = SignalCache(datafile)
+    cache.local_coverage(Interval('chr1', 0, 1000), 100)
+    sig_x, sig_y = cache.local_coverage(Interval('chr1', 25, 1025), 100)
+    assert len(sig_x) == 100
+    assert np.allclose(np.diff(sig_x), 10)
+    assert np.allclose(sig_x % 10, 0)
+    assert abs(sig_x[0] - 25) <= 5
+    assert np.allclose(sig_y, sig_x)
+
+
+def test_signal_cache_pan_left_stitches_flank():
+    datafile = PositionSignal()
+    cache = SignalCache(datafile)
+    cache.local_coverage(Interval('chr1', 1000, 2000), 100)
+    sig_x, sig_y = cache.local_coverage(Interval('chr1', 955, 1955), 100)
+    assert len(sig_x) == 100
+    assert np.allclose(sig_x, np.arange(960, 1960, 10))
+    assert np.allclose(sig_y, sig_x)
+    assert datafile.requests[1:] == [(960, 1000, 4)]
+
+
+def test_signal_cache_zoomed_region_is_refetched():
+    datafile = PositionSignal()
+    cache = SignalCache(datafile)
+    cache.local_coverage(Interval('chr1', 0, 1000), 100)
+    sig_x, _ = cache.local_coverage(Interval('chr1', 0, 2000), 100)
+    assert datafile.requests[1:] == [(0, 2000, 100)]
+    assert np.allclose(sig_x, np.arange(0, 2000, 20))
+
+
+def test_signal_cache_other_chromosome_is_refetched():
+    datafile = PositionSignal()
+    cache = SignalCache(datafile)
+    cache.local_coverage(Interval('chr1', 0, 1000), 100)
+    cache.local_coverage(Interval('chr2', 0, 1000), 100)
+    assert len(datafile.requests) == 2
+
+
+def test_signal_cache_summaries_from_oversampled_coverage():
+    datafile = PositionSignal()
+    cache = SignalCache(datafile)
+    sig_x, sig_ys = cache.local_summaries(Interval('chr1', 0, 800), 10)
+    assert np.allclose(sig_x, np.arange(0, 800, 80))
+    assert np.allclose(sig_ys['min'], sig_x)
+    assert np.allclose(sig_ys['max'], sig_x + 70)
+    assert np.allclose(sig_ys['mean'], sig_x + 35)
+
+
+def test_signal_cache_evicts_oldest_entry():
+    datafile = PositionSignal()
+    cache = SignalCache(datafile, max_entries=2)
+    for chrom in ('chr1', 'chr2', 'chr3'):
+        cache.local_coverage(Interval(chrom, 0, 1000), 100)
+    cache.local_coverage(Interval('chr1', 0, 1000), 100)
+    assert len(datafile.requests) == 4
+
+
+def test_interval_cache_pan_returns_each_feature_once():
+    datafile = PositionFeatures()
+    cache = IntervalCache(datafile)
+    cache.features(Interval('chr1', 0, 1000))
+    features = cache.features(Interval('chr1', 500, 1500))
+    starts = sorted(f.start for f in features)
+    assert starts == list(range(500, 1500, 100))
+    assert datafile.adapter.requests[1:] == [(1000, 1500)]
+
+
+def test_interval_cache_keeps_features_spanning_flank_edge():
+    datafile = PositionFeatures()
+    cache = IntervalCache(datafile)
+    cache.features(Interval('chr1', 1025, 2000))
+    features = cache.features(Interval('chr1', 900, 1500))
+    starts = sorted(f.start for f in features)
+    assert starts == list(range(900, 1500, 100))
+
+
+class SpikeSignal(object):
+
+    """Signal of zero, with a single base of 80 at position 100."""
+
+    def local_coverage(self, region, bins):
+        step = float(region.stop - region.start) / bins
+        sig_x = region.start + np.arange(bins) * step
+        return sig_x, np.where((sig_x <= 100) & (sig_x + step > 100),
+                               80. / step, 0.)
+
+
+class SummarySignal(PositionSignal):
+
+    """Signal which calculates its own summaries."""
+
+    def local_summaries(self, region, bins):
+        self.requests.append(('summaries', bins))
+        sig_x, sig_y = self.local_coverage(region, bins)
+        return sig_x, {'mean': sig_y, 'max': sig_y + 1, 'min': sig_y - 1}
+
+
+def test_signal_cache_summaries_from_datafile():
+    datafile = SummarySignal()
+    cache = SignalCache(datafile)
+    sig_x, sig_ys = cache.local_summaries(Interval('chr1', 0, 800), 10)
+    assert datafile.requests == [('summaries', 10), (0, 800, 10)]
+    assert np.allclose(sig_ys['max'], sig_x + 1)
+    assert np.allclose(sig_ys['min'], sig_x - 1)
+
+
+def test_signal_cache_oversampled_maximum_is_approximate():
+    cache = SignalCache(SpikeSignal())
+    _, sig_ys = cache.local_summaries(Interval('chr1', 0, 800), 10)
+
+    # The spike is averaged over an eighth of a bin, rather than the whole bin
+    assert np.isclose(sig_ys['mean'][1], 1)
+    assert np.isclose(sig_ys['max'][1], 8)
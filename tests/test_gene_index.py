@@ -0,0 +1,59 @@
+import pytest
+from pybedtools import Interval
+
+from EIYBrowse.filetypes.gene_index import GeneIndexFile
+from EIYBrowse.filetypes.gffutils_db import GffutilsDb
+from EIYBrowse.importers.GeneIndex import (gene_index_from_gffutils,
+                                           write_gene_index)
+
+
+def spans(genes):
+    return [(gene['gene'].chrom, gene['gene'].start, gene['gene'].stop,
+             gene['gene'].strand, gene['gene'].attributes['Name'][0],
+             [(exon.start, exon.stop) for exon in gene['exons']])
+            for gene in genes]
+
+
+@pytest.fixture
+def gene_index(gffutils_db_path, tmpdir):
+    index_path = str(tmpdir.join('genes.npz'))
+    gene_index_from_gffutils(gffutils_db_path, index_path)
+    return GeneIndexFile(index_path)
+
+
+@pytest.mark.parametrize('region', [Interval('chr1', 0, 10000),
+                                    Interval('chr1', 150, 160),
+                                    Interval('chr1', 950, 1000),
+                                    Interval('chr1', 3999, 4999),
+                                    Interval('chr2', 0, 100000),
+                                    Interval('chrX', 0, 100000)])
+def test_genes_match_gffutils_database(gffutils_db_path, gene_index, region):
+    assert spans(gene_index.get_genes(region)) == spans(
+        GffutilsDb(gffutils_db_path).get_genes(region))
+
+
+def test_gene_loci_match_gffutils_database(gffutils_db_path, gene_index):
+    assert sorted(gene_index.iter_gene_loci()) == sorted(
+        GffutilsDb(gffutils_db_path).iter_gene_loci())
+
+
+def test_long_gene_starting_far_before_region_is_found(tmpdir):
+    index_path = str(tmpdir.join('genes.npz'))
+    write_gene_index([('chr1', 10, 100000, '+', 'Long', [(10, 20)]),
+                      ('chr1', 500, 600, '-', 'Short', []),
+                      ('chr1', 700, 800, None, 'Unstranded', [])],
+                     index_path)
+    index = GeneIndexFile(index_path)
+
+    genes = spans(index.get_genes(Interval('chr1', 50000, 50010)))
+    assert genes == [('chr1', 10, 100000, '+', 'Long', [(10, 20)])]
+
+    genes = spans(index.get_genes(Interval('chr1', 550, 750)))
+    assert [gene[4] for gene in genes] == ['Long', 'Short', 'Unstranded']
+    assert genes[2][3] == '.'
+
+
+def test_gene_names_are_unicode(tmpdir):
+    index_path = str(tmpdir.join('genes.npz'))
+    write_gene_index([('chr1', 10, 20, '+', u'Gène', [])], index_path)
+    assert GeneIndexFile(index_path).name(0) == u'Gène'
@@ -0,0 +1,166 @@
+import matplotlib
+matplotlib.use('agg')
+
+import matplotlib.pyplot as plt
+from matplotlib.colors import to_rgba
+from matplotlib.collections import LineCollection, PolyCollection
+from pybedtools import Interval
+
+from EIYBrowse.core import Browser
+from EIYBrowse.filetypes.records import ExonRecord, GeneRecord
+from EIYBrowse.tracks.genes import (GeneRows, GeneTrack,
+                                    get_start_stop_on_axes)
+from EIYBrowse.utils import font_from_text_kwargs, text_width
+
+
+def gene_dict(name, start, stop):
+    return {'gene': GeneRecord('chr1', start, stop, '+', name),
+            'transcript': None,
+            'exons': []}
+
+
+def test_gene_extents_leave_room_for_labels():
+    track = GeneTrack(None, fontsize=10)
+    browser = Browser(width=10)
+    region = Interval('chr1', 0, 1000)
+    scale = browser.data_axis_width() * 72. / 1000
+
+    extents = list(track._get_gene_extents(
+        region, [gene_dict('LongGeneName', 100, 110),
+                 gene_dict('A', 500, 900)], browser))
+
+    font = font_from_text_kwargs({'fontsize': 10})
+    padding = text_width('  ', font)
+
+    (_, start, stop), (_, long_start, long_stop) = extents
+    assert start == 100 * scale
+    assert stop == 100 * scale + text_width('LongGeneName', font) + padding
+    assert long_start == 500 * scale
+    assert long_stop == 900 * scale + padding
+
+
+def test_gene_extents_without_packed_labels():
+    track = GeneTrack(None, pack_labels=False)
+    browser = Browser(width=10)
+    region = Interval('chr1', 0, 1000)
+    scale = browser.data_axis_width() * 72. / 1000
+
+    (_, start, stop), = track._get_gene_extents(
+        region, [gene_dict('LongGeneName', 100, 110)], browser)
+
+    assert start == 100 * scale
+    assert stop == 110 * scale + text_width('  ', font_from_text_kwargs({}))
+
+
+def test_gene_extents_are_clipped_to_region():
+    track = GeneTrack(None, pack_labels=False)
+    browser = Browser(width=10)
+    region = Interval('chr1', 1000, 2000)
+
+    (_, start, stop), = track._get_gene_extents(
+        region, [gene_dict('A', 0, 5000)], browser)
+
+    assert start == 0
+    assert stop > browser.data_axis_width() * 72.
+
+
+def test_gene_rows_are_ordered_and_do_not_overlap():
+    genes = [gene_dict(name, start, start + 100)
+             for name, start in [('C', 300), ('A', 0), ('B', 50),
+                                 ('D', 120)]]
+    rows = GeneRows()
+    rows.pack((gene, gene['gene'].start, gene['gene'].stop)
+              for gene in genes)
+
+    names = [[gene['gene'].name for gene in row['genes']]
+             for row in rows.rows]
+    assert names == [['A', 'D'], ['B', 'C']]
+    assert [row['stop'] for row in rows.rows] == [220, 400]
+
+
+def test_adding_genes_in_start_order_matches_pack():
+    genes = [gene_dict(name, start, start + length)
+             for name, start, length in [('A', 0, 100), ('B', 50, 300),
+                                         ('C', 120, 20), ('D', 130, 100),
+                                         ('E', 160, 50), ('F', 400, 10)]]
+    extents = [(gene, gene['gene'].start, gene['gene'].stop)
+               for gene in genes]
+
+    packed = GeneRows()
+    packed.pack(extents)
+    added = GeneRows()
+    for gene, start, stop in extents:
+        added.add_gene(gene, start, stop)
+
+    assert added.rows == packed.rows
+
+
+class GeneList(object):
+
+    def __init__(self, genes):
+        self.genes = genes
+
+    def get_genes(self, region):
+        return self.genes
+
+
+def test_exons_outside_region_are_not_drawn():
+    gene = {'gene': GeneRecord('chr1', 0, 10000, '+', 'Wide'),
+            'exons': [ExonRecord('chr1', 0, 100),
+                      ExonRecord('chr1', 4900, 5100),
+                      ExonRecord('chr1', 9900, 10000)]}
+    track = GeneTrack(GeneList([gene]))
+    browser = Browser([track], width=4)
+
+    plot = browser.plot(Interval('chr1', 4000, 6000))
+    ax = plot.frames[0]['plot_ax']
+
+    exons, = [c for c in ax.collections if isinstance(c, PolyCollection)]
+    bodies, = [c for c in ax.collections if isinstance(c, LineCollection)]
+
+    exon_spans = [(path.vertices[:, 0].min(), path.vertices[:, 0].max())
+                  for path in exons.get_paths()]
+    assert exon_spans == [(4900, 5100)]
+    assert len(bodies.get_segments()) == 1
+    plt.close('all')
+
+
+def test_start_stop_on_axes_are_clipped_to_limits():
+    fig, ax = plt.subplots()
+    ax.set_xlim(1000, 2000)
+
+    assert get_start_stop_on_axes(ax, Interval('chr1', 1250, 1500)) == \
+        (0.25, 0.5)
+    assert get_start_stop_on_axes(ax, Interval('chr1', 500, 2500)) == \
+        (0.0, 1.0)
+    plt.close('all')
+
+
+def test_genes_are_red_by_default():
+    gene = {'gene': GeneRecord('chr1', 100, 900, '+', 'Red'),
+            'exons': [ExonRecord('chr1', 100, 200)]}
+    browser = Browser([GeneTrack(GeneList([gene]))], width=4)
+
+    plot = browser.plot(Interval('chr1', 0, 1000))
+    ax = plot.frames[0]['plot_ax']
+
+    for collection in ax.collections:
+        assert tuple(collection.get_edgecolor()[0]) == to_rgba('r')
+    plt.close('all')
+
+
+def test_plot_gene_dict_draws_a_single_gene():
+    gene = {'gene': GeneRecord('chr1', 1250, 1500, '+', 'Single'),
+            'exons': [ExonRecord('chr1', 1250, 1300)]}
+    track = GeneTrack(GeneList([]), color='b')
+    fig, ax = plt.subplots()
+    ax.set_xlim(1000, 2000)
+
+    body, label = track.plot_gene_dict(ax, gene, row_index=1.0)
+
+    assert body.get_xdata() == [0.25, 0.5]
+    assert body.get_ydata() == [0.6, 0.6]
+    assert body.get_color() == 'b'
+    assert label.get_text() == 'Single'
+    assert len(ax.patches) == 1
+    plt.close('all')
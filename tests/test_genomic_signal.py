@@ -0,0 +1,114 @@
+import matplotlib
+matplotlib.use('agg')
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+from pybedtools import Interval
+
+from EIYBrowse.core import Browser
+from EIYBrowse.tracks.genomic_signal import (AUTO_BIN_STEPS,
+                                             DEFAULT_AUTO_BINS,
+                                             GenomicSignalTrack, auto_bins)
+
+
+class RecordingSignal(object):
+
+    """Signal equal to the position at the start of each bin, which records
+    the number of bins of every request."""
+
+    def __init__(self):
+        self.bins = []
+
+    def local_coverage(self, region, bins):
+        self.bins.append(bins)
+        step = float(region.stop - region.start) / bins
+        sig_x = region.start + np.arange(bins) * step
+        return sig_x, sig_x.copy()
+
+
+@pytest.mark.parametrize('pixels', [1, 3, 100, 640, 641, 1000, 1279.5,
+                                    3000])
+def test_auto_bins_round_up_to_ladder(pixels):
+    bins = auto_bins(pixels, 10 ** 9)
+    assert bins >= pixels
+    power = 2 ** int(np.floor(np.log2(bins)))
+    assert any(bins == int(np.ceil(power * step))
+               for step in AUTO_BIN_STEPS + (2,))
+    assert bins < 1.25 * pixels + 1
+
+
+def test_auto_bins_similar_widths_share_bins():
+    assert auto_bins(1100, 10 ** 6) == auto_bins(1250, 10 ** 6) == 1280
+
+
+def test_auto_bins_are_capped_at_bases():
+    assert auto_bins(1000, 300) == 300
+    assert auto_bins(0, 300) == 1
+
+
+@pytest.mark.parametrize('dpi', [50, 100, 300])
+def test_auto_bins_follow_plot_resolution(dpi):
+    datafile = RecordingSignal()
+    track = GenomicSignalTrack(datafile, bins='auto')
+    browser = Browser([track], width=8)
+
+    plot = browser.plot(Interval('chr1', 0, 100000), dpi=dpi)
+    pixels = plot.frames[0]['plot_ax'].get_window_extent().width
+
+    assert track.last_bins == auto_bins(pixels, 100000)
+    assert len(plot.frames[0]['results']['data'][0]) == track.last_bins
+    plt.close('all')
+
+
+def test_prefetch_uses_bins_of_last_plot():
+    datafile = RecordingSignal()
+    track = GenomicSignalTrack(datafile, bins='auto')
+
+    track.prefetch(Interval('chr1', 0, 100000))
+    assert datafile.bins == [DEFAULT_AUTO_BINS]
+
+    Browser([track], width=8).plot(Interval('chr2', 0, 100000), dpi=50)
+    track.prefetch(Interval('chr3', 0, 100000), windows=2)
+    assert datafile.bins[-1] == 2 * track.last_bins
+    plt.close('all')
+
+
+def test_fixed_bins_are_not_changed_by_resolution():
+    datafile = RecordingSignal()
+    track = GenomicSignalTrack(datafile, bins=123)
+    Browser([track], width=8).plot(Interval('chr1', 0, 100000), dpi=300)
+    assert datafile.bins == [123]
+    plt.close('all')
+
+
+def test_unknown_summary_is_rejected():
+    with pytest.raises(ValueError):
+        GenomicSignalTrack(RecordingSignal(), summary='median')
+
+
+@pytest.mark.parametrize('summary, lower, upper', [
+    ('mean', None, 0), ('max', None, 70), ('min', None, 0),
+    ('envelope', 0, 70)])
+def test_summary_signal(summary, lower, upper):
+    track = GenomicSignalTrack(RecordingSignal(), summary=summary)
+    sig_x, sig_lower, sig_upper = track.get_summary_signal(
+        Interval('chr1', 0, 800), 10)
+
+    assert np.allclose(sig_x, np.arange(0, 800, 80))
+    if lower is None:
+        assert sig_lower is None
+    else:
+        assert np.allclose(sig_lower, sig_x + lower)
+    assert np.allclose(sig_upper, sig_x + upper)
+
+
+def test_envelope_is_filled_between_minimum_and_maximum():
+    track = GenomicSignalTrack(RecordingSignal(), bins=10,
+                               summary='envelope')
+    plot = Browser([track], width=8).plot(Interval('chr1', 0, 800))
+    patches = plot.frames[0]['results']['patches']
+    vertices = patches.get_paths()[0].vertices
+    assert np.isclose(vertices[:, 1].min(), 0)
+    assert np.isclose(vertices[:, 1].max(), 790)
+    plt.close('all')
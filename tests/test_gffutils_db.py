@@ -0,0 +1,71 @@
+from pybedtools import Interval
+
+from EIYBrowse.filetypes.gffutils_db import GffutilsDb, longest_transcript
+
+
+def per_gene_genes(gene_db, region):
+
+    """The original implementation, which queries the children of each gene
+    one at a time."""
+
+    for gene in gene_db.region(region, completely_within=False,
+                               featuretype='gene'):
+        try:
+            mrnas = list(gene_db.children(gene.id, featuretype='mRNA'))
+            longest_mrna = sorted(mrnas, key=lambda m: m.stop - m.start).pop()
+        except IndexError:
+            mrnas = list(gene_db.children(gene.id, featuretype='transcript'))
+            longest_mrna = sorted(mrnas, key=lambda m: m.stop - m.start).pop()
+
+        yield {'gene': gene,
+               'exons': gene_db.children(longest_mrna.id, featuretype='exon')}
+
+
+def spans(genes):
+    return [(gene['gene'].id,
+             sorted((exon.start, exon.end) for exon in gene['exons']))
+            for gene in genes]
+
+
+def test_bulk_query_matches_per_gene_queries(gffutils_db_path):
+    datafile = GffutilsDb(gffutils_db_path)
+    region = Interval('chr1', 0, 4500)
+
+    assert spans(datafile.get_genes(region)) == spans(
+        per_gene_genes(datafile.gene_db, region))
+
+
+def test_longest_mrna_is_preferred_over_longer_transcripts(gffutils_db_path):
+    genes = list(GffutilsDb(gffutils_db_path).get_genes(Interval('chr1', 2900, 4500)))
+    assert spans(genes) == [('g3', [(3000, 3500)])]
+
+
+def test_gene_without_transcripts_has_no_exons(gffutils_db_path):
+    genes = list(GffutilsDb(gffutils_db_path).get_genes(Interval('chr1', 4500, 7000)))
+    assert spans(genes) == [('g4', [])]
+
+
+def test_exons_are_sorted_by_start(gffutils_db_path):
+    genes = list(GffutilsDb(gffutils_db_path).get_genes(Interval('chr1', 0, 1000)))
+    assert [exon.start for exon in genes[0]['exons']] == [100, 800]
+
+
+def test_iter_gene_loci_is_zero_based(gffutils_db_path):
+    loci = sorted(GffutilsDb(gffutils_db_path).iter_gene_loci())
+    assert loci[0] == ('Alpha', 'chr1', 99, 900)
+    assert len(loci) == 5
+
+
+def test_longest_transcript_ties_go_to_last():
+    class Transcript(object):
+        def __init__(self, name, featuretype, start, stop):
+            self.name, self.featuretype = name, featuretype
+            self.start, self.stop = start, stop
+
+    transcripts = [Transcript('a', 'mRNA', 0, 10),
+                   Transcript('b', 'mRNA', 5, 15),
+                   Transcript('c', 'transcript', 0, 100)]
+
+    assert longest_transcript(transcripts).name == 'b'
+    assert longest_transcript(transcripts[2:]).name == 'c'
+    assert longest_transcript([]) is None
@@ -0,0 +1,51 @@
+import subprocess
+import sys
+
+import pytest
+
+
+# Modules which should not need any plotting or parsing libraries, and the
+# libraries they should leave unimported (see benchmarks/import_time.py)
+LIGHT_MODULES = ['EIYBrowse.configuration',
+                 'EIYBrowse.core',
+                 'EIYBrowse.datacache',
+                 'EIYBrowse.server',
+                 'EIYBrowse.pyramid',
+                 'EIYBrowse.batch',
+                 'EIYBrowse.filetypes.bedgraph',
+                 'EIYBrowse.filetypes.bigwig',
+                 'EIYBrowse.filetypes.bed_index',
+                 'EIYBrowse.importers.BedGraph',
+                 'EIYBrowse.importers.GeneIndex']
+
+HEAVY_MODULES = ['matplotlib', 'pandas', 'pybedtools', 'PIL', 'gffutils',
+                 'yaml', 'metaseq', 'pkg_resources']
+
+
+def imported_modules(code):
+
+    """Run code in a new interpreter, and return the names of the modules
+    it imported."""
+
+    result = subprocess.run(
+        [sys.executable, '-c',
+         code + '\nimport sys\nprint("\\n".join(sys.modules))'],
+        stdout=subprocess.PIPE, universal_newlines=True, check=True)
+
+    return set(result.stdout.split())
+
+
+@pytest.mark.parametrize('module', LIGHT_MODULES)
+def test_module_does_not_import_heavy_dependencies(module):
+    top_level = {name.partition('.')[0]
+                 for name in imported_modules('import ' + module)}
+    assert not top_level & set(HEAVY_MODULES)
+
+
+def test_plugins_are_imported_when_first_used():
+    modules = imported_modules(
+        'from EIYBrowse.tracks import defined_tracks\n'
+        'defined_tracks["signal"]')
+    assert 'EIYBrowse.tracks.genomic_signal' in modules
+    assert 'EIYBrowse.tracks.genes' not in modules
+    assert 'EIYBrowse.tracks.interactions' not in modules
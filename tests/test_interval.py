@@ -0,0 +1,113 @@
+import matplotlib
+matplotlib.use('agg')
+
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+import numpy as np
+from pybedtools import Interval
+
+from EIYBrowse.core import Browser
+from EIYBrowse.filetypes.records import IntervalArrays
+from EIYBrowse.tracks.interval import GenomicIntervalTrack
+
+
+class IntervalList(object):
+
+    """Datafile returning the given intervals that overlap each region."""
+
+    def __init__(self, starts, stops, names=None):
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.stops = np.asarray(stops, dtype=np.int64)
+        self.names = names if names is not None else ['.'] * len(starts)
+
+    def intervals(self, region):
+        keep = np.nonzero((self.starts < region.stop) &
+                          (self.stops > region.start))[0]
+        return IntervalArrays(region.chrom, self.starts[keep],
+                              self.stops[keep],
+                              [self.names[i] for i in keep])
+
+
+def plot_track(track, region, width=10):
+    plot = Browser([track], width=width).plot(region)
+    return plot.frames[0]['plot_ax']
+
+
+def test_overlapping_intervals_are_put_in_separate_rows():
+    track = GenomicIntervalTrack(IntervalList([0, 50, 100, 500],
+                                              [200, 150, 300, 600]))
+    config = track.get_config(Interval('chr1', 0, 1000), Browser(width=10))
+
+    assert config == {'rows': 3}
+    rows = track.interval_rows
+    assert len(set(rows[:3])) == 3
+    assert rows[3] < 3
+
+
+def test_rows_are_capped_at_max_rows():
+    track = GenomicIntervalTrack(IntervalList([0] * 5, [100] * 5),
+                                 max_rows=2)
+    config = track.get_config(Interval('chr1', 0, 1000), Browser(width=10))
+
+    assert config == {'rows': 2}
+    assert sorted(track.interval_rows.tolist()) == [0, 1, 1, 1, 1]
+
+
+def test_intervals_are_drawn_as_one_collection():
+    track = GenomicIntervalTrack(IntervalList([0, 50, 500], [200, 150, 600]),
+                                 glyphs={'colors': ['red', 'blue']})
+    ax = plot_track(track, Interval('chr1', 0, 1000))
+
+    collection, = [c for c in ax.collections
+                   if isinstance(c, LineCollection)]
+    segments = collection.get_segments()
+    assert [(s[0][0], s[1][0]) for s in segments] == [(0, 200), (50, 150),
+                                                      (500, 600)]
+    assert len(set(s[0][1] for s in segments[:2])) == 2
+    assert [tuple(c) for c in collection.get_colors()] == [
+        matplotlib.colors.to_rgba(c) for c in ('red', 'blue', 'red')]
+    plt.close('all')
+
+
+def test_labels_are_only_drawn_where_there_is_room():
+    starts = [0, 10, 20, 500, 800]
+    names = ['crowded1', 'crowded2', 'crowded3', 'roomy', '.']
+    track = GenomicIntervalTrack(IntervalList(starts,
+                                              [s + 5 for s in starts],
+                                              names),
+                                 max_rows=1)
+    ax = plot_track(track, Interval('chr1', 0, 1000))
+
+    labels = [text.get_text() for text in ax.texts]
+    assert 'crowded3' in labels and 'roomy' in labels
+    assert 'crowded1' not in labels and 'crowded2' not in labels
+    assert '.' not in labels
+    plt.close('all')
+
+
+def test_dense_region_is_drawn_as_interval_density():
+    starts = np.arange(0, 100000, 10)
+    track = GenomicIntervalTrack(IntervalList(starts, starts + 20),
+                                 density_rows=3)
+    browser = Browser([track], width=4)
+    region = Interval('chr1', 0, 100000)
+
+    assert track.get_config(region, browser) == {'rows': 3}
+    assert track.density
+
+    plot = browser.plot(region)
+    edges, counts = plot.frames[0]['results']['data']
+    width = plot.frames[0]['plot_ax'].get_window_extent().width
+    assert len(counts) == int(round(width))
+    assert edges[0] == 0 and edges[-1] == 100000
+    # Every base is covered by two intervals, and bins are wider than the
+    # spacing between them
+    assert (counts[:-1] >= 2).all()
+    assert not plot.frames[0]['plot_ax'].texts
+    plt.close('all')
+
+
+def test_sparse_region_is_not_drawn_as_density():
+    track = GenomicIntervalTrack(IntervalList([0, 500], [100, 600]))
+    track.get_config(Interval('chr1', 0, 1000), Browser(width=4))
+    assert not track.density
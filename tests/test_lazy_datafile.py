@@ -0,0 +1,86 @@
+import pickle
+import sqlite3
+import threading
+
+import pytest
+from pybedtools import Interval
+
+from EIYBrowse.core import Browser
+from EIYBrowse.filetypes import LazyDatafile
+from EIYBrowse.filetypes.interactions_db import InteractionsDbFile
+from EIYBrowse.tracks.genes import GeneTrack
+
+
+REGION = Interval('chr1', 0, 10000)
+
+
+def gene_names(datafile):
+    return [gene['gene'].attributes['Name'][0]
+            for gene in datafile.get_genes(REGION)]
+
+
+def in_thread(function):
+
+    """Call function on a new thread, and return its result."""
+
+    results = []
+    thread = threading.Thread(target=lambda: results.append(function()))
+    thread.start()
+    thread.join()
+    return results[0]
+
+
+def test_datafile_is_opened_on_first_use(gffutils_db_path):
+    datafile = LazyDatafile(gffutils_db_path, 'gffutils_db')
+    assert not datafile.is_open
+    assert gene_names(datafile)
+    assert datafile.is_open
+
+
+def test_unknown_filetype_is_rejected():
+    with pytest.raises(KeyError):
+        LazyDatafile('genes.db', 'no_such_filetype')
+
+
+def test_copies_are_not_open(gffutils_db_path):
+    datafile = LazyDatafile(gffutils_db_path, 'gffutils_db')
+    datafile.open()
+    copy = pickle.loads(pickle.dumps(datafile))
+    assert not copy.is_open
+    assert gene_names(copy) == gene_names(datafile)
+
+
+def test_genes_are_read_after_warmup_on_worker_threads(gffutils_db_path):
+    track = GeneTrack(LazyDatafile(gffutils_db_path, 'gffutils_db'))
+    browser = Browser([track])
+
+    browser.warmup()
+
+    assert track.datafile.is_open
+    assert gene_names(track.datafile) == ['Alpha', 'Beta', 'Gamma',
+                                          'Delta']
+
+
+def test_database_opened_on_another_thread_can_be_read(gffutils_db_path):
+    datafile = LazyDatafile(gffutils_db_path, 'gffutils_db')
+
+    # e.g. the prefetcher is the first to use the datafile
+    from_thread = in_thread(lambda: gene_names(datafile))
+
+    assert gene_names(datafile) == from_thread
+
+
+def test_interactions_database_can_be_read_from_any_thread(tmpdir):
+    path = str(tmpdir.join('interactions.db'))
+    db = sqlite3.connect(path)
+    db.execute('CREATE TABLE windows (i INTEGER, chrom TEXT, start INTEGER, '
+               'stop INTEGER)')
+    db.executemany('INSERT INTO windows VALUES (?, "chr1", ?, ?)',
+                   [(i, i * 100, (i + 1) * 100) for i in range(10)])
+    db.commit()
+    db.close()
+
+    datafile = in_thread(lambda: InteractionsDbFile(path))
+    assert datafile.get_bin_from_location('chr1', 250) == 2
+    assert in_thread(lambda: datafile.get_location_from_bin('chr1', 3)) == \
+        (300, 400)
@@ -0,0 +1,156 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+from pybedtools import Interval
+
+from EIYBrowse.datacache import SignalCache
+from EIYBrowse.filetypes.binning import (SignalArrays, by_chromosome,
+                                         coverage_matrix, matrix_means,
+                                         summarise_signal)
+from EIYBrowse.tracks.metaplot import MetaplotTrack
+
+
+class PositionSignal(object):
+
+    """Signal equal to the position at the start of each bin, which records
+    whether it was ever read from two threads at the same time."""
+
+    def __init__(self):
+        self.reading = 0
+        self.overlapped = False
+        self._counter_lock = threading.Lock()
+
+    def local_coverage(self, region, bins):
+        with self._counter_lock:
+            self.reading += 1
+            self.overlapped |= self.reading > 1
+        time.sleep(0.001)
+        with self._counter_lock:
+            self.reading -= 1
+        step = float(region.stop - region.start) / bins
+        sig_x = region.start + np.arange(bins) * step
+        return sig_x, sig_x.copy()
+
+
+def random_runs(seed=0, count=300, length=10000):
+    rng = np.random.RandomState(seed)
+    edges = np.sort(rng.choice(np.arange(1, length), 2 * count,
+                               replace=False))
+    return SignalArrays(edges[::2], edges[1::2], rng.uniform(0, 5, count))
+
+
+def test_matrix_means_match_summarise_signal():
+    runs = random_runs()
+    starts = np.array([0, 1234, 5000, 9000, 3333])
+    stops = np.array([10000, 2234, 5010, 9999, 3334])
+
+    matrix = matrix_means(runs, starts, stops, 7)
+
+    assert matrix.shape == (5, 7)
+    for row, start, stop in zip(matrix, starts, stops):
+        assert np.allclose(row, summarise_signal(runs, start, stop,
+                                                 7)['mean'])
+
+
+def test_matrix_means_without_signal():
+    matrix = matrix_means(SignalArrays([], [], []), [0, 10], [10, 20], 3)
+    assert (matrix == 0).all() and matrix.shape == (2, 3)
+
+
+def test_by_chromosome_keeps_region_order_and_reverses_minus_strand():
+    chroms = ['chr2', 'chr1', 'chr2', 'chr1']
+    starts, stops = [0, 10, 20, 30], [4, 14, 24, 34]
+
+    def fetch_chrom(chrom, chrom_starts, chrom_stops):
+        return chrom_starts[:, np.newaxis] + np.arange(4)
+
+    matrix = by_chromosome(fetch_chrom, chroms, starts, stops, 4,
+                           strands=['+', '+', '-', '+'], workers=2)
+
+    assert matrix.tolist() == [[0, 1, 2, 3], [10, 11, 12, 13],
+                               [23, 22, 21, 20], [30, 31, 32, 33]]
+
+
+@pytest.mark.parametrize('summary', ['mean', 'max', 'min'])
+def test_local_coverage_fallback_matches_signal_cache(summary):
+    datafile = PositionSignal()
+    chroms = ['chr1', 'chr2', 'chr3', 'chr1']
+    starts, stops = [0, 800, 1600, 400], [800, 1600, 2400, 1200]
+
+    matrix = coverage_matrix(datafile, chroms, starts, stops, 10, summary,
+                             workers=4)
+
+    cache = SignalCache(datafile)
+    for row, chrom, start, stop in zip(matrix, chroms, starts, stops):
+        _, summaries = cache.local_summaries(Interval(chrom, start, stop),
+                                             10)
+        if summary == 'mean':
+            expected = datafile.local_coverage(
+                Interval(chrom, start, stop), 10)[1]
+        else:
+            expected = summaries[summary]
+        assert np.allclose(row, expected)
+
+    assert not datafile.overlapped
+
+
+def test_local_coverage_fallback_rejects_unknown_summary():
+    with pytest.raises(ValueError):
+        coverage_matrix(PositionSignal(), ['chr1'], [0], [100], 10,
+                        'median')
+
+
+def features():
+    return [Interval('chr1', 1000, 2000, strand='+'),
+            Interval('chr1', 5000, 5400, strand='-'),
+            Interval('chr2', 100, 300, strand='+')]
+
+
+def test_feature_windows_around_anchors():
+    track = MetaplotTrack(PositionSignal(), features(), width=400,
+                          anchor='start')
+    chroms, starts, stops, strands = track.feature_windows()
+
+    # The window of the feature starting at 100 would start before the
+    # beginning of its chromosome
+    assert chroms.tolist() == ['chr1', 'chr1']
+    assert starts.tolist() == [800, 5200]
+    assert stops.tolist() == [1200, 5600]
+    assert strands.tolist() == ['+', '-']
+
+    track = MetaplotTrack(PositionSignal(), features(), width=100)
+    _, starts, _, _ = track.feature_windows()
+    assert starts.tolist() == [1450, 5150, 150]
+
+
+def test_feature_windows_past_chromosome_end_are_dropped():
+    # chr1 ends within the window of the feature at 5000-5400; chr2 has no
+    # known length, so its window is kept
+    track = MetaplotTrack(PositionSignal(), features(), width=400,
+                          chrom_sizes={'chr1': 5350})
+    chroms, starts, _, _ = track.feature_windows()
+    assert chroms.tolist() == ['chr1', 'chr2']
+    assert starts.tolist() == [1300, 0]
+
+    datafile = PositionSignal()
+    datafile.chrom_sizes = {'chr1': 5350, 'chr2': 350}
+    track = MetaplotTrack(datafile, features(), width=400)
+    chroms, starts, _, _ = track.feature_windows()
+    assert chroms.tolist() == ['chr1']
+    assert starts.tolist() == [1300]
+
+
+def test_profile_mean_and_confidence_band():
+    track = MetaplotTrack(PositionSignal(), features(), bins=4,
+                          confidence=0.95)
+    mean, error = track.get_profile()
+
+    rows = np.array([np.arange(1000, 2000, 250),
+                     np.arange(5000, 5400, 100)[::-1],
+                     np.arange(100, 300, 50)])
+    assert np.allclose(mean, rows.mean(axis=0))
+    assert np.allclose(error, 1.959964 * rows.std(axis=0, ddof=1) /
+                       np.sqrt(3))
+    assert track.get_profile() is track.profile
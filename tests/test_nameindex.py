@@ -0,0 +1,105 @@
+import os
+
+import pytest
+from pybedtools import Interval
+
+from EIYBrowse.core import Browser
+from EIYBrowse.exceptions import UnknownGeneError
+from EIYBrowse.filetypes.gffutils_db import GffutilsDb
+from EIYBrowse.nameindex import GeneNameIndex, name_index_path
+from EIYBrowse.tracks.genes import GeneTrack
+from EIYBrowse.utils import format_genomic_distance, parse_genomic_distance
+
+
+LOCI = [('Sox2', 'chr3', 34650000, 34652000),
+        ('Sox21', 'chr14', 118000000, 118002000),
+        ('SOX2', 'chr1', 10, 20),
+        ('Pou5f1', 'chr17', 35500000, 35505000),
+        ('Nanog', 'chr6', 122700000, 122710000)]
+
+
+def test_lookup_many_finds_first_exact_match_ignoring_case():
+    index = GeneNameIndex.from_loci(LOCI)
+    positions = index.lookup_many(['sox2', 'NANOG', 'Sox', 'Missing', 'Zzz'])
+
+    assert index.locus(positions[0]) == ('chr1', 10, 20)
+    assert index.locus(positions[1]) == ('chr6', 122700000, 122710000)
+    assert positions[2:].tolist() == [-1, -1, -1]
+
+
+def test_lookup_and_prefix():
+    index = GeneNameIndex.from_loci(LOCI)
+    assert sorted(index.names[index.lookup('SoX2')]) == ['SOX2', 'Sox2']
+    assert sorted(index.names[index.prefix('sox')]) == ['SOX2', 'Sox2',
+                                                         'Sox21']
+    assert len(index.prefix('oct')) == 0
+
+
+def test_empty_index():
+    index = GeneNameIndex.from_loci([])
+    assert index.lookup_many(['Sox2']).tolist() == [-1]
+    assert index.lookup_many([]).tolist() == []
+
+
+def test_save_and_load(tmpdir):
+    path = str(tmpdir.join('index.npz'))
+    GeneNameIndex.from_loci(LOCI).save(path)
+    index = GeneNameIndex.load(path)
+    assert index.locus(index.lookup_many(['pou5f1'])[0]) == (
+        'chr17', 35500000, 35505000)
+
+
+def test_index_is_saved_next_to_datafile_and_reused(gffutils_db_path):
+    if os.path.exists(name_index_path(gffutils_db_path)):
+        os.remove(name_index_path(gffutils_db_path))
+
+    datafile = GffutilsDb(gffutils_db_path)
+    GeneNameIndex.for_datafile(datafile)
+    assert os.path.exists(name_index_path(gffutils_db_path))
+
+    class NoLoci(object):
+        path = gffutils_db_path
+
+        def iter_gene_loci(self):
+            raise AssertionError('index should not be rebuilt')
+
+    assert len(GeneNameIndex.for_datafile(NoLoci())) == 5
+
+
+@pytest.mark.parametrize('distance, expected', [('200', 200),
+                                                ('50kb', 50000),
+                                                ('1.5Mb', 1500000),
+                                                ('1,000 bp', 1000)])
+def test_parse_genomic_distance(distance, expected):
+    assert parse_genomic_distance(distance) == expected
+
+
+@pytest.mark.parametrize('distance', ['', 'kb', '10 parsecs', '1.2.3kb'])
+def test_parse_genomic_distance_rejects_invalid(distance):
+    with pytest.raises(ValueError):
+        parse_genomic_distance(distance)
+
+
+@pytest.mark.parametrize('distance', [500, 50000, 1500000])
+def test_parse_genomic_distance_inverts_format(distance):
+    assert parse_genomic_distance(format_genomic_distance(distance)) == \
+        distance
+
+
+def test_browser_resolves_genes_through_gene_tracks(gffutils_db_path):
+    browser = Browser([GeneTrack(GffutilsDb(gffutils_db_path))])
+
+    regions = browser.resolve_regions(['alpha', 'Beta+1kb', 'Eps',
+                                       'chr1:5-10',
+                                       Interval('chr2', 0, 1)], flank=10)
+
+    assert [(r.chrom, r.start, r.stop) for r in regions] == [
+        ('chr1', 89, 910), ('chr1', 0, 3000), ('chr2', 89, 910),
+        ('chr1', 5, 10), ('chr2', 0, 1)]
+
+
+def test_browser_reports_unknown_genes(gffutils_db_path):
+    browser = Browser([GeneTrack(GffutilsDb(gffutils_db_path))])
+    with pytest.raises(UnknownGeneError) as error:
+        browser.resolve_regions(['Alpha', 'Omega'])
+    assert 'Omega' in str(error.value)
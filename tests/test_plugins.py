@@ -0,0 +1,115 @@
+import sys
+import types
+
+import pytest
+
+from EIYBrowse import plugins, tracks
+from EIYBrowse.filetypes import defined_filetypes
+from EIYBrowse.plugins import PluginRegistry
+from EIYBrowse.tracks import defined_tracks
+
+
+class FakeEntryPoint(object):
+
+    def __init__(self, name, plugin):
+        self.name = name
+        self.plugin = plugin
+        self.loads = 0
+
+    def load(self):
+        self.loads += 1
+        return self.plugin
+
+
+@pytest.fixture
+def entry_points(monkeypatch):
+    points = {'EIYBrowse.test': [FakeEntryPoint('alpha', 'Alpha'),
+                                 FakeEntryPoint('beta', 'Beta')]}
+    reads = []
+
+    def fake_entry_points(group):
+        reads.append(group)
+        return points.get(group, [])
+
+    monkeypatch.setattr(plugins, '_entry_points', fake_entry_points)
+    return points['EIYBrowse.test'], reads
+
+
+@pytest.fixture
+def extra_module(monkeypatch):
+    module = types.ModuleType('eiybrowse_test_extra')
+    module._registry = {'gamma': 'Gamma', 'alpha': 'Other alpha'}
+    monkeypatch.setitem(sys.modules, 'eiybrowse_test_extra', module)
+    return module.__name__
+
+
+def test_entry_points_are_read_once_and_loaded_on_lookup(entry_points):
+    points, reads = entry_points
+    registry = PluginRegistry('EIYBrowse.test')
+    assert reads == []
+
+    assert registry['alpha'] == 'Alpha'
+    assert registry['alpha'] == 'Alpha'
+    assert 'beta' in registry
+    assert reads == ['EIYBrowse.test']
+    assert [point.loads for point in points] == [1, 0]
+
+
+def test_extra_modules_are_only_imported_when_needed(entry_points,
+                                                     extra_module,
+                                                     monkeypatch):
+    imported = []
+    import_module = plugins.importlib.import_module
+
+    def recording_import(name):
+        imported.append(name)
+        return import_module(name)
+
+    monkeypatch.setattr(plugins.importlib, 'import_module',
+                        recording_import)
+
+    registry = PluginRegistry('EIYBrowse.test', [extra_module])
+    assert registry['alpha'] == 'Alpha'
+    assert imported == []
+
+    assert registry['gamma'] == 'Gamma'
+    assert registry.names() == ['alpha', 'beta', 'gamma']
+    assert imported == [extra_module]
+
+
+def test_unknown_plugins(entry_points):
+    registry = PluginRegistry('EIYBrowse.test',
+                              ['eiybrowse_no_such_module'])
+    with pytest.raises(KeyError):
+        registry['delta']
+    assert registry.get('delta') is None
+    assert 'delta' not in registry
+    assert len(registry) == 2
+    assert list(registry) == ['alpha', 'beta']
+
+
+def test_no_plugins_on_read_the_docs(entry_points, extra_module,
+                                     monkeypatch):
+    monkeypatch.setenv('READTHEDOCS', 'True')
+    registry = PluginRegistry('EIYBrowse.test', [extra_module])
+    assert registry.names() == []
+
+
+def test_installed_plugins():
+    assert defined_tracks['signal'].__name__ == 'GenomicSignalTrack'
+    assert defined_filetypes['gffutils_db'].__name__ == 'GffutilsDb'
+
+
+def test_track_attributes_are_classes_after_their_module_is_imported(
+        monkeypatch):
+    # Start from a registry that has not loaded the track, so reading the
+    # attribute imports the submodule of the same name
+    monkeypatch.delattr(tracks, 'scale_bar', raising=False)
+    monkeypatch.delitem(sys.modules, 'EIYBrowse.tracks.scale_bar',
+                        raising=False)
+    monkeypatch.setattr(tracks, 'defined_tracks',
+                        PluginRegistry('EIYBrowse.tracks'))
+
+    first = tracks.scale_bar
+    assert first.__name__ == 'ScaleBarTrack'
+    assert tracks.scale_bar is first
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import numpy as np
+from pybedtools import Interval
+
+from EIYBrowse.datacache import SignalCache, datafile_lock
+from EIYBrowse.prefetch import Prefetcher, neighbouring_regions
+
+
+class SingleThreadSignal(object):
+
+    """Datafile which records whether it was ever read from two threads at
+    the same time."""
+
+    def __init__(self):
+        self.reading = 0
+        self.overlapped = False
+        self._counter_lock = threading.Lock()
+
+    def local_coverage(self, region, bins):
+        with self._counter_lock:
+            self.reading += 1
+            self.overlapped |= self.reading > 1
+        time.sleep(0.005)
+        with self._counter_lock:
+            self.reading -= 1
+        return np.arange(bins, dtype=float), np.zeros(bins)
+
+
+class RecordingTrack(object):
+
+    def __init__(self, fail=False):
+        self.regions = []
+        self.fail = fail
+
+    def prefetch(self, region, windows=1):
+        self.regions.append((region.start, region.stop))
+        if self.fail:
+            raise IOError('unreadable')
+
+
+def test_neighbouring_regions():
+    regions = neighbouring_regions(Interval('chr1', 1000, 2000))
+    assert [(r.start, r.stop) for r in regions] == [(0, 1000),
+                                                    (2000, 3000),
+                                                    (500, 2500)]
+
+
+def test_neighbouring_regions_clipped_at_chromosome_start():
+    regions = neighbouring_regions(Interval('chr1', 0, 1000))
+    assert [(r.start, r.stop) for r in regions] == [(1000, 2000),
+                                                    (0, 1500)]
+
+
+def test_datafile_lock_is_shared_per_datafile():
+    first, second = SingleThreadSignal(), SingleThreadSignal()
+    assert datafile_lock(first) is datafile_lock(first)
+    assert datafile_lock(first) is not datafile_lock(second)
+
+
+def test_caches_sharing_a_datafile_never_read_it_concurrently():
+    datafile = SingleThreadSignal()
+    caches = [SignalCache(datafile) for _ in range(4)]
+
+    def fetch(cache):
+        for start in range(0, 20000, 1000):
+            cache.local_coverage(Interval('chr1', start, start + 1000), 10)
+
+    threads = [threading.Thread(target=fetch, args=(cache,))
+               for cache in caches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not datafile.overlapped
+
+
+def test_prefetcher_warms_every_track_and_ignores_errors():
+    prefetcher = Prefetcher()
+    tracks = [RecordingTrack(), RecordingTrack(fail=True)]
+    prefetcher.schedule(Interval('chr1', 1000, 2000), tracks)
+    prefetcher.executor.shutdown(wait=True)
+    for track in tracks:
+        assert sorted(track.regions) == [(0, 1000), (500, 2500),
+                                         (2000, 3000)]
@@ -0,0 +1,78 @@
+from io import BytesIO
+
+import matplotlib
+matplotlib.use('agg')
+
+import numpy as np
+from PIL import Image
+
+from EIYBrowse import pyramid
+from EIYBrowse.core import Browser
+from EIYBrowse.tracks.genomic_signal import GenomicSignalTrack
+
+
+class ConstantSignal(object):
+
+    def local_coverage(self, region, bins):
+        step = float(region.stop - region.start) / bins
+        return region.start + np.arange(bins) * step, np.ones(bins)
+
+
+def tile_pixels(tmpdir, x):
+    with open(pyramid.tile_path(str(tmpdir), 'chr1', 2, x, 'png'),
+              'rb') as tile_file:
+        return np.asarray(Image.open(BytesIO(tile_file.read())).convert('L'))
+
+
+def test_pyramid_jobs_cover_every_tile_once():
+    jobs = list(pyramid.pyramid_jobs('chr1', 1000, 0, pyramid.JOB_DEPTH + 2,
+                                     base_width=1024))
+    tiles = set()
+    for chrom, length, zoom, x, last_zoom in jobs:
+        for level in range(zoom, last_zoom + 1):
+            scale = 2 ** (level - zoom)
+            for i in range(x * scale, (x + 1) * scale):
+                if i * (1024 >> level) < length:
+                    assert (level, i) not in tiles
+                    tiles.add((level, i))
+    expected = {(level, i) for level in range(pyramid.JOB_DEPTH + 3)
+                for i in range(-(-1000 // (1024 >> level)))}
+    assert tiles == expected
+
+
+def test_read_chrom_sizes(tmpdir):
+    sizes = tmpdir.join('genome.chrom.sizes')
+    sizes.write('chr1\t1000\nchr2\t500\textra\n\n')
+    assert pyramid.read_chrom_sizes(str(sizes)) == {'chr1': 1000,
+                                                    'chr2': 500}
+
+
+def test_tiles_are_drawn_edge_to_edge(tmpdir):
+    browser = Browser([GenomicSignalTrack(ConstantSignal(), bins=10)],
+                      width=2, rowheight=0.5)
+    pyramid._WORKER_BROWSER = browser
+    pyramid._WORKER_BROWSER.margins = False
+    options = {'output_dir': str(tmpdir), 'format': 'png', 'dpi': 50,
+               'base_width': 1024}
+
+    for x in (0, 1):
+        pyramid._write_tile('chr1', 2, x, options)
+
+    left, right = tile_pixels(tmpdir, 0), tile_pixels(tmpdir, 1)
+
+    # The figure is exactly the data axes, and the signal fills them from
+    # one edge to the other
+    assert left.shape == (100, 100)
+    middle = left.shape[0] // 2
+    assert left[middle, 0] < 255 and left[middle, -1] < 255
+    assert right[middle, 0] < 255
+    assert (left[middle] == right[middle]).all()
+
+
+def test_browser_with_margins_has_label_column():
+    browser = Browser([GenomicSignalTrack(ConstantSignal(), bins=10)],
+                      width=10)
+    assert browser.data_axis_width() < 9
+
+    browser.margins = False
+    assert browser.data_axis_width() == 10
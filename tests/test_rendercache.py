@@ -0,0 +1,72 @@
+import os
+import time
+
+from pybedtools import Interval
+
+from EIYBrowse.core import Browser
+from EIYBrowse.rendercache import DiskRenderCache, file_fingerprint
+
+
+class ConfiguredTrack(object):
+
+    def __init__(self, config):
+        self.config = config
+
+
+def test_get_returns_stored_image(tmpdir):
+    cache = DiskRenderCache(str(tmpdir))
+    cache.put('abcdef', 'png', b'image')
+    assert cache.get('abcdef', 'png') == b'image'
+    assert cache.get('abcdef', 'svg') is None
+    assert cache.get('012345', 'png') is None
+
+
+def test_replacing_an_image_does_not_count_it_twice(tmpdir):
+    cache = DiskRenderCache(str(tmpdir))
+    cache.put('aaaaaa', 'png', b'1234')
+    for _ in range(5):
+        cache.put('bbbbbb', 'png', b'12345678')
+    assert cache._total_bytes == 12
+
+
+def test_least_recently_used_images_are_evicted(tmpdir):
+    cache = DiskRenderCache(str(tmpdir), max_megabytes=2.5 / 1024 ** 2)
+    cache.put('aaaaaa', 'png', b'1')
+    old_time = time.time() - 100
+    os.utime(cache._image_path('aaaaaa', 'png'), (old_time, old_time))
+    cache.put('bbbbbb', 'png', b'1')
+    cache.put('cccccc', 'png', b'1')
+    assert cache.get('aaaaaa', 'png') is None
+    assert cache.get('cccccc', 'png') == b'1'
+
+
+def test_key_changes_with_config_region_and_datafile(tmpdir):
+    datafile = tmpdir.join('signal.bw')
+    datafile.write('1')
+    cache = DiskRenderCache(str(tmpdir.join('cache')))
+    config = {'signal': {'file_path': str(datafile), 'bins': 100}}
+    browser = Browser([ConfiguredTrack(config)])
+    region = Interval('chr1', 0, 1000)
+
+    key = cache.key(browser, region, 'png', 72)
+    assert key == cache.key(browser, region, 'png', 72)
+    assert key != cache.key(browser, Interval('chr1', 0, 2000), 'png', 72)
+    assert key != cache.key(browser, region, 'svg', 72)
+
+    other = Browser([ConfiguredTrack({'signal': {'file_path': str(datafile),
+                                                 'bins': 200}})])
+    assert key != cache.key(other, region, 'png', 72)
+
+    datafile.write('12')
+    assert key != cache.key(browser, region, 'png', 72)
+
+
+def test_browser_with_unconfigured_tracks_has_no_key(tmpdir):
+    cache = DiskRenderCache(str(tmpdir))
+    browser = Browser([ConfiguredTrack(None)])
+    assert cache.key(browser, Interval('chr1', 0, 10), 'png', 72) is None
+
+
+def test_missing_file_fingerprint(tmpdir):
+    path = str(tmpdir.join('missing'))
+    assert file_fingerprint(path) == (path, None)
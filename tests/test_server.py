@@ -0,0 +1,170 @@
+import multiprocessing
+
+import pytest
+from pybedtools import Interval
+
+from EIYBrowse.exceptions import ImproperlyConfigured, UnknownGeneError
+from EIYBrowse import configuration, server
+from EIYBrowse.server import (BrowserServer, BrowserRequestHandler, ImageCache,
+                              etag_matches)
+from EIYBrowse.tiles import tile_count, tile_region, tile_width
+from EIYBrowse.utils import parse_region
+
+
+class FakeServer(object):
+
+    base_width = 1024
+    dpi = None
+
+    def __init__(self, resolve_error=None, render_error=None):
+        self.resolve_error = resolve_error
+        self.render_error = render_error
+
+    def resolve_region(self, region_spec):
+        if self.resolve_error is not None:
+            raise self.resolve_error
+        return parse_region(region_spec)
+
+    def get_image(self, region, fmt, dpi):
+        if self.render_error is not None:
+            raise self.render_error
+        return '"etag"', b'image'
+
+
+def handle(path, server, headers=None):
+
+    """Run a GET request for path through the request handler, and return
+    the status code that was sent."""
+
+    handler = BrowserRequestHandler.__new__(BrowserRequestHandler)
+    handler.path, handler.server = path, server
+    handler.headers = headers or {}
+    sent = []
+
+    handler.send_error = lambda code, message=None: sent.append(code)
+    handler.send_response = sent.append
+    handler.send_header = lambda *args: None
+    handler.end_headers = lambda: None
+    handler.wfile = type('Output', (), {'write': lambda self, data: None})()
+
+    handler.do_GET()
+
+    return sent[0]
+
+
+@pytest.mark.parametrize('path, server, status', [
+    ('/region/chr1:0-1000.png', FakeServer(), 200),
+    ('/tile/chr1/2/3.svg', FakeServer(), 200),
+    ('/region/chr1:1000-0.png', FakeServer(), 400),
+    ('/tile/chr1/40/0.png', FakeServer(), 400),
+    ('/region/chr1:0-1000.gif', FakeServer(), 404),
+    ('/other/chr1:0-1000.png', FakeServer(), 404),
+    ('/region/Sox2.png', FakeServer(UnknownGeneError('Sox2')), 404),
+    ('/region/Sox2.png',
+     FakeServer(multiprocessing.TimeoutError()), 504),
+    ('/region/Sox2.png', FakeServer(RuntimeError('worker died')), 500),
+    ('/region/chr1:0-1000.png',
+     FakeServer(render_error=multiprocessing.TimeoutError()), 504),
+    ('/region/chr1:0-1000.png',
+     FakeServer(render_error=RuntimeError('worker died')), 500),
+])
+def test_request_status(path, server, status):
+    assert handle(path, server) == status
+
+
+def test_bad_config_fails_before_starting_workers():
+    with pytest.raises(ImproperlyConfigured):
+        BrowserServer(('127.0.0.1', 0), 'tracks:\n  - no_such_track: {}\n')
+
+
+def test_image_cache_evicts_least_recently_used():
+    cache = ImageCache(10)
+    cache.put('a', b'1234')
+    cache.put('b', b'1234')
+    cache.get('a')
+    cache.put('c', b'1234')
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.total_bytes == 8
+
+
+def test_image_cache_replaced_image_is_not_counted_twice():
+    cache = ImageCache(10)
+    cache.put('a', b'1234')
+    cache.put('a', b'12345678')
+    assert cache.total_bytes == 8
+
+
+def test_image_cache_does_not_store_oversized_images():
+    cache = ImageCache(4)
+    etag, image = cache.put('a', b'12345')
+    assert image == b'12345' and etag.startswith('"')
+    assert cache.get('a') is None
+
+
+def test_tiles_halve_in_width_at_each_zoom_level():
+    assert tile_width(0, 1024) == 1024
+    assert tile_width(3, 1024) == 128
+    region = tile_region('chr1', 3, 2, 1024)
+    assert (region.chrom, region.start, region.stop) == ('chr1', 256, 384)
+    assert tile_count(1000, 3, 1024) == 8
+
+
+@pytest.mark.parametrize('region_string, expected', [
+    ('chr1:100-200', ('chr1', 100, 200)),
+    ('chr7:1,000,000-2,000,000', ('chr7', 1000000, 2000000)),
+    ('HLA:A:10-20', ('HLA:A', 10, 20)),
+])
+def test_parse_region(region_string, expected):
+    region = parse_region(region_string)
+    assert (region.chrom, region.start, region.stop) == expected
+
+
+@pytest.mark.parametrize('region_string', ['chr1', 'chr1:100', 'chr1:a-b',
+                                           'chr1:200-100', 'chr1:-1-10'])
+def test_parse_region_rejects_invalid_regions(region_string):
+    with pytest.raises(ValueError):
+        parse_region(region_string)
+
+
+def test_parsed_region_is_an_interval():
+    assert isinstance(parse_region('chr1:0-1'), Interval)
+
+
+@pytest.mark.parametrize('if_none_match, matches', [
+    ('"etag"', True),
+    ('W/"etag"', True),
+    ('"other", "etag"', True),
+    ('*', True),
+    ('"eta"', False),
+    ('"etag2"', False),
+    ('"etag"x', False),
+    ('', False),
+])
+def test_etag_matches_whole_tags(if_none_match, matches):
+    assert etag_matches('"etag"', if_none_match) == matches
+
+
+@pytest.mark.parametrize('if_none_match, status', [('"etag"', 304),
+                                                   ('"eta"', 200),
+                                                   ('"etag-long"', 200)])
+def test_not_modified_only_for_matching_etag(if_none_match, status):
+    assert handle('/region/chr1:0-1000.png', FakeServer(),
+                  {'If-None-Match': if_none_match}) == status
+
+
+def test_worker_opens_datafiles_on_start(monkeypatch):
+
+    class WarmupBrowser(object):
+        warmed_up = False
+
+        def warmup(self):
+            self.warmed_up = True
+
+    monkeypatch.setattr(configuration, 'browser_from_config_yaml',
+                        lambda config_yaml: WarmupBrowser())
+    monkeypatch.setattr(server, '_WORKER_BROWSER', None)
+
+    server._init_worker('tracks: []')
+
+    assert server._WORKER_BROWSER.warmed_up
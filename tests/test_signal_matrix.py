@@ -0,0 +1,110 @@
+import threading
+
+import matplotlib
+matplotlib.use('agg')
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+from matplotlib.collections import PolyCollection
+from pybedtools import Interval
+
+from EIYBrowse.core import Browser
+from EIYBrowse.tracks.signal_matrix import (SMALL_MULTIPLE_FILL,
+                                            SignalMatrixTrack)
+
+
+class ScaledSignal(object):
+
+    """Signal equal to the bin start position times a scale."""
+
+    def __init__(self, scale):
+        self.scale = scale
+
+    def local_coverage(self, region, bins):
+        step = float(region.stop - region.start) / bins
+        sig_x = region.start + np.arange(bins) * step
+        return sig_x, sig_x * self.scale
+
+
+def test_signal_matrix_has_one_row_per_sample():
+    track = SignalMatrixTrack([ScaledSignal(scale) for scale in (1, 2, 3)],
+                              bins=10)
+    sig_x, matrix = track.signal_matrix(Interval('chr1', 0, 1000), 10)
+
+    assert matrix.shape == (3, 10)
+    assert np.allclose(sig_x, np.arange(0, 1000, 100))
+    assert np.allclose(matrix, np.outer([1, 2, 3], sig_x))
+
+
+def test_signal_matrix_leaves_no_worker_threads_behind():
+    threads = threading.active_count()
+
+    for _ in range(3):
+        track = SignalMatrixTrack([ScaledSignal(scale) for scale in (1, 2)],
+                                  workers=2)
+        track.signal_matrix(Interval('chr1', 0, 1000), 10)
+
+    assert threading.active_count() == threads
+
+
+def test_signal_matrix_summaries():
+    track = SignalMatrixTrack([ScaledSignal(1)], summary='max')
+    _, matrix = track.signal_matrix(Interval('chr1', 0, 800), 10)
+    assert np.allclose(matrix[0], np.arange(0, 800, 80) + 70)
+
+
+def test_empty_signal_matrix():
+    _, matrix = SignalMatrixTrack([]).signal_matrix(
+        Interval('chr1', 0, 1000), 10)
+    assert matrix.shape == (0, 10)
+
+
+@pytest.mark.parametrize('options, matrix, limits', [
+    ({}, [[1., 5.], [2., np.nan]], (0., 5.)),
+    ({}, [[-2., 5.]], (-2., 5.)),
+    ({'vmin': 1., 'vmax': 3.}, [[0., 5.]], (1., 3.)),
+    ({}, [[0., 0.]], (0., 1.)),
+    ({}, [[np.nan]], (0., 1.)),
+])
+def test_color_limits(options, matrix, limits):
+    track = SignalMatrixTrack([], **options)
+    assert track.color_limits(np.array(matrix)) == limits
+
+
+def test_unknown_style_and_summary_are_rejected():
+    with pytest.raises(ValueError):
+        SignalMatrixTrack([], style='bars')
+    with pytest.raises(ValueError):
+        SignalMatrixTrack([], summary='median')
+
+
+def test_heatmap_is_drawn_as_one_image():
+    track = SignalMatrixTrack([ScaledSignal(1), ScaledSignal(2)], bins=10,
+                              samples=['a', 'b'])
+    plot = Browser([track], width=8).plot(Interval('chr1', 0, 1000))
+    ax = plot.frames[0]['plot_ax']
+
+    image, = ax.images
+    assert image.get_array().shape == (2, 10)
+    assert image.get_clim() == (0., 1800.)
+    assert [text.get_text() for text in ax.texts] == ['a', 'b']
+    plt.close('all')
+
+
+def test_small_multiples_share_one_scale():
+    track = SignalMatrixTrack([ScaledSignal(1), ScaledSignal(2)], bins=10,
+                              style='lines')
+    plot = Browser([track], width=8).plot(Interval('chr1', 0, 1000))
+    ax = plot.frames[0]['plot_ax']
+
+    collection, = [c for c in ax.collections
+                   if isinstance(c, PolyCollection)]
+    first, second = [path.vertices for path in collection.get_paths()]
+
+    # Rows hang from baselines at 1 and 2, and the largest value fills
+    # SMALL_MULTIPLE_FILL of its row
+    assert np.isclose(first[:, 1].max(), 1)
+    assert np.isclose(second[:, 1].min(), 2 - SMALL_MULTIPLE_FILL)
+    assert np.isclose(first[:, 1].min(), 1 - SMALL_MULTIPLE_FILL / 2)
+    plt.close('all')
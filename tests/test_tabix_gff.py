@@ -0,0 +1,122 @@
+import gffutils
+import pysam
+import pytest
+from pybedtools import Interval
+
+from EIYBrowse.filetypes import tabix_gff
+from EIYBrowse.filetypes.gffutils_db import GffutilsDb
+from EIYBrowse.filetypes.records import gene_name
+from EIYBrowse.filetypes.tabix_gff import TabixGffFile, parse_attributes
+
+
+# Exons only, so genes and transcripts have to be inferred
+GTF = """\
+chr1\ttest\texon\t100\t200\t.\t+\t.\tgene_id "g1"; transcript_id "t1a";
+chr1\ttest\texon\t400\t500\t.\t+\t.\tgene_id "g1"; transcript_id "t1a";
+chr1\ttest\texon\t100\t200\t.\t+\t.\tgene_id "g1"; transcript_id "t1b";
+chr1\ttest\texon\t800\t900\t.\t+\t.\tgene_id "g1"; transcript_id "t1b";
+chr1\ttest\texon\t1000\t1100\t.\t-\t.\tgene_id "g2"; transcript_id "t2";
+chr1\ttest\texon\t900000\t900100\t.\t-\t.\tgene_id "g2"; transcript_id "t2";
+chr2\ttest\texon\t100\t900\t.\t+\t.\tgene_id "g3"; transcript_id "t3";
+"""
+
+
+def sorted_records(annotation):
+    lines = [line for line in annotation.splitlines() if line]
+    return '\n'.join(sorted(lines, key=lambda l: (l.split('\t')[0],
+                                                  int(l.split('\t')[3])))) + '\n'
+
+
+def tabix_file(tmpdir, name, annotation, preset='gff'):
+    path = tmpdir.join(name)
+    path.write(sorted_records(annotation))
+    return pysam.tabix_index(str(path), preset=preset, force=True)
+
+
+def spans(genes):
+    return [(gene['gene'].start, gene['gene'].end, gene['gene'].strand,
+             gene_name(gene['gene']),
+             sorted((exon.start, exon.end) for exon in gene['exons']))
+            for gene in genes]
+
+
+@pytest.fixture
+def gff3(tmpdir, gff_path, gffutils_db_path):
+    with open(gff_path) as gff_file:
+        gz_path = tabix_file(tmpdir, 'genes.gff3', gff_file.read())
+    return TabixGffFile(gz_path), GffutilsDb(gffutils_db_path)
+
+
+@pytest.fixture
+def gtf(tmpdir):
+    gz_path = tabix_file(tmpdir, 'genes.gtf', GTF)
+    db_path = str(tmpdir.join('genes_gtf.db'))
+    gffutils.create_db(GTF, db_path, from_string=True)
+    return TabixGffFile(gz_path), GffutilsDb(db_path)
+
+
+@pytest.mark.parametrize('region', [Interval('chr1', 0, 10000),
+                                    Interval('chr1', 150, 160),
+                                    Interval('chr1', 950, 1000),
+                                    Interval('chr1', 3999, 4999),
+                                    Interval('chr2', 0, 1000),
+                                    Interval('chrX', 0, 1000)])
+def test_gff3_genes_match_gffutils_database(gff3, region):
+    tabix_datafile, gffutils_datafile = gff3
+    assert spans(tabix_datafile.get_genes(region)) == spans(
+        gffutils_datafile.get_genes(region))
+
+
+@pytest.mark.parametrize('region', [Interval('chr1', 50, 950),
+                                    Interval('chr1', 500000, 500100),
+                                    Interval('chr1', 900050, 900060),
+                                    Interval('chr2', 0, 1000)])
+def test_gtf_genes_are_inferred_as_by_gffutils(gtf, region):
+    tabix_datafile, gffutils_datafile = gtf
+    assert spans(tabix_datafile.get_genes(region)) == spans(
+        gffutils_datafile.get_genes(region))
+
+
+def test_gene_loci_match_gffutils_database(gff3):
+    tabix_datafile, gffutils_datafile = gff3
+    assert sorted(tabix_datafile.iter_gene_loci()) == sorted(
+        gffutils_datafile.iter_gene_loci())
+
+
+def test_genes_spanning_blocks_are_returned_once(gtf, monkeypatch):
+    monkeypatch.setattr(tabix_gff, 'BLOCK_SIZE', 1000)
+    tabix_datafile, _ = gtf
+    genes = spans(tabix_datafile.get_genes(Interval('chr1', 0, 1000000)))
+    assert [gene[3] for gene in genes] == ['g1', 'g2']
+
+
+TWIN_GFF3 = """\
+chr1\ttest\tgene\t100\t2600\t.\t+\t.\tID=a;Name=twin
+chr1\ttest\tmRNA\t100\t2600\t.\t+\t.\tID=ta;Parent=a
+chr1\ttest\texon\t100\t200\t.\t+\t.\tParent=ta
+chr1\ttest\texon\t2500\t2600\t.\t+\t.\tParent=ta
+chr1\ttest\tgene\t100\t2600\t.\t+\t.\tID=b;Name=twin
+chr1\ttest\tmRNA\t100\t2600\t.\t+\t.\tID=tb;Parent=b
+chr1\ttest\texon\t100\t200\t.\t+\t.\tParent=tb
+chr1\ttest\texon\t1500\t1600\t.\t+\t.\tParent=tb
+chr1\ttest\texon\t2500\t2600\t.\t+\t.\tParent=tb
+"""
+
+
+@pytest.mark.parametrize('region', [Interval('chr1', 0, 10000),
+                                    Interval('chr1', 1200, 2200)])
+def test_identical_genes_spanning_blocks_are_both_returned(tmpdir, monkeypatch,
+                                                          region):
+    monkeypatch.setattr(tabix_gff, 'BLOCK_SIZE', 1000)
+    tabix_datafile = TabixGffFile(tabix_file(tmpdir, 'twins.gff3', TWIN_GFF3))
+    genes = spans(tabix_datafile.get_genes(region))
+    assert sorted(gene[4] for gene in genes) == [
+        [(100, 200), (1500, 1600), (2500, 2600)],
+        [(100, 200), (2500, 2600)]]
+
+
+def test_parse_attributes():
+    assert parse_attributes('ID=e1;Parent=t1a,t1b') == {
+        'ID': ['e1'], 'Parent': ['t1a', 't1b']}
+    assert parse_attributes('gene_id "g1"; transcript_id "t1";') == {
+        'gene_id': ['g1'], 'transcript_id': ['t1']}
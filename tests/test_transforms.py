@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+from pybedtools import Interval
+
+from EIYBrowse.transforms import (GAUSSIAN_BOXES, Gaussian, Log1p,
+                                  RollingMean, RollingMedian, box_widths,
+                                  parse_transforms, transformed_signal)
+
+
+def test_parse_transforms():
+    median = RollingMedian(3)
+    transforms = parse_transforms(['log1p', {'rolling_mean': 4},
+                                   {'gaussian': 2}, median])
+
+    assert [type(t) for t in transforms] == [Log1p, RollingMean, Gaussian,
+                                             RollingMedian]
+    assert transforms[1].flank == 2
+    assert transforms[3] is median
+    assert parse_transforms(None) == []
+
+
+def test_unknown_transform_is_rejected():
+    with pytest.raises(ValueError):
+        parse_transforms(['smooth'])
+
+
+def test_rolling_mean_matches_window_means():
+    values = np.random.RandomState(0).uniform(size=50)
+    assert np.allclose(RollingMean(5)(values),
+                       [values[i:i + 5].mean() for i in range(46)])
+
+
+def test_rolling_mean_leaves_missing_bins_out():
+    values = np.array([1., 2., np.nan, 4., 5., 6., 7., np.nan, np.nan,
+                       np.nan])
+    smoothed = RollingMean(3)(values)
+    assert np.allclose(smoothed[:6], [1.5, 3., 4.5, 5., 6., 6.5])
+    assert np.isclose(smoothed[6], 7.)
+    assert np.isnan(smoothed[7])
+
+
+def test_rolling_median_removes_spikes():
+    values = np.array([1., 1., 100., 1., 1., 2., 2.])
+    assert RollingMedian(3)(values).tolist() == [1., 1., 1., 1., 2.]
+
+
+def test_rolling_median_skips_missing_bins():
+    smoothed = RollingMedian(3)(np.array([1., 2., np.nan, 4., 5., 6.]))
+    assert smoothed.tolist() == [1.5, 3., 4.5, 5.]
+
+    assert np.isnan(RollingMedian(3)(np.full(4, np.nan))).all()
+
+
+@pytest.mark.parametrize('sigma', [0.5, 1, 2.5, 10])
+def test_gaussian_box_widths_match_variance(sigma):
+    widths = box_widths(sigma, GAUSSIAN_BOXES)
+    assert len(widths) == GAUSSIAN_BOXES
+    assert all(width % 2 == 1 for width in widths)
+    variance = sum((width ** 2 - 1) / 12. for width in widths)
+    assert abs(np.sqrt(variance) - sigma) <= 0.6
+
+
+def test_gaussian_is_close_to_exact_convolution():
+    sigma = 5.
+    values = np.random.RandomState(0).uniform(size=400)
+    gaussian = Gaussian(sigma)
+    smoothed = gaussian(values)
+
+    offsets = np.arange(-gaussian.flank, gaussian.flank + 1)
+    kernel = np.exp(-0.5 * (offsets / sigma) ** 2)
+    exact = np.convolve(values, kernel / kernel.sum(), 'valid')
+
+    assert len(smoothed) == len(values) - 2 * gaussian.flank
+    assert np.abs(smoothed - exact).max() < 0.02
+    assert np.allclose(Gaussian(sigma)(np.ones(200)), 1.)
+
+
+def test_log1p_keeps_sign():
+    assert np.allclose(Log1p()(np.array([-np.e + 1, 0., np.e - 1])),
+                       [-1., 0., 1.])
+
+
+def position_fetch(requests):
+
+    """Fetch function returning a signal equal to the square of the bin
+    start position, recording each request."""
+
+    def fetch(region, bins):
+        requests.append((region.start, region.stop, bins))
+        step = float(region.stop - region.start) / bins
+        sig_x = region.start + np.arange(bins) * step
+        return sig_x, [sig_x ** 2]
+
+    return fetch
+
+
+@pytest.mark.parametrize('transforms', [[RollingMean(5)],
+                                        [RollingMedian(3), Gaussian(2)],
+                                        [Log1p()]])
+def test_transformed_signal_uses_real_signal_in_flanks(transforms):
+    requests = []
+    region = Interval('chr1', 10000, 11000)
+
+    sig_x, (signal,) = transformed_signal(position_fetch(requests), region,
+                                          100, transforms)
+
+    flank = sum(transform.flank for transform in transforms)
+    assert requests == [(10000 - 10 * flank, 11000 + 10 * flank,
+                         100 + 2 * flank)]
+
+    expected = (np.arange(10000 - 10 * flank, 11000 + 10 * flank, 10.)
+                ** 2)
+    for transform in transforms:
+        expected = transform(expected)
+
+    assert np.allclose(sig_x, np.arange(10000, 11000, 10))
+    assert np.allclose(signal, expected)
+
+
+def test_transformed_signal_repeats_first_bin_at_chromosome_start():
+    requests = []
+    sig_x, (signal,) = transformed_signal(position_fetch(requests),
+                                          Interval('chr1', 20, 1020), 100,
+                                          [RollingMean(9)])
+
+    assert requests == [(0, 1060, 106)]
+    padded = np.concatenate([[0.] * 2, np.arange(0, 1060, 10.) ** 2])
+    assert np.allclose(signal, RollingMean(9)(padded))
@@ -0,0 +1,127 @@
+import matplotlib
+matplotlib.use('agg')
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+from matplotlib.font_manager import FontProperties
+
+from EIYBrowse.utils import (font_from_text_kwargs, text_width, pack_rows,
+                            merge_intervals, interval_coverage)
+
+
+@pytest.mark.parametrize('text', ['Sox2', 'Gm12345', 'WWWW', 'iiii'])
+def test_text_width_matches_rendered_width(text):
+    figure = plt.figure(dpi=100)
+    renderer = figure.canvas.get_renderer()
+    label = figure.text(0, 0, text, fontsize=14)
+    rendered = label.get_window_extent(renderer).width
+    plt.close(figure)
+
+    measured = text_width(text, FontProperties(size=14), dpi=100)
+
+    assert rendered - 1 <= measured <= rendered * 1.05 + 1
+
+
+def test_text_width_scales_with_resolution():
+    font = FontProperties(size=10)
+    assert text_width('Sox2', font, 144) == pytest.approx(
+        2 * text_width('Sox2', font, 72), rel=0.01)
+
+
+def test_font_from_text_kwargs_aliases():
+    font = font_from_text_kwargs({'fontsize': 20, 'weight': 'bold'})
+    assert font.get_size_in_points() == 20
+    assert font.get_weight() == 'bold'
+
+
+def test_font_from_text_kwargs_fontproperties():
+    font = FontProperties(size=5)
+    assert font_from_text_kwargs({'fontproperties': font}) is font
+    assert font_from_text_kwargs(
+        {'fontproperties': {'size': 7}}).get_size_in_points() == 7
+
+
+def greedy_rows(starts, stops):
+
+    """Reference packing: place each feature, in order of start, in the
+    first row whose last feature ends before it."""
+
+    row_ends, rows = [], {}
+    for i in sorted(range(len(starts)), key=lambda i: (starts[i], i)):
+        for row, end in enumerate(row_ends):
+            if end < starts[i]:
+                break
+        else:
+            row = len(row_ends)
+            row_ends.append(None)
+        row_ends[row] = stops[i]
+        rows[i] = row
+    return [rows[i] for i in range(len(starts))], len(row_ends)
+
+
+def test_pack_rows_never_overlaps_and_uses_fewest_rows():
+    rng = np.random.RandomState(0)
+    starts = rng.randint(0, 10000, 500)
+    stops = starts + rng.randint(1, 500, 500)
+
+    rows, total_rows = pack_rows(starts, stops)
+
+    for row in range(total_rows):
+        in_row = np.flatnonzero(rows == row)
+        order = in_row[np.argsort(starts[in_row])]
+        assert (starts[order][1:] > stops[order][:-1]).all()
+
+    assert total_rows == greedy_rows(starts.tolist(), stops.tolist())[1]
+
+    # The fewest rows possible is the largest number of features that
+    # overlap at one position
+    depth = max(((starts <= p) & (stops >= p)).sum() for p in starts)
+    assert total_rows == depth
+
+
+def test_pack_rows_touching_features_share_no_row():
+    rows, total_rows = pack_rows([0, 10, 11], [10, 20, 30])
+    assert rows.tolist() == [0, 1, 0]
+    assert total_rows == 2
+
+
+def test_pack_rows_empty():
+    rows, total_rows = pack_rows([], [])
+    assert len(rows) == 0 and total_rows == 0
+
+
+def test_merge_intervals_merges_overlapping_and_close_intervals():
+    starts, stops = merge_intervals([50, 0, 12, 30, 31], [60, 10, 20, 40, 35],
+                                    gap=2)
+    assert starts.tolist() == [0, 30, 50]
+    assert stops.tolist() == [20, 40, 60]
+
+
+def test_merge_intervals_keeps_contained_intervals_inside_block():
+    starts, stops = merge_intervals([0, 10, 50], [100, 20, 60])
+    assert starts.tolist() == [0]
+    assert stops.tolist() == [100]
+
+
+def test_merge_intervals_empty():
+    starts, stops = merge_intervals([], [])
+    assert len(starts) == 0 and len(stops) == 0
+
+
+def test_interval_coverage_matches_brute_force_count():
+    rng = np.random.RandomState(0)
+    starts = rng.randint(-100, 1100, 500)
+    stops = starts + rng.randint(1, 200, 500)
+
+    edges, counts = interval_coverage(starts, stops, 0, 1000, 37)
+
+    assert len(edges) == 38 and edges[0] == 0 and edges[-1] == 1000
+    expected = [np.sum((starts < hi) & (stops > lo))
+                for lo, hi in zip(edges[:-1], edges[1:])]
+    assert counts.tolist() == expected
+
+
+def test_interval_coverage_without_intervals():
+    edges, counts = interval_coverage([], [], 0, 100, 4)
+    assert counts.tolist() == [0, 0, 0, 0]